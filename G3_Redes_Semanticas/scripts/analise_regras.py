@@ -0,0 +1,197 @@
+# analise_regras.py
+
+"""
+Análise estática do conjunto de regras compiladas, antes da execução.
+
+Bibliotecas de regras compartilhadas trazem repetições e regras mais fracas
+que outras do mesmo arquivo, e são aplicadas a modelos que muitas vezes não
+têm nenhum elemento de vários dos tipos citados. Sobre as regras compiladas
+({id: (filho, pai/critério, modo)}, ver bim_auditor.compilar_regras):
+
+1. Sem instâncias: a regra cujo tipo filho não tem elementos no modelo
+   (contagens por tipo gravadas na importação; ver
+   persistencia_lote.EscritorEmLote.por_tipo) não pode ter anomalias e não
+   é executada.
+2. Duplicadas: cada regra é levada a uma forma canônica (critérios com
+   valores numéricos normalizados e intervalos ordenados); as de mesma
+   forma reaproveitam o resultado da primeira.
+3. Implicação: a regra A implica a regra B quando toda violação de B é
+   também violação de A (as anomalias de B são um subconjunto das de A):
+   - contenção do mesmo filho no mesmo pai, de acordo com a força da
+     relação: DENTRO_DE (aresta declarada confirmada pela geometria) ⇒
+     CONTIDO_EM (pai imediato) ⇒ CONTIDO_EM* (qualquer ancestral);
+   - critérios sobre a mesma propriedade: qualquer critério implica
+     EXISTE, e um intervalo numérico implica outro que o contenha
+     (ex.: ENTRE 1 E 500 ⇒ > 0).
+   A regra implicada só é executada se todas as regras ativas que a
+   implicam tiverem anomalias; se alguma passar sem anomalias, a implicada
+   também passa, sem consulta.
+
+O resultado de cada regra continua exato: só deixam de ser consultadas as
+regras cujo resultado já se conhece.
+"""
+
+import json
+import math
+
+from backend_grafo import MODO_DIRETO, MODO_ANCESTRAL, MODO_GEOMETRICO, MODO_PROPRIEDADE
+from colunas_propriedades import OPERADOR_ENTRE, OPERADOR_EXISTE
+
+MOTIVO_SEM_INSTANCIAS = "sem_instancias"
+MOTIVO_DUPLICADA = "duplicada"
+MOTIVO_IMPLICADA = "implicada"
+
+# Força das regras de contenção de um mesmo (filho, pai): a mais forte implica as mais fracas
+FORCA_CONTENCAO = {MODO_GEOMETRICO: 2, MODO_DIRETO: 1, MODO_ANCESTRAL: 0}
+
+
+def _normalizar_valor(valor):
+    # Critérios numéricos são avaliados em float64 (booleanos inclusive)
+    return float(valor) if isinstance(valor, (bool, int, float)) else valor
+
+
+def forma_canonica(tipos) -> tuple:
+    """Chave que identifica regras equivalentes: (filho, modo, pai ou critério normalizado)."""
+    tipo_filho, alvo, modo = tipos
+    if modo != MODO_PROPRIEDADE:
+        return tipo_filho, modo, alvo
+    valores = [_normalizar_valor(v) for v in alvo["valores"]]
+    if alvo["operador"] == OPERADOR_ENTRE:
+        valores = sorted(valores, key=lambda v: (isinstance(v, str), v))
+    criterio = {"propriedade": alvo["propriedade"], "operador": alvo["operador"], "valores": valores}
+    return tipo_filho, modo, json.dumps(criterio, sort_keys=True)
+
+
+def intervalo_criterio(criterio: dict):
+    """
+    Conjunto aceito por um critério numérico de ordem, como
+    (mínimo, mínimo incluso, máximo, máximo incluso); None para os demais
+    (igualdade tolerante, textos, EXISTE).
+    """
+    operador, valores = criterio["operador"], criterio["valores"]
+    if not valores or not all(isinstance(v, (bool, int, float)) for v in valores):
+        return None
+    if operador == OPERADOR_ENTRE:
+        minimo, maximo = sorted(float(v) for v in valores)
+        return minimo, True, maximo, True
+    valor = float(valores[0])
+    return {
+        ">": (valor, False, math.inf, False),
+        ">=": (valor, True, math.inf, False),
+        "<": (-math.inf, False, valor, False),
+        "<=": (-math.inf, False, valor, True),
+    }.get(operador)
+
+
+def _contido(a: tuple, b: tuple) -> bool:
+    """Se o intervalo `a` está contido no intervalo `b`."""
+    min_a, inc_min_a, max_a, inc_max_a = a
+    min_b, inc_min_b, max_b, inc_max_b = b
+    inferior = min_a > min_b or (min_a == min_b and (inc_min_b or not inc_min_a))
+    superior = max_a < max_b or (max_a == max_b and (inc_max_b or not inc_max_a))
+    return inferior and superior
+
+
+def implica(forte, fraca) -> bool:
+    """Se toda violação da regra `fraca` é também violação da regra `forte`."""
+    filho_forte, alvo_forte, modo_forte = forte
+    filho_fraca, alvo_fraca, modo_fraca = fraca
+    if filho_forte != filho_fraca:
+        return False
+    if modo_forte in FORCA_CONTENCAO and modo_fraca in FORCA_CONTENCAO:
+        return alvo_forte == alvo_fraca and FORCA_CONTENCAO[modo_forte] > FORCA_CONTENCAO[modo_fraca]
+    if modo_forte == modo_fraca == MODO_PROPRIEDADE and alvo_forte["propriedade"] == alvo_fraca["propriedade"]:
+        # Todo critério exige o valor presente, então implica EXISTE
+        if alvo_fraca["operador"] == OPERADOR_EXISTE:
+            return alvo_forte["operador"] != OPERADOR_EXISTE
+        intervalo_forte, intervalo_fraca = intervalo_criterio(alvo_forte), intervalo_criterio(alvo_fraca)
+        return (intervalo_forte is not None and intervalo_fraca is not None
+                and _contido(intervalo_forte, intervalo_fraca))
+    return False
+
+
+class AnaliseRegras:
+    """Resultado da análise: regras a executar e regras dispensadas, com o motivo."""
+
+    def __init__(self, ativas: dict, ignoradas: dict):
+        """
+        :param ativas: {id_regra: tipos} das regras executadas no plano principal
+        :param ignoradas: {id_regra: (motivo, [ids de referência])}; a
+                          referência é a regra original (duplicada) ou as
+                          regras ativas que implicam a regra (implicada)
+        """
+        self.ativas = ativas
+        self.ignoradas = ignoradas
+
+    def por_motivo(self, motivo: str) -> list:
+        return [idx for idx, (m, _) in self.ignoradas.items() if m == motivo]
+
+    def duplicadas_por_original(self) -> dict:
+        """{regra original: [regras duplicadas dela]}"""
+        copias = {}
+        for idx in self.por_motivo(MOTIVO_DUPLICADA):
+            copias.setdefault(self.ignoradas[idx][1][0], []).append(idx)
+        return copias
+
+    def implicante_conforme(self, idx: int, contagens: dict, falhas: dict):
+        """
+        Regra ativa que implica `idx` e foi executada sem anomalias (então
+        `idx` também não tem nenhuma), ou None se todas tiveram anomalias
+        ou falharam e `idx` precisa ser executada.
+        """
+        for j in self.ignoradas[idx][1]:
+            if j not in falhas and not contagens.get(j):
+                return j
+        return None
+
+    def implicante_completa(self, idx: int, contagens: dict, falhas: dict):
+        """
+        Regra ativa que implica `idx`, terminou sem falha e teve anomalias:
+        os elementos anômalos de `idx` estão todos entre os dela. None se
+        todas as que implicam `idx` falharam (resultado parcial ou nenhum).
+        """
+        for j in self.ignoradas[idx][1]:
+            if j not in falhas and contagens.get(j):
+                return j
+        return None
+
+
+def analisar_regras(tipos_por_regra: dict, contagens: dict = None) -> AnaliseRegras:
+    """
+    :param tipos_por_regra: {id_regra: (filho, pai/critério, modo)}
+    :param contagens: Número de elementos por tipo IFC; None = desconhecido
+                      (nenhuma regra é dispensada por falta de instâncias)
+    """
+    ignoradas = {}
+    primeira_por_forma = {}
+    unicas = {}
+    for idx in sorted(tipos_por_regra):
+        tipos = tipos_por_regra[idx]
+        if contagens is not None and not contagens.get(tipos[0]):
+            ignoradas[idx] = (MOTIVO_SEM_INSTANCIAS, [])
+            continue
+        forma = forma_canonica(tipos)
+        if forma in primeira_por_forma:
+            ignoradas[idx] = (MOTIVO_DUPLICADA, [primeira_por_forma[forma]])
+            continue
+        primeira_por_forma[forma] = idx
+        unicas[idx] = tipos
+
+    # Implicação só entre regras do mesmo tipo filho. Sem duplicadas, a
+    # implicação estrita é transitiva e sem ciclos: quem implica uma regra
+    # implicada também implica as que ela implica, então basta comparar
+    # com as regras que ficam ativas.
+    por_filho = {}
+    for idx, tipos in unicas.items():
+        por_filho.setdefault(tipos[0], []).append(idx)
+    ativas = {}
+    for idx, tipos in unicas.items():
+        fortes = [j for j in por_filho[tipos[0]] if j != idx and implica(unicas[j], tipos)]
+        if fortes:
+            ignoradas[idx] = (MOTIVO_IMPLICADA, fortes)
+        else:
+            ativas[idx] = tipos
+    for idx, (motivo, fortes) in ignoradas.items():
+        if motivo == MOTIVO_IMPLICADA:
+            fortes[:] = [j for j in fortes if j in ativas]
+    return AnaliseRegras(ativas, ignoradas)
@@ -0,0 +1,220 @@
+# auditoria_frota.py
+
+"""
+Auditoria em lote de vários modelos IFC (a "frota" de um portfólio).
+
+Recebe um diretório (busca *.ifc, opcionalmente em subdiretórios) ou um
+manifesto — arquivo texto com um caminho de IFC por linha, relativo ao
+próprio manifesto; linhas vazias e comentários (#) são ignorados — e
+audita cada modelo em um processo de um pool:
+
+    extração do IFC -> BackendMemoria próprio -> regras -> relatório
+
+Cada modelo é auditado em um grafo em memória isolado, então os processos
+não compartilham estado nem disputam o Neo4j. O diretório de saída recebe
+um relatório de GUIDs anômalos por modelo (<modelo>.anomalias.txt) e um
+resumo consolidado (resumo_frota.json) com o resultado de cada modelo e os
+totais por regra.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from backend_grafo import BackendMemoria
+from bim_auditor import AuditorRegras
+from instrumentacao import Instrumentacao
+
+NOME_RESUMO = "resumo_frota.json"
+
+
+def listar_modelos(origem: str, recursivo: bool = False) -> list:
+    """
+    Caminhos dos IFC de um diretório ou de um manifesto, sem repetições
+    e na ordem em que aparecem.
+    """
+    if os.path.isdir(origem):
+        caminhos = []
+        for raiz, subdiretorios, arquivos in os.walk(origem):
+            subdiretorios.sort()
+            caminhos.extend(os.path.join(raiz, a) for a in sorted(arquivos) if a.lower().endswith(".ifc"))
+            if not recursivo:
+                break
+    else:
+        base = os.path.dirname(os.path.abspath(origem))
+        with open(origem, 'r', encoding='utf-8') as f:
+            linhas = [linha.strip() for linha in f]
+        caminhos = [os.path.join(base, linha) for linha in linhas if linha and not linha.startswith('#')]
+    return list(dict.fromkeys(os.path.abspath(c) for c in caminhos))
+
+
+def nome_relatorio(caminho_ifc: str, base: str) -> str:
+    """Nome único do relatório do modelo (o caminho relativo achatado)."""
+    relativo = os.path.relpath(caminho_ifc, base)
+    if relativo.startswith(os.pardir):
+        relativo = caminho_ifc.lstrip(os.sep)
+    return os.path.splitext(relativo)[0].replace(os.sep, "__") + ".anomalias.txt"
+
+
+def auditar_modelo(caminho_ifc: str, caminho_regras: str, caminho_relatorio: str,
+                   usar_snapshot: bool = False) -> dict:
+    """
+    Audita um modelo em um backend em memória próprio. Executada nos
+    processos do pool: nunca levanta exceção, os erros vão no resultado.
+    """
+    instrumentacao = Instrumentacao(silencioso=True)
+    resultado = {"modelo": caminho_ifc, "ok": False}
+    inicio = time.perf_counter()
+    try:
+        # O relatório de uma execução anterior não pode sobreviver a uma auditoria que falhe
+        if os.path.exists(caminho_relatorio):
+            os.remove(caminho_relatorio)
+        with instrumentacao.etapa("carga_backend", backend="memoria"):
+            backend = BackendMemoria.de_ifc(caminho_ifc, usar_snapshot, info=instrumentacao.info)
+        auditor = AuditorRegras(backend=backend, instrumentacao=instrumentacao)
+        resumo = auditor.executar_auditoria(arquivo_regras=caminho_regras, caminho_relatorio=caminho_relatorio)
+        if resumo is None:
+            resultado["erro"] = "Não foi possível executar as regras."
+        else:
+            resultado.update(resumo, ok=True)
+    except Exception as e:
+        resultado["erro"] = f"{type(e).__name__}: {e}"
+        resultado["traceback"] = traceback.format_exc()
+
+    resultado["segundos"] = time.perf_counter() - inicio
+    resultado["etapas"] = {}
+    for span in instrumentacao.spans:
+        resultado["etapas"][span["nome"]] = resultado["etapas"].get(span["nome"], 0.0) + span["segundos"]
+    return resultado
+
+
+def consolidar(resultados: list) -> dict:
+    """Totais da frota: modelos com e sem anomalias, falhas e anomalias por regra."""
+    anomalias_por_regra = {}
+    for r in resultados:
+        for regra, total in r.get("anomalias_por_regra", {}).items():
+            por_regra = anomalias_por_regra.setdefault(regra, {"modelos": 0, "elementos": 0})
+            por_regra["modelos"] += 1
+            por_regra["elementos"] += total
+    auditados = [r for r in resultados if r["ok"]]
+    return {
+        "modelos": len(resultados),
+        "auditados": len(auditados),
+        "com_falha": len(resultados) - len(auditados),
+        "com_anomalias": sum(1 for r in auditados if r["regras_com_anomalias"]),
+        "conformes": sum(1 for r in auditados if not r["regras_com_anomalias"]),
+        "guids_anomalos": sum(r["guids_relatorio"] for r in auditados),
+        "anomalias_por_regra": anomalias_por_regra,
+    }
+
+
+def aquecer_cache_regras(caminho_regras: str):
+    """
+    Compila as regras uma vez no processo principal: os workers encontram
+    o plano no cache em disco e não precisam construir o parser.
+    """
+    auditor = AuditorRegras(backend=BackendMemoria(), instrumentacao=Instrumentacao(silencioso=True))
+    texto_regras, _, regras = auditor.carregar_regras(caminho_regras)
+    auditor.compilar_regras_com_cache(caminho_regras, texto_regras, regras)
+
+
+def auditar_frota(modelos: list, caminho_regras: str, diretorio_saida: str, workers: int = None,
+                  usar_snapshot: bool = False, base: str = None) -> dict:
+    """
+    Audita todos os modelos em um pool de processos.
+
+    :param modelos: Caminhos dos arquivos IFC
+    :param caminho_regras: Arquivo de regras aplicado a todos os modelos
+    :param diretorio_saida: Recebe os relatórios por modelo e o resumo consolidado
+    :param workers: Número de processos (padrão: número de CPUs)
+    :param usar_snapshot: Usa (ou cria) o snapshot colunar de cada modelo
+    :param base: Diretório em relação ao qual os nomes dos relatórios são formados
+    :return: Resumo consolidado (o mesmo gravado em resumo_frota.json)
+    """
+    os.makedirs(diretorio_saida, exist_ok=True)
+    caminho_regras = os.path.abspath(caminho_regras)
+    base = base or os.path.commonpath([os.path.dirname(m) for m in modelos])
+    aquecer_cache_regras(caminho_regras)
+
+    inicio = time.perf_counter()
+    resultados = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = {
+            pool.submit(auditar_modelo, modelo, caminho_regras,
+                        os.path.join(diretorio_saida, nome_relatorio(modelo, base)), usar_snapshot): modelo
+            for modelo in modelos
+        }
+        for n, futuro in enumerate(as_completed(futuros), 1):
+            try:
+                resultado = futuro.result()
+            except Exception as e:  # processo do pool encerrado abruptamente
+                resultado = {"modelo": futuros[futuro], "ok": False, "erro": f"{type(e).__name__}: {e}"}
+            resultados.append(resultado)
+            nome = os.path.relpath(resultado["modelo"], base)
+            if not resultado["ok"]:
+                print(f"   [{n}/{len(modelos)}] ❌ {nome}: {resultado['erro']}")
+            elif resultado["regras_com_anomalias"]:
+                print(f"   [{n}/{len(modelos)}] 🚨 {nome}: {resultado['regras_com_anomalias']} regra(s) "
+                      f"com anomalias, {resultado['guids_relatorio']} GUIDs ({resultado['segundos']:.1f}s)")
+            else:
+                print(f"   [{n}/{len(modelos)}] ✅ {nome}: conforme ({resultado['segundos']:.1f}s)")
+
+    # Ordem estável no resumo, independente da ordem de conclusão
+    ordem = {modelo: i for i, modelo in enumerate(modelos)}
+    resultados.sort(key=lambda r: ordem[r["modelo"]])
+    resumo = {
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "regras": caminho_regras,
+        "workers": workers or os.cpu_count(),
+        "segundos": time.perf_counter() - inicio,
+        **consolidar(resultados),
+        "resultados": resultados,
+    }
+    caminho_resumo = os.path.join(diretorio_saida, NOME_RESUMO)
+    with open(caminho_resumo, 'w', encoding='utf-8') as f:
+        json.dump(resumo, f, ensure_ascii=False, indent=2)
+    return resumo
+
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser_arg = argparse.ArgumentParser(description="Auditoria em lote de modelos IFC")
+    parser_arg.add_argument("origem", help="Diretório com arquivos .ifc ou manifesto (um caminho por linha)")
+    parser_arg.add_argument("--recursivo", action="store_true",
+                            help="Procura arquivos .ifc também nos subdiretórios")
+    parser_arg.add_argument("--regras", type=str, default=os.path.join(script_dir, "regras.txt"),
+                            help="Arquivo de regras aplicado a todos os modelos")
+    parser_arg.add_argument("--saida", type=str, default="auditoria_frota",
+                            help="Diretório dos relatórios por modelo e do resumo consolidado")
+    parser_arg.add_argument("--workers", type=int, default=None,
+                            help="Número de processos (padrão: número de CPUs)")
+    parser_arg.add_argument("--snapshot", action="store_true",
+                            help="Usa (ou cria) o snapshot colunar de cada modelo")
+    args = parser_arg.parse_args()
+
+    modelos = listar_modelos(args.origem, args.recursivo)
+    if not modelos:
+        print(f"❌ Nenhum arquivo IFC encontrado em '{args.origem}'.")
+        sys.exit(1)
+
+    base = args.origem if os.path.isdir(args.origem) else None
+    print(f"🏗️ Auditando {len(modelos)} modelo(s) com {args.workers or os.cpu_count()} processo(s)...")
+    resumo = auditar_frota(modelos, args.regras, args.saida, args.workers, args.snapshot, base)
+
+    print("\n" + "=" * 50)
+    print("📊 RESUMO DA FROTA:")
+    print(f"   - Modelos auditados: {resumo['auditados']}/{resumo['modelos']} ({resumo['segundos']:.1f}s)")
+    print(f"   - Conformes: {resumo['conformes']}")
+    print(f"   - Com anomalias: {resumo['com_anomalias']}")
+    if resumo["com_falha"]:
+        print(f"   - Com falha: {resumo['com_falha']}")
+    for regra, total in sorted(resumo["anomalias_por_regra"].items(), key=lambda item: -item[1]["modelos"]):
+        print(f"   - '{regra}': {total['elementos']} elemento(s) em {total['modelos']} modelo(s)")
+    print(f"\n✅ Resumo consolidado salvo em: '{os.path.join(args.saida, NOME_RESUMO)}'")
+    print("=" * 50)
+    sys.exit(1 if resumo["com_falha"] else 0)
@@ -0,0 +1,491 @@
+# backend_grafo.py
+
+"""
+Backends de grafo usados pelo AuditorRegras.
+
+Todo backend expõe a mesma interface de avaliação de regras:
+
+    verificar_contido_em(tipo_filho, tipo_pai, modo) -> list[dict]
+
+que retorna os elementos do tipo `tipo_filho` que não estão contidos em
+algum elemento do tipo `tipo_pai`, no formato
+{"elemento_anomalo": rótulo, "id": uri, "tipo": tipo_filho}, e
+
+    iterar_plano(plano) -> gerador de (id_regra, dict)
+
+que avalia um conjunto de regras compilado ({tipo_filho: [(id_regra,
+tipo_pai, modo), ...]}) percorrendo cada tipo de filho uma única vez e
+entregando as linhas anômalas em fluxo (verificar_plano reúne o mesmo fluxo
+em listas). As linhas de um mesmo elemento filho são entregues em sequência.
+Antes de avaliar um plano, o auditor chama preparar_plano(plano), para que o
+backend carregue o que as regras exigem e ainda não tem (ver MODO_GEOMETRICO).
+
+O modo da regra define o que conta como "contido em":
+
+- MODO_DIRETO (`CONTIDO_EM`): um pai imediato na árvore espacial, por
+  contenção (`isContainedIn`) ou agregação (`isPartOf`);
+- MODO_ANCESTRAL (`CONTIDO_EM*`): qualquer ancestral na árvore espacial,
+  respondido pelo índice de ancestrais (ver indice_espacial.py) sem
+  expansão de caminhos;
+- MODO_HOSPEDAGEM: porta/janela hospedada no elemento (ex.: parede) pela
+  aresta derivada `isHostedBy` (abertura recortada + preenchida). O
+  compilador de regras escolhe este modo para as regras de hospedagem.
+- MODO_GEOMETRICO (`DENTRO_DE`): contêiner declarado cuja extensão contém
+  de fato a caixa do elemento, pela aresta derivada `isWithin` (ver
+  geometria_ifc.py). A verificação geométrica é cara e opcional na
+  extração: o BackendMemoria criado com de_ifc só a executa quando um
+  plano tem regras deste modo.
+- MODO_PROPRIEDADE (`PROPRIEDADE` / `QUANTIDADE`): o valor de uma
+  propriedade ou quantidade do elemento atende ao critério da regra. Não
+  é uma relação: no lugar do tipo pai, a regra traz o critério, avaliado
+  como predicado NumPy sobre as colunas tipadas do tipo filho (ver
+  colunas_propriedades.py).
+- MODO_ASSOCIACAO (`TEM MATERIAL` / `TEM TIPO`): o elemento tem material
+  ou tipo (IfcTypeObject) associado. No lugar do tipo pai, a associação;
+  avaliada por varredura do índice denso de associações do tipo filho (ver
+  indice_associacoes.py).
+
+As linhas das regras colunares (propriedade e associação) são intercaladas
+às das regras relacionais, mantendo juntas as linhas de cada elemento.
+
+- BackendNeo4j: traduz a regra para Cypher e a executa no servidor.
+- BackendMemoria: mantém o grafo em memória com índices de adjacência
+  (tipo -> nós, nó -> pais por relação, índice de ancestrais) e avalia as
+  regras em Python.
+"""
+
+import itertools
+from collections import defaultdict
+
+from persistencia_lote import DestinoMemoria, EscritorEmLote, ROTULO_METADADOS
+from colunas_propriedades import TabelaPropriedades, anomalias_propriedades
+from indice_associacoes import IndiceAssociacoes, COLUNAS_ASSOCIACAO, anomalias_associacoes
+from indice_espacial import IndiceAncestrais, REL_CONTENCAO, REL_HOSPEDAGEM, REL_GEOMETRICA, RELACOES_ESPACIAIS
+
+MODO_DIRETO = "direto"
+MODO_ANCESTRAL = "ancestral"
+MODO_HOSPEDAGEM = "hospedagem"
+MODO_GEOMETRICO = "geometrico"
+MODO_PROPRIEDADE = "propriedade"
+MODO_ASSOCIACAO = "associacao"
+
+# Modos avaliados sobre arrays do tipo filho, e não por relações do grafo
+MODOS_COLUNARES = (MODO_PROPRIEDADE, MODO_ASSOCIACAO)
+
+# Relações percorridas (um salto) por modo; MODO_ANCESTRAL usa o índice
+RELACOES_POR_MODO = {
+    MODO_DIRETO: RELACOES_ESPACIAIS,
+    MODO_HOSPEDAGEM: (REL_HOSPEDAGEM,),
+    MODO_GEOMETRICO: (REL_GEOMETRICA,),
+}
+
+
+def _padrao_relacoes(modo: str) -> str:
+    return "|".join(f"`{rel}`" for rel in RELACOES_POR_MODO[modo])
+
+
+def cypher_tipos_pais(modo: str) -> str:
+    """Expressão Cypher com a lista de tipos que contêm `filho` no modo dado."""
+    if modo == MODO_ANCESTRAL:
+        return "coalesce(filho.tipos_ancestrais, [])"
+    return f"reduce(tipos = [], p IN [(filho)-[:{_padrao_relacoes(modo)}]->(pai) | labels(pai)] | tipos + p)"
+
+
+def cypher_contido_em(tipo_filho: str, tipo_pai: str, modo: str = MODO_DIRETO) -> str:
+    """Query Cypher da regra VERIFICAR filho CONTIDO_EM pai (ou CONTIDO_EM*)."""
+    if modo == MODO_ANCESTRAL:
+        condicao = f"NOT '{tipo_pai}' IN {cypher_tipos_pais(modo)}"
+    else:
+        condicao = f"NOT (filho)-[:{_padrao_relacoes(modo)}]->(:{tipo_pai})"
+    return f"""
+            MATCH (filho:{tipo_filho})
+            WHERE {condicao}
+            RETURN filho.label as elemento_anomalo,
+                   filho.uri as id,
+                   '{tipo_filho}' as tipo
+            """
+
+
+def cypher_plano_contido_em(tipo_filho: str, modos) -> str:
+    """
+    Query Cypher que avalia, em uma única varredura dos nós `tipo_filho`,
+    todas as regras recebidas em $regras ([{id, pai, modo}, ...]). Os tipos
+    que contêm o filho são calculados uma vez por modo presente em `modos`.
+    """
+    tipos_por_modo = ", ".join(f"`{modo}`: {cypher_tipos_pais(modo)}" for modo in sorted(modos))
+    return f"""
+            MATCH (filho:{tipo_filho})
+            WITH filho, {{{tipos_por_modo}}} AS tipos_pais
+            UNWIND $regras AS regra
+            WITH filho, regra WHERE NOT regra.pai IN tipos_pais[regra.modo]
+            RETURN regra.id as regra,
+                   filho.label as elemento_anomalo,
+                   filho.uri as id,
+                   '{tipo_filho}' as tipo
+            """
+
+
+def cypher_colunas(tipo_filho: str) -> str:
+    """
+    Query Cypher que lê, em uma varredura dos nós `tipo_filho`, os valores
+    das propriedades pedidas em $nomes (nome qualificado ou simples).
+    """
+    return f"""
+            MATCH (filho:{tipo_filho})
+            RETURN filho.uri as id,
+                   filho.label as elemento_anomalo,
+                   [k IN keys(filho) WHERE k CONTAINS '.'
+                    AND any(nome IN $nomes WHERE k = nome OR k ENDS WITH '.' + nome)
+                    | [k, filho[k]]] as valores
+            """
+
+
+def cypher_associacoes(tipo_filho: str) -> str:
+    """Query Cypher que lê, em uma varredura dos nós `tipo_filho`, o material e o tipo associados."""
+    colunas = ", ".join(f"filho.`{coluna}` as `{coluna}`" for coluna in COLUNAS_ASSOCIACAO.values())
+    return f"""
+            MATCH (filho:{tipo_filho})
+            RETURN filho.uri as id,
+                   filho.label as elemento_anomalo,
+                   {colunas}
+            """
+
+
+def usa_geometria(plano: dict) -> bool:
+    """Indica se alguma regra do plano depende da contenção geométrica."""
+    return any(modo == MODO_GEOMETRICO for regras in plano.values() for _, _, modo in regras)
+
+
+def separar_regras(regras: list) -> tuple:
+    """Separa as regras de um grupo em (relacionais, {modo colunar: regras})."""
+    relacionais = [r for r in regras if r[2] not in MODOS_COLUNARES]
+    por_modo = {}
+    for r in regras:
+        if r[2] in MODOS_COLUNARES:
+            por_modo.setdefault(r[2], []).append(r)
+    return relacionais, por_modo
+
+
+def anomalias_colunares(backend, tipo_filho: str, por_modo: dict) -> dict:
+    """
+    Avalia as regras colunares de um tipo filho sobre as tabelas do backend
+    (`colunas` e `associacoes`) e reúne as anomalias por elemento.
+    """
+    pendentes = {}
+    for modo, regras in por_modo.items():
+        if modo == MODO_PROPRIEDADE:
+            nomes = {criterio["propriedade"] for _, criterio, _ in regras}
+            parcial = anomalias_propriedades(backend.colunas(tipo_filho, nomes), tipo_filho, regras)
+        else:
+            parcial = anomalias_associacoes(backend.associacoes(tipo_filho), tipo_filho, regras)
+        for uri, linhas in parcial.items():
+            pendentes.setdefault(uri, []).extend(linhas)
+    return pendentes
+
+
+def intercalar_anomalias(linhas, pendentes: dict):
+    """
+    Junta ao fluxo (id_regra, linha) das regras relacionais as anomalias das
+    regras colunares ({uri: [(id_regra, linha), ...]}): as de cada elemento saem
+    logo após as suas linhas relacionais, e as dos demais elementos ao final.
+    """
+    anterior = None
+    for id_regra, linha in linhas:
+        if linha["id"] != anterior and anterior in pendentes:
+            yield from pendentes.pop(anterior)
+        anterior = linha["id"]
+        yield id_regra, linha
+    if anterior in pendentes:
+        yield from pendentes.pop(anterior)
+    for restantes in pendentes.values():
+        yield from restantes
+
+
+def reunir_resultados(linhas) -> dict:
+    """Agrupa um fluxo de (id_regra, linha) em {id_regra: [linha, ...]}."""
+    resultados = defaultdict(list)
+    for id_regra, linha in linhas:
+        resultados[id_regra].append(linha)
+    return dict(resultados)
+
+
+class BackendNeo4j:
+    """Backend que avalia as regras em um servidor Neo4j."""
+
+    def __init__(self, uri: str, user: str, password: str, max_conexoes: int = None):
+        """
+        :param max_conexoes: Tamanho máximo do pool de conexões (None = padrão do py2neo)
+        """
+        from py2neo import Graph  # type: ignore
+        self.graph = Graph(uri, auth=(user, password), max_size=max_conexoes)
+        self.graph.run("RETURN 1")
+
+    def executar(self, query: str, **parametros) -> list:
+        return self.graph.run(query, **parametros).data()
+
+    def iterar(self, query: str, **parametros):
+        """Percorre o resultado registro a registro, sem materializar a lista."""
+        for registro in self.graph.run(query, **parametros):
+            yield dict(registro)
+
+    def verificar_contido_em(self, tipo_filho: str, tipo_pai: str, modo: str = MODO_DIRETO) -> list:
+        return self.executar(cypher_contido_em(tipo_filho, tipo_pai, modo))
+
+    def colunas(self, tipo_filho: str, nomes) -> TabelaPropriedades:
+        """Tabela com as propriedades `nomes` dos nós do tipo, lida em uma única query."""
+        uris, rotulos, valores = [], [], []
+        for r in self.iterar(cypher_colunas(tipo_filho), nomes=sorted(nomes)):
+            uris.append(r["id"])
+            rotulos.append(r["elemento_anomalo"])
+            valores.append(dict(r["valores"]))
+        return TabelaPropriedades.de_valores(uris, rotulos, valores)
+
+    def associacoes(self, tipo_filho: str) -> IndiceAssociacoes:
+        """Índice de material/tipo dos nós do tipo, lido em uma única query."""
+        uris, rotulos, valores = [], [], []
+        for r in self.iterar(cypher_associacoes(tipo_filho)):
+            uris.append(r.pop("id"))
+            rotulos.append(r.pop("elemento_anomalo"))
+            valores.append(r)
+        return IndiceAssociacoes.de_valores(uris, rotulos, valores)
+
+    def contagens_tipos(self):
+        """
+        Número de elementos por tipo IFC, gravado pelo importador no nó de
+        metadados; None se o banco foi importado sem ele.
+        """
+        registros = self.executar(f"MATCH (m:{ROTULO_METADADOS} {{chave: 'contagens_tipos'}}) "
+                                  "RETURN m.tipos AS tipos, m.quantidades AS quantidades")
+        if not registros:
+            return None
+        return dict(zip(registros[0]["tipos"], registros[0]["quantidades"]))
+
+    def preparar_plano(self, plano: dict):
+        """As relações isWithin são gravadas pelo importador (--geometria)."""
+
+    def iterar_plano(self, plano: dict):
+        for tipo_filho, regras in plano.items():
+            relacionais, por_modo = separar_regras(regras)
+            pendentes = anomalias_colunares(self, tipo_filho, por_modo)
+            yield from intercalar_anomalias(self._iterar_relacionais(tipo_filho, relacionais), pendentes)
+
+    def _iterar_relacionais(self, tipo_filho: str, regras: list):
+        if not regras:
+            return
+        parametros = [{"id": id_regra, "pai": tipo_pai, "modo": modo} for id_regra, tipo_pai, modo in regras]
+        modos = {modo for _, _, modo in regras}
+        for r in self.iterar(cypher_plano_contido_em(tipo_filho, modos), regras=parametros):
+            yield r.pop("regra"), r
+
+    def verificar_plano(self, plano: dict) -> dict:
+        return reunir_resultados(self.iterar_plano(plano))
+
+
+class BackendMemoria(DestinoMemoria):
+    """
+    Grafo em memória com índices de adjacência.
+
+    Pode ser populado pelo importador RDF (é um destino de lotes, como o
+    DestinoMemoria) ou diretamente a partir de um arquivo IFC com `de_ifc`.
+    Os índices são reconstruídos sob demanda após qualquer escrita.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._origem_ifc = None  # (caminho_ifc, usar_snapshot, info) sem a contenção geométrica
+        self._por_tipo = None   # label -> [uri, ...]
+        self._pais = None       # relação -> uri -> {uri_pai, ...}
+        self._indice = None     # IndiceAncestrais da árvore espacial
+        self._tabelas = {}      # label -> TabelaPropriedades
+        self._associacoes = {}  # label -> IndiceAssociacoes
+
+    @classmethod
+    def de_ifc(cls, caminho_ifc: str, usar_snapshot: bool = False, geometria: bool = False, info=print):
+        """
+        Cria o backend a partir de um arquivo IFC, sem servidor. Com
+        usar_snapshot, o modelo vem do snapshot colunar (snapshot_modelo.py).
+
+        :param geometria: Extrai já a contenção geométrica; sem ela, a
+            extração é adiada até um plano com regras MODO_GEOMETRICO
+        :param info: Recebe as mensagens de progresso do snapshot
+        """
+        from extracao_ifc import (iterar_elementos, iterar_contencoes, iterar_relacoes, iterar_propriedades,
+                                  iterar_contencao_geometrica, gerar_triplas)
+
+        if usar_snapshot:
+            from snapshot_modelo import obter_snapshot
+            modelo = obter_snapshot(caminho_ifc, geometria, info)
+            elementos, contencoes, relacoes = modelo.elementos(), modelo.contencoes(), modelo.relacoes()
+            propriedades = modelo.propriedades()
+            if geometria:
+                relacoes = itertools.chain(relacoes, modelo.contencao_geometrica())
+        else:
+            import ifcopenshell  # type: ignore
+            ifc = ifcopenshell.open(caminho_ifc)
+            elementos, contencoes, relacoes = iterar_elementos(ifc), iterar_contencoes(ifc), iterar_relacoes(ifc)
+            propriedades = iterar_propriedades(ifc)
+            if geometria:
+                relacoes = itertools.chain(relacoes, iterar_contencao_geometrica(ifc))
+
+        backend = cls()
+        escritor = EscritorEmLote(backend)
+        escritor.adicionar_todas(gerar_triplas(elementos, contencoes, relacoes=relacoes, propriedades=propriedades))
+        escritor.descarregar()
+        if not geometria:
+            backend._origem_ifc = (caminho_ifc, usar_snapshot, info)
+        return backend
+
+    def carregar_geometria(self):
+        """Grava as relações isWithin do IFC de origem (ver de_ifc), uma única vez."""
+        if self._origem_ifc is None:
+            return
+        from extracao_ifc import iterar_contencao_geometrica, gerar_triplas
+
+        caminho_ifc, usar_snapshot, info = self._origem_ifc
+        if usar_snapshot:
+            from snapshot_modelo import obter_snapshot
+            relacoes = obter_snapshot(caminho_ifc, True, info).contencao_geometrica()
+        else:
+            import ifcopenshell  # type: ignore
+            relacoes = iterar_contencao_geometrica(ifcopenshell.open(caminho_ifc))
+        escritor = EscritorEmLote(self)
+        escritor.adicionar_todas(gerar_triplas((), (), relacoes=relacoes))
+        escritor.descarregar()
+        self._origem_ifc = None
+
+    # --- Escrita: qualquer alteração invalida os índices ---
+
+    def executar_lote(self, tipo_lote: str, chave: str, linhas: list):
+        super().executar_lote(tipo_lote, chave, linhas)
+        self._invalidar_indices()
+
+    def remover_recursos(self, uris: list):
+        super().remover_recursos(uris)
+        self._invalidar_indices()
+
+    def retrair_recursos(self, tipo: str, uris: list):
+        super().retrair_recursos(tipo, uris)
+        self._invalidar_indices()
+
+    def _invalidar_indices(self):
+        self._por_tipo = None
+        self._pais = None
+        self._indice = None
+        self._tabelas = {}
+        self._associacoes = {}
+
+    def _garantir_indices(self):
+        if self._por_tipo is not None:
+            return
+        por_tipo = defaultdict(list)
+        for uri, no in self.nos.items():
+            for label in no["labels"]:
+                por_tipo[label].append(uri)
+        pais = {}
+        for rel in set().union(*RELACOES_POR_MODO.values()):
+            pais[rel] = defaultdict(set)
+            for filho, pai in self.relacoes.get(rel, ()):
+                pais[rel][filho].add(pai)
+        indice = IndiceAncestrais()
+        for uri, no in self.nos.items():
+            indice.adicionar_no(uri, no["labels"] - {"Resource"})
+        for rel in RELACOES_ESPACIAIS:
+            for filho, pai in sorted(self.relacoes.get(rel, ())):
+                indice.adicionar_aresta(filho, pai)
+        # _por_tipo é atribuído por último: é ele que sinaliza índices prontos
+        # para as demais threads
+        self._indice = indice.construir()
+        self._pais = pais
+        self._por_tipo = por_tipo
+
+    # --- Avaliação de regras ---
+
+    def nos_do_tipo(self, tipo: str) -> list:
+        self._garantir_indices()
+        return self._por_tipo.get(tipo, [])
+
+    def indice_ancestrais(self) -> IndiceAncestrais:
+        self._garantir_indices()
+        return self._indice
+
+    def contagens_tipos(self) -> dict:
+        """Número de nós por label, tirado do índice por tipo."""
+        self._garantir_indices()
+        return {tipo: len(uris) for tipo, uris in self._por_tipo.items()}
+
+    def tipos_pais(self, uri: str, modo: str) -> frozenset:
+        """Tipos dos nós que contêm `uri` no modo dado (ver MODO_*)."""
+        if modo == MODO_ANCESTRAL:
+            return self._indice.tipos_ancestrais(uri)
+        tipos = set()
+        for rel in RELACOES_POR_MODO[modo]:
+            for pai in self._pais[rel].get(uri, ()):
+                tipos |= self.nos[pai]["labels"]
+        return tipos
+
+    def colunas(self, tipo_filho: str, nomes=None) -> TabelaPropriedades:
+        """
+        Tabela com as propriedades qualificadas ("Conjunto.Propriedade") dos
+        nós do tipo. É montada uma vez por tipo e reaproveitada até a
+        próxima escrita; `nomes` existe só pela simetria com o BackendNeo4j.
+        """
+        self._garantir_indices()
+        tabela = self._tabelas.get(tipo_filho)
+        if tabela is None:
+            uris = self._por_tipo.get(tipo_filho, [])
+            props = [self.nos[uri]["props"] for uri in uris]
+            tabela = TabelaPropriedades.de_valores(
+                uris, [p.get("label") for p in props],
+                [{k: v for k, v in p.items() if "." in k} for p in props])
+            self._tabelas[tipo_filho] = tabela
+        return tabela
+
+    def associacoes(self, tipo_filho: str) -> IndiceAssociacoes:
+        """Índice de material/tipo dos nós do tipo, montado uma vez até a próxima escrita."""
+        self._garantir_indices()
+        indice = self._associacoes.get(tipo_filho)
+        if indice is None:
+            uris = self._por_tipo.get(tipo_filho, [])
+            props = [self.nos[uri]["props"] for uri in uris]
+            indice = IndiceAssociacoes.de_valores(uris, [p.get("label") for p in props], props)
+            self._associacoes[tipo_filho] = indice
+        return indice
+
+    def verificar_contido_em(self, tipo_filho: str, tipo_pai: str, modo: str = MODO_DIRETO) -> list:
+        return self.verificar_plano({tipo_filho: [(0, tipo_pai, modo)]}).get(0, [])
+
+    def verificar_plano(self, plano: dict) -> dict:
+        self.preparar_plano(plano)
+        return reunir_resultados(self.iterar_plano(plano))
+
+    def preparar_plano(self, plano: dict):
+        """
+        Carrega a contenção geométrica adiada por de_ifc se o plano tiver
+        regras MODO_GEOMETRICO. Deve ser chamado antes de iterar_plano (e
+        das threads que o dividem): a escrita invalida os índices.
+        """
+        if usa_geometria(plano):
+            self.carregar_geometria()
+
+    def iterar_plano(self, plano: dict):
+        self._garantir_indices()
+        for tipo_filho, regras in plano.items():
+            relacionais, por_modo = separar_regras(regras)
+            pendentes = anomalias_colunares(self, tipo_filho, por_modo)
+            yield from intercalar_anomalias(self._iterar_relacionais(tipo_filho, relacionais), pendentes)
+
+    def _iterar_relacionais(self, tipo_filho: str, regras: list):
+        if regras:
+            for uri in self._por_tipo.get(tipo_filho, []):
+                # Tipos que contêm o nó, calculados uma vez por modo para todas as regras
+                tipos_por_modo = {}
+                for id_regra, tipo_pai, modo in regras:
+                    tipos_pais = tipos_por_modo.get(modo)
+                    if tipos_pais is None:
+                        tipos_pais = tipos_por_modo[modo] = self.tipos_pais(uri, modo)
+                    if tipo_pai not in tipos_pais:
+                        yield id_regra, {
+                            "elemento_anomalo": self.nos[uri]["props"].get("label"),
+                            "id": uri,
+                            "tipo": tipo_filho,
+                        }
@@ -0,0 +1,215 @@
+# benchmark.py
+
+"""
+Benchmark de escala do pipeline IFC -> grafo -> auditoria.
+
+Para cada tamanho pedido, gera um modelo IFC sintético (ver
+gerador_ifc_sintetico.py) e cronometra cada etapa:
+
+    abertura_ifc, extracao, contencao_geometrica, construcao_rdf, escrita_grafo,
+    parse_regras, execucao_regras, relatorio
+
+registrando tempo, vazão (itens/s) e pico de memória. Os resultados são
+acrescentados, uma linha JSON por execução, ao arquivo de saída, para que
+regressões possam ser acompanhadas ao longo do tempo.
+
+Por padrão o grafo é o BackendMemoria (sem servidor); com --backend neo4j
+as etapas de escrita e execução usam o Neo4j configurado.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+
+import ifcopenshell  # type: ignore
+from rdflib import Graph as RdfGraph  # type: ignore
+
+from gerador_ifc_sintetico import gerar_modelo_sintetico
+from extracao_ifc import (iterar_elementos, iterar_contencoes, iterar_relacoes, iterar_propriedades,
+                          iterar_contencao_geometrica, gerar_triplas)
+from persistencia_lote import EscritorEmLote, DestinoNeo4j, TAMANHO_LOTE_PADRAO
+from backend_grafo import BackendMemoria, BackendNeo4j
+from bim_auditor import AuditorRegras, ColetorAnomalias
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo (MB), quando disponível."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS, em bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+class MedidorEtapas:
+    """Cronometra etapas e guarda tempo, vazão e memória de cada uma."""
+
+    def __init__(self, rastrear_memoria: bool = False):
+        self.rastrear_memoria = rastrear_memoria
+        self.etapas = {}
+
+    @contextmanager
+    def etapa(self, nome: str):
+        """
+        Mede o bloco. O dicionário entregue pode receber 'itens' (quantidade
+        processada) para o cálculo da vazão.
+        """
+        registro = {"itens": None}
+        if self.rastrear_memoria:
+            tracemalloc.reset_peak()
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            segundos = time.perf_counter() - inicio
+            registro["segundos"] = segundos
+            if registro["itens"] is not None and segundos > 0:
+                registro["itens_por_segundo"] = registro["itens"] / segundos
+            if self.rastrear_memoria:
+                registro["pico_python_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            registro["pico_rss_mb"] = pico_rss_mb()
+            self.etapas[nome] = registro
+            print(f"   ⏱️ {nome}: {segundos:.3f}s" +
+                  (f" ({registro['itens_por_segundo']:.0f} itens/s)" if "itens_por_segundo" in registro else ""))
+
+
+def executar_benchmark(caminho_ifc: str, caminho_regras: str, backend: str = "memoria",
+                       tamanho_lote: int = TAMANHO_LOTE_PADRAO, rastrear_memoria: bool = False) -> dict:
+    """Executa todas as etapas sobre um arquivo IFC já gerado."""
+    medidor = MedidorEtapas(rastrear_memoria)
+
+    with medidor.etapa("abertura_ifc") as m:
+        ifc = ifcopenshell.open(caminho_ifc)
+        m["itens"] = len(ifc.by_type('IfcProduct'))
+
+    with medidor.etapa("extracao") as m:
+        elementos = list(iterar_elementos(ifc))
+        contencoes = list(iterar_contencoes(ifc))
+        relacoes = list(iterar_relacoes(ifc))
+        propriedades = list(iterar_propriedades(ifc))
+        m["itens"] = len(elementos) + len(contencoes) + len(relacoes) + len(propriedades)
+
+    # Etapa opcional da extração, medida à parte: as regras DENTRO_DE dependem dela
+    with medidor.etapa("contencao_geometrica") as m:
+        geometricas = list(iterar_contencao_geometrica(ifc))
+        relacoes += geometricas
+        m["itens"] = len(geometricas)
+
+    with medidor.etapa("construcao_rdf") as m:
+        rdf_graph = RdfGraph()
+        for tripla in gerar_triplas(elementos, contencoes, relacoes=relacoes, propriedades=propriedades):
+            rdf_graph.add(tripla)
+        m["itens"] = len(rdf_graph)
+
+    if backend == "neo4j":
+        from importador_com_rdf import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+        grafo = BackendNeo4j(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+        grafo.graph.delete_all()
+        destino = DestinoNeo4j(grafo.graph)
+    else:
+        grafo = BackendMemoria()
+        destino = grafo
+
+    with medidor.etapa("escrita_grafo") as m:
+        escritor = EscritorEmLote(destino, tamanho_lote=tamanho_lote)
+        escritor.adicionar_todas(rdf_graph)
+        escritor.descarregar()
+        m["itens"] = escritor.triplas
+
+    # O grafo RDF não é mais necessário: libera a memória antes das regras
+    del rdf_graph
+
+    auditor = AuditorRegras(backend=grafo, usar_cache=False)
+    with open(caminho_regras, 'r', encoding='utf-8') as f:
+        regras = [(i, linha.strip()) for i, linha in enumerate(f, 1)
+                  if linha.strip() and not linha.strip().startswith(('//', '#'))]
+
+    with medidor.etapa("parse_regras") as m:
+        plano, tipos_por_regra = auditor.compilar_regras(regras)
+        m["itens"] = len(regras)
+
+    caminho_relatorio = os.path.join(tempfile.gettempdir(), "benchmark_anomalias.txt")
+    coletor = ColetorAnomalias(caminho_relatorio)
+    with medidor.etapa("execucao_regras") as m:
+        # As anomalias são gravadas no relatório em fluxo durante esta etapa
+        auditor.executar_plano(plano, coletor)
+        m["itens"] = len(elementos)
+
+    with medidor.etapa("relatorio") as m:
+        coletor.fechar()
+        m["itens"] = coletor.guids_gravados
+
+    return {
+        "etapas": medidor.etapas,
+        "anomalias": sum(coletor.contagens.values()),
+        "regras": len(tipos_por_regra),
+    }
+
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser_arg = argparse.ArgumentParser(description="Benchmark de escala do auditor BIM")
+    parser_arg.add_argument("--andares", type=int, default=10, help="Número de andares do modelo sintético")
+    parser_arg.add_argument("--elementos-por-andar", type=int, nargs="+", default=[100, 1000],
+                            help="Um ou mais tamanhos (elementos por andar) a medir")
+    parser_arg.add_argument("--fracao-orfaos", type=float, default=0.05,
+                            help="Fração de paredes, portas e janelas sem contenção")
+    parser_arg.add_argument("--semente", type=int, default=42, help="Semente do gerador")
+    parser_arg.add_argument("--regras", type=str, default=os.path.join(script_dir, "regras.txt"),
+                            help="Arquivo de regras usado na auditoria")
+    parser_arg.add_argument("--backend", choices=["memoria", "neo4j"], default="memoria",
+                            help="Grafo usado nas etapas de escrita e execução")
+    parser_arg.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE_PADRAO,
+                            help="Tamanho dos lotes de escrita")
+    parser_arg.add_argument("--rastrear-memoria", action="store_true",
+                            help="Mede o pico de alocações Python por etapa (tracemalloc; mais lento)")
+    parser_arg.add_argument("--saida", type=str, default="benchmark_resultados.jsonl",
+                            help="Arquivo JSON lines onde os resultados são acrescentados")
+    parser_arg.add_argument("--manter-ifc", action="store_true",
+                            help="Não apaga os modelos sintéticos gerados")
+    args = parser_arg.parse_args()
+
+    if args.rastrear_memoria:
+        tracemalloc.start()
+
+    for elementos_por_andar in args.elementos_por_andar:
+        print(f"\n=== 📐 {args.andares} andares x {elementos_por_andar} elementos por andar ===")
+        caminho_ifc = os.path.join(
+            tempfile.gettempdir(), f"sintetico_{args.andares}x{elementos_por_andar}_{args.semente}.ifc")
+
+        inicio = time.perf_counter()
+        modelo = gerar_modelo_sintetico(caminho_ifc, args.andares, elementos_por_andar,
+                                        args.fracao_orfaos, args.semente)
+        print(f"   🏗️ Modelo gerado em {time.perf_counter() - inicio:.2f}s: {modelo['produtos']} produtos")
+
+        try:
+            resultado = executar_benchmark(caminho_ifc, args.regras, args.backend,
+                                           args.tamanho_lote, args.rastrear_memoria)
+        finally:
+            if not args.manter_ifc:
+                os.remove(caminho_ifc)
+
+        registro = {
+            "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "backend": args.backend,
+            "tamanho_lote": args.tamanho_lote,
+            "modelo": modelo,
+            **resultado,
+        }
+        with open(args.saida, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro) + "\n")
+        print(f"   ✅ {resultado['anomalias']} anomalias; resultados acrescentados a '{args.saida}'")
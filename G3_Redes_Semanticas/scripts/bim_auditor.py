@@ -1,15 +1,29 @@
 # bim_auditor.py (VERSÃO CORRIGIDA)
 
 import os
+import ast
+import argparse
 from lark import Lark, Tree # type: ignore
-from py2neo import Graph # type: ignore
 from typing import Optional
 import traceback
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from backend_grafo import (BackendNeo4j, BackendMemoria, cypher_contido_em, cypher_colunas, MODO_DIRETO,
+                           cypher_associacoes, MODO_ANCESTRAL, MODO_HOSPEDAGEM, MODO_GEOMETRICO,
+                           MODO_PROPRIEDADE, MODO_ASSOCIACAO)
+from colunas_propriedades import OPERADOR_ENTRE, OPERADOR_EXISTE
+from indice_associacoes import ASSOCIACAO_MATERIAL, ASSOCIACAO_TIPO
+from cache_regras import chave_compilacao, caminho_cache, ler_cache, gravar_cache
+from instrumentacao import Instrumentacao
+from exportacao_anomalias import ExportadorAnomalias, FORMATOS_EXPORTACAO
+from analise_regras import analisar_regras, MOTIVO_SEM_INSTANCIAS, MOTIVO_DUPLICADA, MOTIVO_IMPLICADA
 
 # --- CONFIGURAÇÕES E MAPEAMENTOS ---
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "17091980")
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+IFC_FILE_PATH = '../modelo_ifc/Building-Architecture.ifc'
 
 MAPA_TIPOS = {
     "PAREDE": "IfcWall", "LAJE": "IfcSlab", "VIGA": "IfcBeam", "PILAR": "IfcColumn",
@@ -17,32 +31,182 @@ MAPA_TIPOS = {
     "PORTA": "IfcDoor", "JANELA": "IfcWindow"
 }
 
+# Regras de hospedagem: um elemento hospedado (porta, janela) "contido em" um
+# hospedeiro não está na árvore espacial, e sim recortado nele por uma
+# abertura. Essas regras são avaliadas pela aresta isHostedBy (MODO_HOSPEDAGEM).
+TIPOS_HOSPEDADOS = {"IfcDoor", "IfcWindow"}
+TIPOS_HOSPEDEIROS = {"IfcWall", "IfcSlab", "IfcBeam", "IfcColumn"}
+
+# Nó da árvore de parsing -> modo de avaliação da regra (ver backend_grafo)
+MODOS_REGRA = {
+    "verificar_contido_em": MODO_DIRETO,
+    "verificar_contido_em_transitivo": MODO_ANCESTRAL,
+    "verificar_dentro_de": MODO_GEOMETRICO,
+    "verificar_propriedade": MODO_PROPRIEDADE,
+    "verificar_associacao": MODO_ASSOCIACAO,
+}
+
+# Token ASSOCIACAO da gramática -> associação verificada (ver indice_associacoes)
+ASSOCIACOES_REGRA = {"MATERIAL": ASSOCIACAO_MATERIAL, "TIPO": ASSOCIACAO_TIPO}
+
+# Nó da condição de uma regra de propriedade -> operador do critério
+OPERADORES_CONDICAO = {"intervalo": OPERADOR_ENTRE, "existe": OPERADOR_EXISTE}
+
+def valor_condicao(node):
+    """Valor Python de um nó `valor` da gramática (número, texto ou booleano)."""
+    if node.data == "verdadeiro":
+        return True
+    if node.data == "falso":
+        return False
+    token = node.children[0].value
+    if node.data == "texto":
+        return ast.literal_eval(token)
+    return float(token) if any(c in token for c in ".eE") else int(token)
+
+def montar_plano(tipos_por_regra: dict) -> dict:
+    """
+    Agrupa as regras {id: (filho, pai, modo)} em {filho: [(id, pai, modo), ...]}.
+    Nas regras de propriedade, o lugar do pai é ocupado pelo critério.
+    """
+    plano = {}
+    for idx, (tipo_filho, tipo_pai, modo) in tipos_por_regra.items():
+        plano.setdefault(tipo_filho, []).append((idx, tipo_pai, modo))
+    return plano
+
+def guid_da_uri(uri) -> str:
+    """Extrai o GUID do final da URI do elemento."""
+    return uri.split('#')[-1] if uri else "GUID_NULO"
+
+class ColetorAnomalias:
+    """
+    Recebe as linhas anômalas em fluxo e grava os GUIDs diretamente no
+    relatório, mantendo em memória apenas a contagem e as primeiras
+    amostras de cada regra. Pode ser usado por várias threads.
+
+    Com um ExportadorAnomalias, cada par (regra, elemento) também vai para
+    a exportação estruturada (ver exportacao_anomalias).
+
+    Regras duplicadas (ver analise_regras) não são executadas: `duplicadas`
+    mapeia a regra executada para as suas cópias, que recebem as mesmas
+    linhas. As linhas das regras em `sem_guids` só entram nas contagens e
+    na exportação (usado para regras implicadas cujos elementos já foram
+    gravados por uma regra mais forte).
+
+    O relatório é sempre criado (vazio, se não houver anomalias). Depois
+    de fechar, registrar não faz nada: uma linha atrasada (ex.: de
+    uma consulta abandonada por timeout) não reabre nem trunca o relatório.
+    """
+
+    AMOSTRAS_POR_REGRA = 5
+
+    def __init__(self, caminho_relatorio: str, exportador: ExportadorAnomalias = None):
+        self.caminho_relatorio = caminho_relatorio
+        self.exportador = exportador
+        self.contagens = {}
+        self.amostras = {}
+        self.guids_gravados = 0
+        self.duplicadas = {}
+        self.sem_guids = set()
+        self._arquivo = None
+        self._ultimo_por_tipo = {}
+        self._fechado = False
+        self._lock = threading.Lock()
+
+    def registrar(self, id_regra, linha: dict):
+        with self._lock:
+            if self._fechado:
+                return
+            guid = guid_da_uri(linha.get('id'))
+            tipo = linha.get('tipo')
+            for id_destino in (id_regra, *self.duplicadas.get(id_regra, ())):
+                self.contagens[id_destino] = self.contagens.get(id_destino, 0) + 1
+                amostras = self.amostras.setdefault(id_destino, [])
+                if len(amostras) < self.AMOSTRAS_POR_REGRA:
+                    amostras.append(linha)
+                if self.exportador is not None:
+                    self.exportador.registrar(id_destino, guid, tipo, linha.get('elemento_anomalo'))
+            if id_regra in self.sem_guids:
+                return
+
+            # As linhas de um mesmo elemento (várias regras do mesmo tipo
+            # filho) chegam em sequência: basta comparar com a anterior do
+            # mesmo tipo para não repetir o GUID no relatório
+            if self._ultimo_por_tipo.get(tipo) == guid:
+                return
+            self._ultimo_por_tipo[tipo] = guid
+
+            if self._arquivo is None:
+                self._arquivo = open(self.caminho_relatorio, 'w', encoding='utf-8')
+            self._arquivo.write(f"{guid}\n")
+            self.guids_gravados += 1
+
+    def fechar(self):
+        with self._lock:
+            if self._fechado:
+                return
+            self._fechado = True
+            if self._arquivo is None:
+                # Sem anomalias, o relatório fica vazio: um relatório anterior
+                # do mesmo caminho não pode sobreviver com GUIDs antigos
+                self._arquivo = open(self.caminho_relatorio, 'w', encoding='utf-8')
+            self._arquivo.close()
+            self._arquivo = None
+            if self.exportador is not None:
+                self.exportador.fechar()
+
 class AuditorRegras:
-    def __init__(self, uri: str, user: str, password: str):
-        self.graph = None
-        self.parser = None
+    def __init__(self, uri: str = None, user: str = None, password: str = None, backend=None,
+                 usar_cache: bool = True, concorrencia: int = 1, timeout_regra: float = None,
+                 instrumentacao: Instrumentacao = None, detalhado: bool = False, analisar: bool = True):
+        """
+        :param uri, user, password: Dados de conexão com o Neo4j
+        :param backend: Backend de grafo já pronto (ex.: BackendMemoria);
+                        se omitido, conecta ao Neo4j com os dados acima
+        :param usar_cache: Reutiliza as regras compiladas salvas em disco
+        :param concorrencia: Número de consultas executadas ao mesmo tempo
+                             (também limita o pool de conexões do Neo4j)
+        :param timeout_regra: Tempo máximo, em segundos, de cada consulta;
+                              None = sem limite
+        :param instrumentacao: Recebe os spans (parse, tradução e execução de
+                               cada regra) e os contadores da auditoria
+        :param detalhado: Mostra a árvore de parsing e a query de cada regra
+        :param analisar: Analisa as regras antes da execução (ver analise_regras),
+                         dispensando duplicadas, implicadas e sem instâncias no modelo
+        """
+        self.backend = backend
+        self.usar_cache = usar_cache
+        self.concorrencia = max(1, concorrencia)
+        self.timeout_regra = timeout_regra
+        self.analisar = analisar
+        self.instrumentacao = instrumentacao or Instrumentacao()
+        # Saída de depuração por regra: desligada no modo silencioso
+        self.detalhado = detalhado and not self.instrumentacao.silencioso
+        self.conteudo_gramatica = None
+        self._parser = None
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         
         # Conectar ao Neo4j
-        try:
-            self.graph = Graph(uri, auth=(user, password))
-            self.graph.run("RETURN 1")
-            print("✅ Conexão com Neo4j estabelecida com sucesso.")
-        except Exception as e:
-            print(f"❌ Erro fatal ao conectar com Neo4j: {e}")
-            raise
+        if self.backend is None:
+            try:
+                self.backend = BackendNeo4j(uri, user, password, max_conexoes=self.concorrencia)
+                self.instrumentacao.info("✅ Conexão com Neo4j estabelecida com sucesso.")
+            except Exception as e:
+                print(f"❌ Erro fatal ao conectar com Neo4j: {e}")
+                raise
         
-        # Carregar gramática
+        # Carregar gramática (o parser só é construído se alguma regra
+        # precisar ser compilada; ver a propriedade `parser`)
         try:
             caminho_gramatica = os.path.join(self.script_dir, 'gramatica.lark')
-            print(f"🔍 Procurando gramática em: {caminho_gramatica}")
+            if self.detalhado:
+                print(f"🔍 Procurando gramática em: {caminho_gramatica}")
             
             with open(caminho_gramatica, 'r', encoding='utf-8') as f:
-                conteudo_gramatica = f.read()
-                print(f"📖 Conteúdo da gramática carregado ({len(conteudo_gramatica)} caracteres)")
-                self.parser = Lark(conteudo_gramatica)
+                self.conteudo_gramatica = f.read()
+                if self.detalhado:
+                    print(f"📖 Conteúdo da gramática carregado ({len(self.conteudo_gramatica)} caracteres)")
                 
-            print("✅ Gramática carregada com sucesso.")
+            self.instrumentacao.info("✅ Gramática carregada com sucesso.")
         except FileNotFoundError:
             print(f"❌ Arquivo 'gramatica.lark' não encontrado no diretório: {self.script_dir}")
             raise
@@ -50,24 +214,62 @@ class AuditorRegras:
             print(f"❌ Erro ao carregar gramática: {e}")
             raise
 
+    @property
+    def parser(self) -> Lark:
+        """Parser LALR da gramática, construído sob demanda.
+
+        Com cache=True o Lark serializa as tabelas LALR em disco, então
+        mesmo a construção do parser é quase instantânea nas execuções seguintes.
+        """
+        if self._parser is None:
+            self._parser = Lark(self.conteudo_gramatica, parser="lalr", cache=True)
+        return self._parser
+
     def traduzir_regra(self, arvore_parse) -> Optional[str]:
         """
         Traduz a árvore de parsing para uma query Cypher
-        Estrutura esperada: verificar_contido_em -> [tipo_elemento, tipo_elemento]
+        """
+        tipos = self.interpretar_regra(arvore_parse)
+        if not tipos:
+            return None
+        if tipos[2] == MODO_PROPRIEDADE:
+            # O critério é avaliado fora do banco, sobre as colunas lidas por esta query
+            query = cypher_colunas(tipos[0])
+        elif tipos[2] == MODO_ASSOCIACAO:
+            query = cypher_associacoes(tipos[0])
+        else:
+            query = cypher_contido_em(*tipos)
+        if self.detalhado:
+            print(f"🔧 Query Cypher gerada:\n{query}")
+        return query
+
+    def interpretar_regra(self, arvore_parse) -> Optional[tuple]:
+        """
+        Extrai da árvore de parsing os tipos IFC (filho, pai) e o modo da regra
+        Estrutura esperada: verificar_contido_em[_transitivo] | verificar_dentro_de -> [tipo_elemento, tipo_elemento]
+        ou verificar_propriedade -> [tipo_elemento, nome_propriedade, condicao], que
+        retorna (filho, critério, MODO_PROPRIEDADE), ou verificar_associacao ->
+        [tipo_elemento, ASSOCIACAO], que retorna (filho, associação, MODO_ASSOCIACAO)
         """
         try:
-            print(f"🔍 Analisando árvore de parsing: {arvore_parse.pretty()}")
+            if self.detalhado:
+                print(f"🔍 Analisando árvore de parsing: {arvore_parse.pretty()}")
             
-            # Procurar pela regra verificar_contido_em
+            # Procurar pela regra verificar_contido_em (direta ou transitiva) ou verificar_dentro_de
             verificar_node = None
             for child in arvore_parse.iter_subtrees():
-                if child.data == 'verificar_contido_em':
+                if child.data in MODOS_REGRA:
                     verificar_node = child
                     break
             
             if not verificar_node:
                 print("❌ Nó 'verificar_contido_em' não encontrado na árvore")
                 return None
+            modo = MODOS_REGRA[verificar_node.data]
+            if modo == MODO_PROPRIEDADE:
+                return self.interpretar_regra_propriedade(verificar_node)
+            if modo == MODO_ASSOCIACAO:
+                return self.interpretar_regra_associacao(verificar_node)
             
             # Extrair os tipos de elementos (filho e pai)
             tipos_elementos = []
@@ -83,7 +285,8 @@ class AuditorRegras:
                 return None
             
             tipo_filho, tipo_pai = tipos_elementos
-            print(f"📋 Regra extraída - Filho: {tipo_filho}, Pai: {tipo_pai}")
+            if self.detalhado:
+                print(f"📋 Regra extraída - Filho: {tipo_filho}, Pai: {tipo_pai}")
             
             # Mapear para tipos IFC
             ifc_tipo_filho = MAPA_TIPOS.get(tipo_filho)
@@ -93,47 +296,256 @@ class AuditorRegras:
                 print(f"⚠️ Tipo desconhecido na regra. Filho: '{tipo_filho}', Pai: '{tipo_pai}'")
                 return None
             
-            print(f"🔄 Mapeamento IFC - Filho: {ifc_tipo_filho}, Pai: {ifc_tipo_pai}")
-            
-            # Construir query Cypher
-            rel_type = "isContainedIn"
-            query = f"""
-            MATCH (filho:{ifc_tipo_filho})
-            WHERE NOT (filho)-[:`{rel_type}`]->(:{ifc_tipo_pai})
-            RETURN filho.label as elemento_anomalo, 
-                   filho.uri as id, 
-                   '{ifc_tipo_filho}' as tipo
-            """
-            
-            print(f"🔧 Query Cypher gerada:\n{query}")
-            return query
+            if modo == MODO_DIRETO and ifc_tipo_filho in TIPOS_HOSPEDADOS and ifc_tipo_pai in TIPOS_HOSPEDEIROS:
+                modo = MODO_HOSPEDAGEM
+
+            if self.detalhado:
+                print(f"🔄 Mapeamento IFC - Filho: {ifc_tipo_filho}, Pai: {ifc_tipo_pai} ({modo})")
+            return ifc_tipo_filho, ifc_tipo_pai, modo
             
         except Exception as e:
             print(f"❌ Erro ao traduzir a regra: {e}")
             traceback.print_exc()
             return None
 
-    def executar_auditoria(self, arquivo_regras: str = 'regras.txt'):
-        print("\n🧠 Iniciando Auditoria com Motor de Regras")
-        print("=" * 50)
+    def interpretar_regra_propriedade(self, verificar_node) -> Optional[tuple]:
+        """
+        Extrai de um nó verificar_propriedade o tipo IFC do elemento e o
+        critério {"propriedade", "operador", "valores"} (ver colunas_propriedades)
+        """
+        tipo_node, nome_node, condicao_node = verificar_node.children
+        tipo_filho = tipo_node.children[0].value.upper()
+        ifc_tipo_filho = MAPA_TIPOS.get(tipo_filho)
+        if not ifc_tipo_filho:
+            print(f"⚠️ Tipo desconhecido na regra. Elemento: '{tipo_filho}'")
+            return None
+
+        valores = [valor_condicao(c) for c in condicao_node.children if isinstance(c, Tree)]
+        if condicao_node.data == "comparacao":
+            operador = condicao_node.children[0].value
+        else:
+            operador = OPERADORES_CONDICAO[condicao_node.data]
+        criterio = {"propriedade": nome_node.children[0].value, "operador": operador, "valores": valores}
+
+        if self.detalhado:
+            print(f"🔄 Mapeamento IFC - Elemento: {ifc_tipo_filho}, Critério: {criterio} ({MODO_PROPRIEDADE})")
+        return ifc_tipo_filho, criterio, MODO_PROPRIEDADE
+
+    def interpretar_regra_associacao(self, verificar_node) -> Optional[tuple]:
+        """Extrai de um nó verificar_associacao o tipo IFC do elemento e a associação exigida"""
+        tipo_node, associacao = verificar_node.children
+        tipo_filho = tipo_node.children[0].value.upper()
+        ifc_tipo_filho = MAPA_TIPOS.get(tipo_filho)
+        if not ifc_tipo_filho:
+            print(f"⚠️ Tipo desconhecido na regra. Elemento: '{tipo_filho}'")
+            return None
+        if self.detalhado:
+            print(f"🔄 Mapeamento IFC - Elemento: {ifc_tipo_filho}, Associação: {associacao.value} "
+                  f"({MODO_ASSOCIACAO})")
+        return ifc_tipo_filho, ASSOCIACOES_REGRA[associacao.value], MODO_ASSOCIACAO
+
+    def compilar_regras(self, regras: list):
+        """
+        Faz o parsing de todas as regras e as agrupa por tipo de elemento filho.
+
+        :param regras: Lista de (número da linha, texto da regra)
+        :return: (plano, tipos_por_regra), onde plano é {tipo_filho: [(id_regra, tipo_pai, modo), ...]}
+                 e tipos_por_regra é {id_regra: (tipo_filho, tipo_pai, modo)}; os ids
+                 são as posições (1..n) das regras na lista
+        """
+        tipos_por_regra = {}
+        etapa = self.instrumentacao.etapa
+        for idx, (linha_num, regra_txt) in enumerate(regras, 1):
+            try:
+                with etapa("parse", regra=idx):
+                    arvore = self.parser.parse(regra_txt)
+                with etapa("traducao", regra=idx):
+                    tipos = self.interpretar_regra(arvore)
+            except Exception as e:
+                print(f"❌ Erro ao compilar a regra da linha {linha_num} ('{regra_txt}'): {e}")
+                continue
+            if not tipos:
+                continue
+            tipos_por_regra[idx] = tipos
+        return montar_plano(tipos_por_regra), tipos_por_regra
+
+    def compilar_regras_com_cache(self, caminho_regras: str, texto_regras: str, regras: list):
+        """
+        Igual a compilar_regras, mas reutiliza o resultado salvo em disco
+        enquanto a gramática, o arquivo de regras e os mapeamentos de tipos não mudarem.
+        """
+        mapeamentos = {"tipos": MAPA_TIPOS, "hospedados": sorted(TIPOS_HOSPEDADOS),
+                       "hospedeiros": sorted(TIPOS_HOSPEDEIROS)}
+        chave = chave_compilacao(self.conteudo_gramatica, texto_regras, mapeamentos)
+        arquivo_cache = caminho_cache(self.script_dir, caminho_regras)
+
+        compilado = ler_cache(arquivo_cache, chave) if self.usar_cache else None
+        self.instrumentacao.incrementar("cache_regras", resultado="acerto" if compilado is not None else "falta")
+        if compilado is not None:
+            self.instrumentacao.info(f"⚡ Regras compiladas carregadas do cache: {arquivo_cache}")
+            tipos_por_regra = {int(idx): tuple(tipos) for idx, tipos in compilado.items()}
+            return montar_plano(tipos_por_regra), tipos_por_regra
+
+        plano, tipos_por_regra = self.compilar_regras(regras)
+        try:
+            gravar_cache(arquivo_cache, chave, {str(idx): list(tipos) for idx, tipos in tipos_por_regra.items()})
+        except OSError as e:
+            print(f"⚠️ Não foi possível salvar o cache de regras: {e}")
+        return plano, tipos_por_regra
+
+    def executar_plano(self, plano: dict, coletor):
+        """
+        Executa o plano compilado no backend, entregando cada linha anômala
+        ao coletor assim que ela chega (nada é materializado em listas).
+
+        Cada grupo do plano (um tipo de elemento filho) é uma consulta
+        independente; com concorrencia > 1 os grupos são despachados em
+        paralelo. O coletor agrega por id de regra, então a ordem do
+        relatório não depende da ordem de conclusão.
+
+        Com timeout_regra, as linhas de cada grupo só são entregues quando
+        ele termina dentro do prazo: um grupo abandonado (cuja thread segue
+        até o próximo registro) não deixa linhas parciais no relatório nem
+        nas contagens.
+
+        :param coletor: ColetorAnomalias que recebe as linhas
+        :return: falhas_por_regra, que mapeia o id da regra para a mensagem
+                 de erro ou de timeout
+        """
+        # Um span por grupo: as regras de um mesmo tipo filho são avaliadas
+        # juntas, então o tempo de execução é medido por consulta
+        def rotulos(tipo_filho, regras):
+            return {"tipo_filho": tipo_filho, "regras": ",".join(str(id_regra) for id_regra, *_ in regras)}
+
+        # Antes das threads: carregar o que o plano exige invalida os índices do backend
+        self.backend.preparar_plano(plano)
+
+        if self.concorrencia <= 1 and self.timeout_regra is None:
+            for tipo_filho, regras in plano.items():
+                with self.instrumentacao.etapa("execucao", **rotulos(tipo_filho, regras)) as dados:
+                    linhas = 0
+                    for id_regra, linha in self.backend.iterar_plano({tipo_filho: regras}):
+                        coletor.registrar(id_regra, linha)
+                        linhas += 1
+                    dados["linhas"] = linhas
+            return {}
+
+        falhas = {}
+        inicio_por_grupo = {}
+        cancelados = set()
+        entregues = set()
+        trava = threading.Lock()  # abandono e entrega de um grupo se excluem
+
+        def executar_grupo(tipo_filho, regras):
+            inicio_por_grupo[tipo_filho] = time.monotonic()
+            # Com limite de tempo, as linhas ficam retidas até o fim do grupo:
+            # as de um grupo abandonado nunca chegam ao coletor
+            retidas = None if self.timeout_regra is None else []
+            with self.instrumentacao.etapa("execucao", **rotulos(tipo_filho, regras)) as dados:
+                linhas = 0
+                for id_regra, linha in self.backend.iterar_plano({tipo_filho: regras}):
+                    if tipo_filho in cancelados:
+                        # Interrompe o consumo do cursor de uma consulta abandonada
+                        break
+                    if retidas is None:
+                        coletor.registrar(id_regra, linha)
+                    else:
+                        retidas.append((id_regra, linha))
+                    linhas += 1
+                dados["linhas"] = linhas
+            if retidas is not None:
+                with trava:
+                    if tipo_filho in cancelados:
+                        return
+                    entregues.add(tipo_filho)
+                for id_regra, linha in retidas:
+                    coletor.registrar(id_regra, linha)
+
+        pool = ThreadPoolExecutor(max_workers=self.concorrencia)
+        try:
+            pendentes = {
+                pool.submit(executar_grupo, tipo_filho, regras): (tipo_filho, regras)
+                for tipo_filho, regras in plano.items()
+            }
+            while pendentes:
+                concluidos, _ = wait(pendentes, timeout=0.05, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    _, regras = pendentes.pop(futuro)
+                    try:
+                        futuro.result()
+                    except Exception as e:
+                        for id_regra, *_ in regras:
+                            falhas[id_regra] = f"Erro ao executar a regra: {e}"
+
+                if self.timeout_regra is None:
+                    continue
+                # Consultas em andamento há mais tempo que o limite são abandonadas
+                # (no Neo4j, configure db.transaction.timeout para encerrá-las no servidor)
+                agora = time.monotonic()
+                for futuro, (tipo_filho, regras) in list(pendentes.items()):
+                    inicio = inicio_por_grupo.get(tipo_filho)
+                    if inicio is not None and agora - inicio > self.timeout_regra:
+                        with trava:
+                            if tipo_filho in entregues:
+                                # Terminou no prazo e está entregando as linhas
+                                continue
+                            cancelados.add(tipo_filho)
+                        del pendentes[futuro]
+                        for id_regra, *_ in regras:
+                            falhas[id_regra] = f"Tempo limite de {self.timeout_regra}s excedido."
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return falhas
+
+    def carregar_regras(self, caminho_regras: str):
+        """
+        Lê o arquivo de regras.
+
+        :return: (texto do arquivo, número de linhas, lista de (número da linha, regra))
+                 sem linhas vazias nem comentários
+        """
+        with open(caminho_regras, 'r', encoding='utf-8') as f:
+            texto_regras = f.read()
+        todas_linhas = texto_regras.splitlines()
+
+        # Filtrar linhas válidas
+        regras = []
+        for i, linha in enumerate(todas_linhas, 1):
+            linha_limpa = linha.strip()
+            if linha_limpa and not linha_limpa.startswith(('//', '#')):
+                regras.append((i, linha_limpa))
+        return texto_regras, len(todas_linhas), regras
+
+    def executar_auditoria(self, arquivo_regras: str = 'regras.txt', caminho_relatorio: str = None,
+                           caminho_exportacao: str = None, formato_exportacao: str = None):
+        """
+        Compila e executa as regras, grava o relatório de GUIDs e imprime o resumo.
+
+        :param arquivo_regras: Arquivo de regras (relativo ao diretório do script)
+        :param caminho_relatorio: Onde gravar os GUIDs anômalos; por padrão,
+                                  anomalias_detectadas.txt no diretório do script
+        :param caminho_exportacao: Se informado, grava também a exportação
+                                   estruturada (regra, tipo, GUID, índice)
+        :param formato_exportacao: 'jsonl' ou 'binario'; por padrão, inferido da extensão
+        :return: Resumo {regras, regras_com_anomalias, conformidade, anomalias_por_regra,
+                 falhas, ignoradas, guids_relatorio, relatorio, exportacao}, ou None se a
+                 auditoria não pôde ser executada
+        """
+        info = self.instrumentacao.info
+        etapa = self.instrumentacao.etapa
+        falar = not self.instrumentacao.silencioso
+        info("\n🧠 Iniciando Auditoria com Motor de Regras")
+        info("=" * 50)
         
-        guids_anomalos = []
         caminho_regras = os.path.join(self.script_dir, arquivo_regras)
         
         # Carregar regras
         try:
-            print(f"📂 Carregando regras de: {caminho_regras}")
-            with open(caminho_regras, 'r', encoding='utf-8') as f:
-                todas_linhas = f.readlines()
-            
-            # Filtrar linhas válidas
-            regras = []
-            for i, linha in enumerate(todas_linhas, 1):
-                linha_limpa = linha.strip()
-                if linha_limpa and not linha_limpa.startswith(('//', '#')):
-                    regras.append((i, linha_limpa))
-                    
-            print(f"📋 {len(regras)} regras válidas encontradas de {len(todas_linhas)} linhas totais")
+            info(f"📂 Carregando regras de: {caminho_regras}")
+            with etapa("carregar_regras"):
+                texto_regras, total_linhas, regras = self.carregar_regras(caminho_regras)
+            info(f"📋 {len(regras)} regras válidas encontradas de {total_linhas} linhas totais")
             
         except FileNotFoundError:
             print(f"❌ Arquivo de regras '{arquivo_regras}' não encontrado.")
@@ -144,75 +556,232 @@ class AuditorRegras:
 
         total_regras = len(regras)
         regras_com_anomalias = 0
-        
-        # Processar cada regra
-        for idx, (linha_num, regra_txt) in enumerate(regras, 1):
-            print(f"\n📋 Regra {idx}/{total_regras} (linha {linha_num}): '{regra_txt}'")
-            
-            try:
-                # Fazer parsing da regra
-                print("🔍 Fazendo parsing da regra...")
-                arvore = self.parser.parse(regra_txt)
-                
-                # Traduzir para Cypher
-                print("🔄 Traduzindo para Cypher...")
-                cypher_query = self.traduzir_regra(arvore)
-                
-                if not cypher_query:
-                    print("   - ❌ Falha na tradução da regra.")
+
+        # 1. Compilar todas as regras em um único plano de execução
+        with etapa("compilacao"):
+            plano, tipos_por_regra = self.compilar_regras_com_cache(caminho_regras, texto_regras, regras)
+
+        # Análise do conjunto de regras: só o que pode ter resultado novo vai ao backend
+        analise = None
+        if self.analisar and tipos_por_regra:
+            with etapa("analise_regras"):
+                analise = analisar_regras(tipos_por_regra, self.backend.contagens_tipos())
+            plano = montar_plano(analise.ativas)
+            info(f"🧹 Análise das regras: {len(analise.por_motivo(MOTIVO_DUPLICADA))} duplicada(s), "
+                 f"{len(analise.por_motivo(MOTIVO_IMPLICADA))} implicada(s), "
+                 f"{len(analise.por_motivo(MOTIVO_SEM_INSTANCIAS))} sem instâncias no modelo")
+
+        # 2. Avaliar o plano inteiro: uma passada por tipo de elemento filho,
+        #    verificando de uma vez todas as restrições de pai desse tipo.
+        #    As linhas são gravadas no relatório à medida que chegam.
+        caminho_anomalias = caminho_relatorio or os.path.join(self.script_dir, 'anomalias_detectadas.txt')
+        exportador = None
+        if caminho_exportacao:
+            exportador = ExportadorAnomalias(
+                caminho_exportacao, {idx: regra_txt for idx, (_, regra_txt) in enumerate(regras, 1)},
+                formato_exportacao)
+        coletor = ColetorAnomalias(caminho_anomalias, exportador)
+        implicadas_executadas = set()
+        if analise is not None:
+            coletor.duplicadas = analise.duplicadas_por_original()
+        try:
+            total_plano = sum(len(grupo) for grupo in plano.values())
+            info(f"\n🚀 Executando {total_plano} regra(s) em {len(plano)} passada(s) no backend de grafo...")
+            with etapa("execucao_plano"):
+                falhas_por_regra = self.executar_plano(plano, coletor)
+
+            # Regras implicadas: só são executadas se nenhuma regra que as
+            # implica terminou sem anomalias. Se uma delas terminou sem falha,
+            # os elementos da implicada já estão no relatório e os GUIDs não
+            # são regravados; se todas falharam, a implicada grava os seus
+            if analise is not None:
+                adiadas = {idx: tipos_por_regra[idx] for idx in analise.por_motivo(MOTIVO_IMPLICADA)
+                           if analise.implicante_conforme(idx, coletor.contagens, falhas_por_regra) is None}
+                if adiadas:
+                    implicadas_executadas.update(adiadas)
+                    coletor.sem_guids = {
+                        idx for idx in adiadas
+                        if analise.implicante_completa(idx, coletor.contagens, falhas_por_regra) is not None}
+                    info(f"🔁 Executando {len(adiadas)} regra(s) implicada(s) por regras com anomalias...")
+                    with etapa("execucao_implicadas"):
+                        falhas_por_regra.update(self.executar_plano(montar_plano(adiadas), coletor))
+                for original, copias in coletor.duplicadas.items():
+                    if original in falhas_por_regra:
+                        falhas_por_regra.update(dict.fromkeys(copias, falhas_por_regra[original]))
+        except Exception as e:
+            print(f"❌ Erro inesperado ao executar o plano de regras: {e}")
+            traceback.print_exc()
+            return
+        finally:
+            coletor.fechar()
+
+        # 3. Relatório por regra, na ordem do arquivo
+        with etapa("relatorio"):
+            for idx, (linha_num, regra_txt) in enumerate(regras, 1):
+                if falar:
+                    print(f"\n📋 Regra {idx}/{total_regras} (linha {linha_num}): '{regra_txt}'")
+
+                if idx not in tipos_por_regra:
+                    self.instrumentacao.incrementar("regras", situacao="falha_traducao")
+                    info("   - ❌ Falha na tradução da regra.")
                     continue
-                
-                # Executar query
-                print("🚀 Executando query no Neo4j...")
-                resultados = self.graph.run(cypher_query).data()
-                
-                if resultados:
+
+                motivo, referencias = analise.ignoradas.get(idx, (None, None)) if analise else (None, None)
+                if motivo == MOTIVO_SEM_INSTANCIAS:
+                    self.instrumentacao.incrementar("regras", situacao="ignorada")
+                    info(f"   - ⏭️ Ignorada: nenhum elemento {tipos_por_regra[idx][0]} no modelo.")
+                    continue
+                if motivo == MOTIVO_IMPLICADA and idx not in implicadas_executadas:
+                    forte = analise.implicante_conforme(idx, coletor.contagens, falhas_por_regra)
+                    self.instrumentacao.incrementar("regras", situacao="ignorada")
+                    info(f"   - ⏭️ Ignorada: implicada pela regra {forte} (linha {regras[forte - 1][0]}), "
+                         "que não tem anomalias.")
+                    continue
+                if motivo == MOTIVO_DUPLICADA:
+                    original = referencias[0]
+                    info(f"   - ♻️ Duplicada da regra {original} (linha {regras[original - 1][0]}): "
+                         "resultado reaproveitado.")
+
+                if idx in falhas_por_regra:
+                    self.instrumentacao.incrementar("regras", situacao="falha_execucao")
+                    if falar:
+                        print(f"   - ❌ {falhas_por_regra[idx]}")
+                    continue
+
+                total = coletor.contagens.get(idx, 0)
+                self.instrumentacao.incrementar("linhas_anomalas", total, regra=idx)
+                if total:
                     regras_com_anomalias += 1
-                    print(f"   - 🚨 ANOMALIA DETECTADA: {len(resultados)} elemento(s) encontrado(s)")
-                    
-                    for r in resultados[:5]:
-                        uri = r.get('id')
-                        guid_limpo = uri.split('#')[-1] if uri else "GUID_NULO"
-                        guids_anomalos.append(guid_limpo)
-                        print(f"     - {r.get('elemento_anomalo')} (ID: {guid_limpo})")
-                    
-                    if len(resultados) > 5:
-                        print(f"     ... e mais {len(resultados) - 5} outros.")
+                    self.instrumentacao.incrementar("regras", situacao="com_anomalias")
+                    if falar:
+                        print(f"   - 🚨 ANOMALIA DETECTADA: {total} elemento(s) encontrado(s)")
+                        for r in coletor.amostras[idx]:
+                            print(f"     - {r.get('elemento_anomalo')} (ID: {guid_da_uri(r.get('id'))})")
+                        if total > len(coletor.amostras[idx]):
+                            print(f"     ... e mais {total - len(coletor.amostras[idx])} outros.")
                 else:
-                    print("   - ✅ Nenhuma anomalia encontrada.")
-                    
-            except Exception as e:
-                print(f"   - ❌ Erro inesperado ao processar a regra: {e}")
-                traceback.print_exc()
-
-        # Salvar relatório de anomalias
-        if guids_anomalos:
-            caminho_anomalias = os.path.join(self.script_dir, 'anomalias_detectadas.txt')
-            with open(caminho_anomalias, 'w', encoding='utf-8') as f:
-                for guid in set(guids_anomalos):
-                    f.write(f"{guid}\n")
-            print(f"\n✅ Relatório de GUIDs anômalos salvo em: '{caminho_anomalias}'")
+                    self.instrumentacao.incrementar("regras", situacao="conforme")
+                    info("   - ✅ Nenhuma anomalia encontrada.")
+        self.instrumentacao.incrementar("guids_relatorio", coletor.guids_gravados)
+
+        if coletor.guids_gravados:
+            info(f"\n✅ Relatório com {coletor.guids_gravados} GUIDs anômalos salvo em: '{caminho_anomalias}'")
+        if exportador is not None:
+            self.instrumentacao.incrementar("registros_exportados", exportador.registros)
+            info(f"📤 Exportação {exportador.formato} com {exportador.registros} registro(s) de "
+                 f"{exportador.elementos} elemento(s) salva em: '{caminho_exportacao}'")
         
         # Resumo final
-        print("\n" + "=" * 50)
-        print("📊 RESUMO DA AUDITORIA:")
+        taxa_conformidade = None
+        info("\n" + "=" * 50)
+        info("📊 RESUMO DA AUDITORIA:")
         if total_regras > 0:
             taxa_conformidade = ((total_regras - regras_com_anomalias) / total_regras) * 100
-            print(f"   - Total de regras processadas: {total_regras}")
-            print(f"   - Regras com anomalias: {regras_com_anomalias}")
-            print(f"   - Taxa de conformidade: {taxa_conformidade:.1f}%")
+            info(f"   - Total de regras processadas: {total_regras}")
+            info(f"   - Regras com anomalias: {regras_com_anomalias}")
+            info(f"   - Taxa de conformidade: {taxa_conformidade:.1f}%")
         else:
-            print("   - Nenhuma regra válida foi encontrada para processar.")
-        print("=" * 50)
+            info("   - Nenhuma regra válida foi encontrada para processar.")
+        info("=" * 50)
+
+        return {
+            "regras": total_regras,
+            "regras_com_anomalias": regras_com_anomalias,
+            "conformidade": taxa_conformidade,
+            "anomalias_por_regra": {regra_txt: coletor.contagens[idx]
+                                    for idx, (_, regra_txt) in enumerate(regras, 1) if coletor.contagens.get(idx)},
+            "falhas": {regras[idx - 1][1]: msg for idx, msg in falhas_por_regra.items()},
+            "ignoradas": {regras[idx - 1][1]: motivo for idx, (motivo, _) in analise.ignoradas.items()
+                          if idx not in implicadas_executadas} if analise else {},
+            "guids_relatorio": coletor.guids_gravados,
+            "relatorio": caminho_anomalias if coletor.guids_gravados else None,
+            "exportacao": caminho_exportacao if exportador is not None else None,
+        }
 
 
 # --- EXECUÇÃO PRINCIPAL ---
 if __name__ == "__main__":
+    parser_arg = argparse.ArgumentParser(description="Auditor de regras BIM")
+    parser_arg.add_argument(
+        "--backend", choices=["neo4j", "memoria"], default="neo4j",
+        help="Onde avaliar as regras: servidor Neo4j ou grafo em memória"
+    )
+    parser_arg.add_argument(
+        "--ifc", type=str, default=IFC_FILE_PATH,
+        help="Arquivo IFC carregado pelo backend em memória"
+    )
+    parser_arg.add_argument(
+        "--snapshot", action="store_true",
+        help="No backend em memória, usa (ou cria) o snapshot colunar do modelo"
+    )
+    parser_arg.add_argument(
+        "--regras", type=str, default="regras.txt",
+        help="Arquivo de regras (.txt)"
+    )
+    parser_arg.add_argument(
+        "--sem-cache", action="store_true",
+        help="Ignora o cache de regras compiladas e recompila o arquivo de regras"
+    )
+    parser_arg.add_argument(
+        "--sem-analise", action="store_true",
+        help="Executa todas as regras, sem dispensar duplicadas, implicadas e sem instâncias no modelo"
+    )
+    parser_arg.add_argument(
+        "--concorrencia", type=int, default=1,
+        help="Número de consultas de regras executadas ao mesmo tempo"
+    )
+    parser_arg.add_argument(
+        "--timeout-regra", type=float, default=None,
+        help="Tempo máximo (s) de cada consulta de regra"
+    )
+    parser_arg.add_argument(
+        "--detalhado", action="store_true",
+        help="Mostra a árvore de parsing e a query gerada para cada regra"
+    )
+    parser_arg.add_argument(
+        "--silencioso", action="store_true",
+        help="Não imprime mensagens de progresso (apenas erros)"
+    )
+    parser_arg.add_argument(
+        "--metricas", type=str, default=None,
+        help="Arquivo onde os spans e contadores da execução são exportados"
+    )
+    parser_arg.add_argument(
+        "--formato-metricas", choices=["jsonl", "prometheus"], default="jsonl",
+        help="Formato do arquivo de métricas"
+    )
+    parser_arg.add_argument(
+        "--exportar", type=str, default=None,
+        help="Arquivo da exportação estruturada das anomalias (regra, tipo, GUID, índice)"
+    )
+    parser_arg.add_argument(
+        "--formato-exportacao", choices=FORMATOS_EXPORTACAO, default=None,
+        help="Formato da exportação; por padrão, 'jsonl' para .jsonl e 'binario' para as demais extensões"
+    )
+    args = parser_arg.parse_args()
+
+    instrumentacao = Instrumentacao(silencioso=args.silencioso)
     try:
-        print("🚀 Iniciando BIM Auditor...")
-        auditor = AuditorRegras(uri=NEO4J_URI, user=NEO4J_USER, password=NEO4J_PASSWORD)
-        auditor.executar_auditoria(arquivo_regras='regras.txt')
+        instrumentacao.info("🚀 Iniciando BIM Auditor...")
+        if args.backend == "memoria":
+            instrumentacao.info(f"📦 Carregando '{args.ifc}' no backend em memória...")
+            with instrumentacao.etapa("carga_backend", backend="memoria"):
+                backend = BackendMemoria.de_ifc(args.ifc, args.snapshot, info=instrumentacao.info)
+            auditor = AuditorRegras(backend=backend, usar_cache=not args.sem_cache,
+                                    concorrencia=args.concorrencia, timeout_regra=args.timeout_regra,
+                                    instrumentacao=instrumentacao, detalhado=args.detalhado,
+                                    analisar=not args.sem_analise)
+        else:
+            auditor = AuditorRegras(uri=NEO4J_URI, user=NEO4J_USER, password=NEO4J_PASSWORD,
+                                    usar_cache=not args.sem_cache, concorrencia=args.concorrencia,
+                                    timeout_regra=args.timeout_regra, instrumentacao=instrumentacao,
+                                    detalhado=args.detalhado, analisar=not args.sem_analise)
+        auditor.executar_auditoria(arquivo_regras=args.regras, caminho_exportacao=args.exportar,
+                                   formato_exportacao=args.formato_exportacao)
         
     except Exception as e:
         print(f"\n❌ O programa foi encerrado devido a um erro fatal: {e}")
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
+    finally:
+        if args.metricas:
+            instrumentacao.exportar(args.metricas, args.formato_metricas)
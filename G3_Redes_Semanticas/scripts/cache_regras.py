@@ -0,0 +1,58 @@
+# cache_regras.py
+
+"""
+Cache em disco das regras compiladas.
+
+A compilação de um arquivo de regras (parsing + tradução para o plano de
+execução) só depende da gramática, do texto das regras e do mapeamento de
+tipos. O resultado é salvo em JSON sob uma chave formada pelos hashes
+desses três insumos; enquanto nenhum deles mudar, o auditor reutiliza o
+plano salvo e não precisa nem construir o parser.
+"""
+
+import os
+import json
+import hashlib
+
+# Incrementar sempre que o formato do plano compilado mudar
+VERSAO_CACHE = 4
+
+DIRETORIO_CACHE = ".cache_regras"
+
+
+def chave_compilacao(texto_gramatica: str, texto_regras: str, mapa_tipos: dict) -> str:
+    """Chave do cache: hash da gramática, das regras e do mapeamento de tipos."""
+    h = hashlib.sha256()
+    for parte in (str(VERSAO_CACHE), texto_gramatica, texto_regras,
+                  json.dumps(mapa_tipos, sort_keys=True)):
+        h.update(hashlib.sha256(parte.encode("utf-8")).digest())
+    return h.hexdigest()
+
+
+def caminho_cache(diretorio_base: str, caminho_regras: str) -> str:
+    """Arquivo de cache associado a um arquivo de regras."""
+    nome = os.path.basename(caminho_regras)
+    sufixo = hashlib.sha1(os.path.abspath(caminho_regras).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(diretorio_base, DIRETORIO_CACHE, f"{nome}.{sufixo}.json")
+
+
+def ler_cache(caminho: str, chave: str):
+    """Retorna o conteúdo compilado salvo, ou None se ausente ou desatualizado."""
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if dados.get("chave") != chave:
+        return None
+    return dados.get("compilado")
+
+
+def gravar_cache(caminho: str, chave: str, compilado):
+    """Salva o conteúdo compilado (JSON) de forma atômica."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    # Temporário por processo: vários auditores podem gravar o mesmo cache
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({"chave": chave, "compilado": compilado}, f)
+    os.replace(temporario, caminho)
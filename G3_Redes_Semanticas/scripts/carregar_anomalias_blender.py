@@ -0,0 +1,139 @@
+# carregar_anomalias_blender.py
+
+"""
+Carrega uma exportação de anomalias (ver exportacao_anomalias) na cena do
+Blender e destaca os elementos anômalos.
+
+Uso, na linha de comando do Blender:
+
+    blender modelo.blend --python carregar_anomalias_blender.py -- anomalias.bin [--por-regra] [--regra N]
+
+ou pelo editor de texto do Blender, ajustando ARQUIVO_PADRAO.
+
+Os objetos importados pelo complemento "BIM" do arquivo .blend guardam o
+GlobalId na propriedade customizada IFC_GUID. Em vez de procurar cada GUID
+do relatório entre os objetos da cena, o carregador monta um índice
+{GUID: objeto} em uma única passada por bpy.data.objects e resolve todos os
+elementos da exportação com consultas ao dicionário.
+
+O destaque também é feito em bloco: uma desseleção, uma passada pelos
+objetos encontrados (select_set, marca BIM_VIOLATION e cor do objeto) e um
+único update da view layer no fim. A cor vai em `obj.color`, exibida no
+sombreamento Solid com a cor por objeto — sem duplicar nem alterar
+materiais, que são compartilhados entre objetos e custariam uma cópia por
+elemento em relatórios grandes.
+"""
+
+import os
+import sys
+import colorsys
+
+try:
+    import bpy  # type: ignore
+except ImportError:  # fora do Blender: só as funções de leitura ficam disponíveis
+    bpy = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from exportacao_anomalias import ler_anomalias  # noqa: E402
+
+ARQUIVO_PADRAO = "anomalias_detectadas.bin"
+PROPRIEDADE_GUID = "IFC_GUID"
+MARCA_VIOLACAO = "BIM_VIOLATION"
+COR_VIOLACAO = (1.0, 0.1, 0.1, 1.0)
+
+
+def indice_guids(objetos) -> dict:
+    """Índice GUID -> objeto, em uma passada (sem IFC_GUID, vale o nome do objeto)."""
+    return {obj.get(PROPRIEDADE_GUID, obj.name): obj for obj in objetos}
+
+
+def paleta(quantidade: int) -> list:
+    """`quantidade` cores RGBA bem separadas no círculo de matiz."""
+    return [(*colorsys.hsv_to_rgb(i / max(quantidade, 1), 0.85, 1.0), 1.0) for i in range(quantidade)]
+
+
+def cores_dos_elementos(anomalias, por_regra: bool) -> list:
+    """Cor de cada elemento da exportação: única ou pela primeira regra violada."""
+    if not por_regra:
+        return [COR_VIOLACAO] * len(anomalias.guids)
+    ids = sorted(anomalias.regras) or sorted(set(anomalias.regra.tolist()))
+    cor_por_regra = dict(zip(ids, paleta(len(ids))))
+    return [cor_por_regra.get(id_regra, COR_VIOLACAO) for id_regra in anomalias.primeira_regra().tolist()]
+
+
+def destacar(anomalias, contexto, por_regra: bool = False, regra: int = None) -> dict:
+    """
+    Seleciona e colore, em bloco, os objetos dos elementos anômalos.
+
+    :param anomalias: Exportação lida por ler_anomalias
+    :param contexto: bpy.context
+    :param por_regra: Uma cor por regra (a da primeira regra violada pelo elemento)
+    :param regra: Se informado, destaca só os elementos que violam essa regra
+    :return: {"elementos", "encontrados", "ausentes"}
+    """
+    indice = indice_guids(bpy.data.objects)
+    cores = cores_dos_elementos(anomalias, por_regra)
+    posicoes = anomalias.elementos_da_regra(regra).tolist() if regra is not None else range(len(anomalias.guids))
+
+    for obj in contexto.selected_objects:
+        obj.select_set(False)
+
+    encontrados, ausentes, ativo = 0, 0, None
+    for i in posicoes:
+        obj = indice.get(anomalias.guids[i])
+        if obj is None:
+            ausentes += 1
+            continue
+        obj.select_set(True)
+        obj[MARCA_VIOLACAO] = True
+        obj.color = cores[i]
+        ativo = ativo or obj
+        encontrados += 1
+
+    if ativo is not None:
+        contexto.view_layer.objects.active = ativo
+    # Cor por objeto no sombreamento Solid das vistas 3D abertas
+    for area in contexto.screen.areas if contexto.screen else ():
+        if area.type == 'VIEW_3D':
+            area.spaces.active.shading.color_type = 'OBJECT'
+    contexto.view_layer.update()
+    return {"elementos": len(posicoes), "encontrados": encontrados, "ausentes": ausentes}
+
+
+def limpar_destaques(contexto):
+    """Desfaz os destaques: tira a marca BIM_VIOLATION, a cor do objeto e a seleção."""
+    for obj in bpy.data.objects:
+        if MARCA_VIOLACAO in obj:
+            del obj[MARCA_VIOLACAO]
+            obj.color = (1.0, 1.0, 1.0, 1.0)
+            obj.select_set(False)
+    contexto.view_layer.update()
+
+
+def argumentos_do_blender() -> list:
+    """Argumentos do script: os que vêm depois de '--' na linha de comando do Blender."""
+    return sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+
+if __name__ == "__main__":
+    import argparse
+
+    if bpy is None:
+        print("❌ Este script deve ser executado dentro do Blender.")
+        sys.exit(1)
+
+    parser_arg = argparse.ArgumentParser(description="Destaca no Blender as anomalias exportadas pelo auditor")
+    parser_arg.add_argument("arquivo", nargs="?",
+                            default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ARQUIVO_PADRAO),
+                            help="Exportação de anomalias (.jsonl ou binária)")
+    parser_arg.add_argument("--por-regra", action="store_true", help="Uma cor por regra violada")
+    parser_arg.add_argument("--regra", type=int, default=None, help="Destaca só os elementos desta regra")
+    args = parser_arg.parse_args(argumentos_do_blender())
+
+    print(f"📂 Lendo anomalias de: {args.arquivo}")
+    anomalias = ler_anomalias(args.arquivo)
+    print(f"📋 {len(anomalias)} registro(s), {len(anomalias.guids)} elemento(s), {len(anomalias.regras)} regra(s)")
+    resumo = destacar(anomalias, bpy.context, por_regra=args.por_regra, regra=args.regra)
+    print(f"✅ {resumo['encontrados']} objeto(s) destacados de {resumo['elementos']} elemento(s)")
+    if resumo["ausentes"]:
+        print(f"⚠️ {resumo['ausentes']} GUID(s) sem objeto correspondente na cena")
@@ -0,0 +1,205 @@
+# colunas_propriedades.py
+
+"""
+Colunas tipadas de propriedades e avaliação vetorizada das regras de
+PROPRIEDADE / QUANTIDADE.
+
+As propriedades dos elementos de um tipo IFC são reunidas em uma
+TabelaPropriedades: um vetor de URIs e, por coluna ("Conjunto.Propriedade",
+ver extracao_ifc.nome_coluna), um array NumPy alinhado a ele — float64 (com
+NaN para valor ausente) quando todos os valores são numéricos ou booleanos,
+object (com None) quando há texto.
+
+Cada regra vira um predicado NumPy sobre a coluna inteira, e não um filtro
+por nó: o custo por elemento é o de uma comparação vetorial, qualquer que
+seja o número de propriedades do elemento.
+
+O critério de uma regra é um dicionário (serializável no cache de regras):
+
+    {"propriedade": "NetVolume", "operador": ">", "valores": [0]}
+
+A propriedade pode ser qualificada pelo conjunto
+("Qto_WallBaseQuantities.NetVolume") ou só pelo nome, caso em que vale a
+primeira coluna de qualquer conjunto com esse nome que tenha valor. Um
+elemento sem a propriedade não atende ao critério.
+"""
+
+import numpy as np
+
+OPERADOR_ENTRE = "ENTRE"
+OPERADOR_EXISTE = "EXISTE"
+
+# Igualdade numérica com tolerância relativa: quantidades exportadas por
+# ferramentas de autoria carregam ruído de ponto flutuante (200.0000000000007)
+TOLERANCIA_IGUALDADE = 1e-9
+
+
+def _iguais(a, b):
+    if isinstance(a, np.ndarray) and a.dtype == object:
+        return np.equal(a, b).astype(bool)
+    return np.isclose(a, b, rtol=TOLERANCIA_IGUALDADE, atol=0.0)
+
+
+def _diferentes(a, b):
+    return ~_iguais(a, b)
+
+
+OPERADORES_COMPARACAO = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "=": _iguais,
+    "!=": _diferentes,
+}
+
+
+def _numerico(valor) -> bool:
+    return isinstance(valor, (bool, int, float))
+
+
+def coluna_tipada(valores: list) -> np.ndarray:
+    """Array float64 (NaN = ausente) se todos os valores forem numéricos; senão object (None = ausente)."""
+    if all(v is None or _numerico(v) for v in valores):
+        return np.array([np.nan if v is None else float(v) for v in valores], dtype=np.float64)
+    coluna = np.empty(len(valores), dtype=object)
+    coluna[:] = valores
+    return coluna
+
+
+def presentes(coluna: np.ndarray) -> np.ndarray:
+    """Máscara dos elementos que têm valor na coluna."""
+    if coluna.dtype == object:
+        return np.array([v is not None for v in coluna], dtype=bool)
+    return ~np.isnan(coluna)
+
+
+def _como_objetos(coluna: np.ndarray) -> np.ndarray:
+    """Versão object de uma coluna, com None nos valores ausentes."""
+    if coluna.dtype == object:
+        return coluna.copy()
+    objetos = coluna.astype(object)
+    objetos[np.isnan(coluna)] = None
+    return objetos
+
+
+def como_numeros(coluna: np.ndarray) -> np.ndarray:
+    """Versão float64 de uma coluna: textos não numéricos viram NaN."""
+    if coluna.dtype != object:
+        return coluna
+    numeros = np.full(len(coluna), np.nan)
+    for i, v in enumerate(coluna):
+        if _numerico(v):
+            numeros[i] = float(v)
+        elif isinstance(v, str):
+            try:
+                numeros[i] = float(v)
+            except ValueError:
+                pass
+    return numeros
+
+
+class TabelaPropriedades:
+    """Propriedades dos elementos de um tipo IFC, em colunas alinhadas às URIs."""
+
+    def __init__(self, uris: list, rotulos: list, colunas: dict):
+        """
+        :param uris: URIs dos elementos (uma por linha da tabela)
+        :param rotulos: Rótulo (nome) de cada elemento, para o relatório
+        :param colunas: Nome qualificado -> array alinhado a `uris`
+        """
+        self.uris = uris
+        self.rotulos = rotulos
+        self.colunas = colunas
+
+    def __len__(self):
+        return len(self.uris)
+
+    @classmethod
+    def de_valores(cls, uris: list, rotulos: list, valores: list):
+        """
+        Monta a tabela a partir de um dicionário {coluna: valor} por elemento.
+        Uma única passada reúne os valores; os tipos são decididos por coluna.
+        """
+        brutas = {}
+        for i, valores_elemento in enumerate(valores):
+            for nome, valor in valores_elemento.items():
+                coluna = brutas.get(nome)
+                if coluna is None:
+                    coluna = brutas[nome] = [None] * len(uris)
+                coluna[i] = valor
+        return cls(uris, rotulos, {nome: coluna_tipada(coluna) for nome, coluna in brutas.items()})
+
+    def resolver(self, propriedade: str) -> list:
+        """Colunas que respondem por `propriedade` (nome qualificado ou simples)."""
+        if propriedade in self.colunas:
+            return [propriedade]
+        sufixo = "." + propriedade
+        return sorted(nome for nome in self.colunas if nome.endswith(sufixo))
+
+    def coluna(self, propriedade: str) -> np.ndarray:
+        """
+        Valores de `propriedade` por elemento. Com várias colunas candidatas
+        (mesmo nome em conjuntos diferentes), vale a primeira com valor.
+        """
+        nomes = self.resolver(propriedade)
+        if not nomes:
+            return np.full(len(self.uris), np.nan)
+        resultado = self.colunas[nomes[0]]
+        for nome in nomes[1:]:
+            outra = self.colunas[nome]
+            if resultado.dtype != outra.dtype:
+                resultado, outra = _como_objetos(resultado), _como_objetos(outra)
+            else:
+                resultado = resultado.copy()
+            faltantes = ~presentes(resultado)
+            resultado[faltantes] = outra[faltantes]
+        return resultado
+
+
+def avaliar_criterio(tabela: TabelaPropriedades, criterio: dict) -> np.ndarray:
+    """Máscara booleana dos elementos da tabela que atendem ao critério."""
+    coluna = tabela.coluna(criterio["propriedade"])
+    tem_valor = presentes(coluna)
+    operador, valores = criterio["operador"], criterio["valores"]
+    if operador == OPERADOR_EXISTE:
+        return tem_valor
+
+    if all(_numerico(v) for v in valores):
+        numeros = como_numeros(coluna)
+        tem_valor = ~np.isnan(numeros)
+        if operador == OPERADOR_ENTRE:
+            minimo, maximo = sorted(float(v) for v in valores)
+            return tem_valor & (numeros >= minimo) & (numeros <= maximo)
+        with np.errstate(invalid="ignore"):
+            return tem_valor & OPERADORES_COMPARACAO[operador](numeros, float(valores[0]))
+
+    # Comparação de textos: os ausentes viram "" e são descartados pela máscara
+    textos = np.array(["" if v is None else str(v) for v in _como_objetos(coluna)], dtype=object)
+    if operador == OPERADOR_ENTRE:
+        minimo, maximo = sorted(str(v) for v in valores)
+        return tem_valor & (textos >= minimo) & (textos <= maximo)
+    return tem_valor & np.asarray(OPERADORES_COMPARACAO[operador](textos, str(valores[0])), dtype=bool)
+
+
+def anomalias_propriedades(tabela: TabelaPropriedades, tipo_filho: str, regras: list) -> dict:
+    """
+    Avalia as regras de propriedade de um tipo filho sobre a tabela.
+
+    :param regras: Lista de (id_regra, critério, modo)
+    :return: {uri: [(id_regra, linha), ...]} dos elementos que violam alguma
+             regra, na ordem da tabela; linha no formato
+             {"elemento_anomalo", "id", "tipo"} dos backends
+    """
+    if not regras or not len(tabela):
+        return {}
+    violacoes = [(id_regra, ~avaliar_criterio(tabela, criterio)) for id_regra, criterio, _ in regras]
+    algum = np.logical_or.reduce([mascara for _, mascara in violacoes])
+    anomalias = {}
+    for i in np.flatnonzero(algum):
+        uri = tabela.uris[i]
+        anomalias[uri] = [
+            (id_regra, {"elemento_anomalo": tabela.rotulos[i], "id": uri, "tipo": tipo_filho})
+            for id_regra, mascara in violacoes if mascara[i]
+        ]
+    return anomalias
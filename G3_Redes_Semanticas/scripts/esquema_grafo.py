@@ -0,0 +1,106 @@
+# esquema_grafo.py
+
+"""
+Esquema (restrições e índices) do grafo usado pelos importadores e pelo auditor.
+
+- Element.guid e Resource.uri recebem restrições de unicidade: os MERGE/MATCH
+  por chave dos importadores passam a ser buscas no índice em vez de
+  varreduras do label inteiro.
+- Element.ifc_type é indexado (filtro por tipo no esquema do importador semântico).
+- O índice de lookup de labels atende aos MATCH (filho:IfcWall) do auditor.
+- O índice de lookup de tipos de relação atende às regras de hospedagem,
+  que buscam as arestas isHostedBy (porta/janela -> parede) por tipo.
+
+Todos os comandos usam IF NOT EXISTS e podem ser executados a cada importação.
+Executado diretamente, o script cria o esquema e mostra, via EXPLAIN, quais
+operadores o Neo4j escolhe para as consultas típicas.
+"""
+
+import os
+import argparse
+
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "17091980")
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+
+COMANDOS_ESQUEMA = [
+    "CREATE CONSTRAINT element_guid_unico IF NOT EXISTS FOR (n:Element) REQUIRE n.guid IS UNIQUE",
+    "CREATE CONSTRAINT resource_uri_unico IF NOT EXISTS FOR (n:Resource) REQUIRE n.uri IS UNIQUE",
+    "CREATE INDEX element_ifc_type IF NOT EXISTS FOR (n:Element) ON (n.ifc_type)",
+    "CREATE LOOKUP INDEX node_label_lookup IF NOT EXISTS FOR (n) ON EACH labels(n)",
+    "CREATE LOOKUP INDEX rel_type_lookup IF NOT EXISTS FOR ()-[r]-() ON EACH type(r)",
+]
+
+# Consultas típicas e os operadores que indicam uso de índice
+CONSULTAS_VERIFICACAO = {
+    "MERGE/MATCH do importador semântico": (
+        "MATCH (n:Element {guid: $guid}) RETURN n", {"guid": ""},
+        ("NodeUniqueIndexSeek", "NodeIndexSeek"),
+    ),
+    "MERGE/MATCH do importador RDF": (
+        "MATCH (n:Resource {uri: $uri}) RETURN n", {"uri": ""},
+        ("NodeUniqueIndexSeek", "NodeIndexSeek"),
+    ),
+    "Filtro por tipo do auditor": (
+        "MATCH (n:IfcWall) RETURN n", {},
+        ("NodeByLabelScan",),
+    ),
+    "Arestas de hospedagem": (
+        "MATCH (a)-[r:isHostedBy]->(b) RETURN a, b", {},
+        ("DirectedRelationshipTypeScan", "UndirectedRelationshipTypeScan"),
+    ),
+}
+
+
+def garantir_esquema(graph):
+    """Cria (se ainda não existirem) as restrições e os índices do grafo."""
+    for comando in COMANDOS_ESQUEMA:
+        graph.run(comando)
+    # Aguarda os índices ficarem online antes de começar a escrever
+    graph.run("CALL db.awaitIndexes(300)")
+
+
+def operadores_do_plano(plano) -> list:
+    """Lista, em pré-ordem, os operadores de um plano retornado pelo EXPLAIN."""
+    if not plano:
+        return []
+    operadores = [plano.get("operatorType", "").split("@")[0]]
+    for filho in plano.get("children", []):
+        operadores.extend(operadores_do_plano(filho))
+    return operadores
+
+
+def verificar_planos(graph) -> dict:
+    """
+    Executa EXPLAIN nas consultas típicas e informa se cada uma usa índice.
+
+    :return: Dicionário nome -> (usa_indice, operadores)
+    """
+    relatorio = {}
+    for nome, (query, parametros, esperados) in CONSULTAS_VERIFICACAO.items():
+        plano = graph.run(f"EXPLAIN {query}", **parametros).plan()
+        operadores = operadores_do_plano(plano)
+        usa_indice = any(op in esperados for op in operadores)
+        relatorio[nome] = (usa_indice, operadores)
+        marcador = "✅" if usa_indice else "⚠️"
+        print(f"{marcador} {nome}: {' -> '.join(operadores)}")
+    return relatorio
+
+
+if __name__ == "__main__":
+    parser_arg = argparse.ArgumentParser(description="Cria e verifica o esquema do grafo no Neo4j")
+    parser_arg.add_argument(
+        "--verificar", action="store_true",
+        help="Mostra o plano (EXPLAIN) das consultas típicas após criar o esquema"
+    )
+    args = parser_arg.parse_args()
+
+    from py2neo import Graph  # type: ignore
+    try:
+        graph = Graph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        garantir_esquema(graph)
+        print("✅ Restrições e índices garantidos.")
+        if args.verificar:
+            verificar_planos(graph)
+    except Exception as e:
+        print(f"❌ Erro ao preparar o esquema do grafo: {e}")
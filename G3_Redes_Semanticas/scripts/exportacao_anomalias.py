@@ -0,0 +1,232 @@
+# exportacao_anomalias.py
+
+"""
+Exportação estruturada das anomalias da auditoria.
+
+O relatório de texto (anomalias_detectadas.txt) traz só um GUID por linha;
+para a revisão no Blender (ver carregar_anomalias_blender) é preciso saber
+também qual regra falhou e o tipo IFC do elemento. Cada par (regra, elemento)
+anômalo vira um registro com:
+
+    regra   id da regra (posição no arquivo de regras, a partir de 1)
+    tipo    tipo IFC do elemento
+    guid    GlobalId do elemento
+    indice  índice denso do elemento na exportação (ordem de primeira
+            aparição): todas as regras de um mesmo elemento compartilham o
+            índice, que endereça arrays por elemento no carregador
+
+Dois formatos:
+
+- 'jsonl': um cabeçalho ({"formato", "versao", "regras"}) seguido de uma
+  linha JSON por registro, gravada em fluxo; fácil de inspecionar e de
+  processar com outras ferramentas.
+- 'binario': cabeçalho JSON curto e arrays NumPy contíguos — tabela de
+  elementos (GUID de largura fixa + código do tipo) e, por registro, só
+  (regra uint16, índice uint32). O carregador lê tudo com np.frombuffer,
+  sem laço Python por registro.
+
+Layout do binário (little-endian):
+
+    MAGICO (8 bytes) | versão uint32 | tamanho do cabeçalho uint32 |
+    cabeçalho JSON {"regras", "tipos", "largura_guid", "elementos", "registros"} |
+    guids S<largura>[elementos] | tipo uint16[elementos] |
+    regra uint16[registros] | indice uint32[registros]
+"""
+
+import json
+import struct
+from array import array
+
+import numpy as np
+
+FORMATO_JSONL = "jsonl"
+FORMATO_BINARIO = "binario"
+FORMATOS_EXPORTACAO = (FORMATO_JSONL, FORMATO_BINARIO)
+
+VERSAO_EXPORTACAO = 1
+MAGICO = b"BIMANOM\x00"
+_PREAMBULO = struct.Struct("<8sII")
+LARGURA_GUID = 22  # GlobalId IFC comprimido
+
+
+def formato_do_caminho(caminho: str) -> str:
+    """Formato inferido pela extensão do arquivo (.jsonl ou qualquer outra = binário)."""
+    return FORMATO_JSONL if caminho.lower().endswith((".jsonl", ".json")) else FORMATO_BINARIO
+
+
+class ExportadorAnomalias:
+    """
+    Recebe os pares (regra, elemento) anômalos e os grava no formato pedido.
+    No JSONL cada registro é escrito ao chegar; no binário os registros são
+    acumulados em arrays compactos e gravados de uma vez em fechar().
+    """
+
+    def __init__(self, caminho: str, regras: dict, formato: str = None):
+        """
+        :param caminho: Arquivo de saída
+        :param regras: Id da regra -> texto da regra (vai no cabeçalho)
+        :param formato: 'jsonl' ou 'binario'; por padrão, inferido da extensão
+        """
+        formato = formato or formato_do_caminho(caminho)
+        if formato not in FORMATOS_EXPORTACAO:
+            raise ValueError(f"Formato de exportação desconhecido: {formato}")
+        self.caminho = caminho
+        self.formato = formato
+        self.regras = {int(id_regra): texto for id_regra, texto in regras.items()}
+        self.registros = 0
+        self._indices = {}         # guid -> índice do elemento
+        self._guids = []
+        self._tipo_elemento = array('H')
+        self._codigos_tipo = {}    # tipo IFC -> código
+        self._regra = array('H')
+        self._indice = array('I')
+        self._arquivo = None
+        self._fechado = False
+        if formato == FORMATO_JSONL:
+            self._arquivo = open(caminho, 'w', encoding='utf-8')
+            cabecalho = {"formato": "anomalias_bim", "versao": VERSAO_EXPORTACAO,
+                         "regras": {str(k): v for k, v in self.regras.items()}}
+            self._arquivo.write(json.dumps(cabecalho, ensure_ascii=False) + "\n")
+
+    def registrar(self, id_regra: int, guid: str, tipo: str, nome: str = None):
+        """Grava um par (regra, elemento); o índice do elemento é atribuído na primeira aparição."""
+        indice = self._indices.get(guid)
+        if indice is None:
+            indice = self._indices[guid] = len(self._guids)
+            self._guids.append(guid)
+            codigo = self._codigos_tipo.get(tipo)
+            if codigo is None:
+                codigo = self._codigos_tipo[tipo] = len(self._codigos_tipo)
+            self._tipo_elemento.append(codigo)
+        self.registros += 1
+
+        if self.formato == FORMATO_JSONL:
+            registro = {"regra": id_regra, "tipo": tipo, "guid": guid, "indice": indice}
+            if nome is not None:
+                registro["nome"] = nome
+            self._arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        else:
+            self._regra.append(id_regra)
+            self._indice.append(indice)
+
+    @property
+    def elementos(self) -> int:
+        return len(self._guids)
+
+    def fechar(self):
+        if self._fechado:
+            return
+        self._fechado = True
+        if self.formato == FORMATO_JSONL:
+            self._arquivo.close()
+            self._arquivo = None
+            return
+        largura = max([LARGURA_GUID] + [len(g) for g in self._guids])
+        cabecalho = json.dumps({
+            "regras": {str(k): v for k, v in self.regras.items()},
+            "tipos": list(self._codigos_tipo),
+            "largura_guid": largura,
+            "elementos": len(self._guids),
+            "registros": self.registros,
+        }, ensure_ascii=False).encode("utf-8")
+        with open(self.caminho, 'wb') as f:
+            f.write(_PREAMBULO.pack(MAGICO, VERSAO_EXPORTACAO, len(cabecalho)))
+            f.write(cabecalho)
+            f.write(np.array(self._guids, dtype=f"S{largura}").tobytes())
+            f.write(np.frombuffer(self._tipo_elemento, dtype=np.uint16).astype("<u2").tobytes())
+            f.write(np.frombuffer(self._regra, dtype=np.uint16).astype("<u2").tobytes())
+            f.write(np.frombuffer(self._indice, dtype=np.uint32).astype("<u4").tobytes())
+
+
+class AnomaliasExportadas:
+    """Conteúdo de uma exportação, em arrays: a mesma estrutura para os dois formatos."""
+
+    def __init__(self, regras: dict, tipos: list, guids: list, tipo_elemento: np.ndarray,
+                 regra: np.ndarray, indice: np.ndarray):
+        """
+        :param regras: Id da regra -> texto
+        :param tipos: Nomes dos tipos IFC, indexados por `tipo_elemento`
+        :param guids: GUID de cada elemento (posição = índice do elemento)
+        :param tipo_elemento: Código do tipo de cada elemento
+        :param regra, indice: Por registro, id da regra e índice do elemento
+        """
+        self.regras = regras
+        self.tipos = tipos
+        self.guids = guids
+        self.tipo_elemento = tipo_elemento
+        self.regra = regra
+        self.indice = indice
+
+    def __len__(self):
+        return len(self.regra)
+
+    def elementos_da_regra(self, id_regra: int) -> np.ndarray:
+        """Índices (únicos, ordenados) dos elementos que violam a regra."""
+        return np.unique(self.indice[self.regra == id_regra])
+
+    def primeira_regra(self) -> np.ndarray:
+        """Por elemento, o menor id de regra violada (usado para colorir por regra)."""
+        primeira = np.full(len(self.guids), np.iinfo(np.uint16).max, dtype=np.uint16)
+        np.minimum.at(primeira, self.indice, self.regra)
+        return primeira
+
+
+def _ler_jsonl(caminho: str) -> AnomaliasExportadas:
+    with open(caminho, 'r', encoding='utf-8') as f:
+        cabecalho = json.loads(f.readline())
+        registros = [json.loads(linha) for linha in f if linha.strip()]
+    guids, tipos, codigos_tipo, tipo_por_indice = {}, [], {}, {}
+    for r in registros:
+        guids.setdefault(r["indice"], r["guid"])
+        if r["indice"] not in tipo_por_indice:
+            codigo = codigos_tipo.get(r["tipo"])
+            if codigo is None:
+                codigo = codigos_tipo[r["tipo"]] = len(tipos)
+                tipos.append(r["tipo"])
+            tipo_por_indice[r["indice"]] = codigo
+    total = len(guids)
+    return AnomaliasExportadas(
+        regras={int(k): v for k, v in cabecalho.get("regras", {}).items()},
+        tipos=tipos,
+        guids=[guids[i] for i in range(total)],
+        tipo_elemento=np.array([tipo_por_indice[i] for i in range(total)], dtype=np.uint16),
+        regra=np.array([r["regra"] for r in registros], dtype=np.uint16),
+        indice=np.array([r["indice"] for r in registros], dtype=np.uint32),
+    )
+
+
+def _ler_binario(caminho: str) -> AnomaliasExportadas:
+    with open(caminho, 'rb') as f:
+        dados = f.read()
+    magico, versao, tamanho = _PREAMBULO.unpack_from(dados, 0)
+    if magico != MAGICO:
+        raise ValueError(f"'{caminho}' não é uma exportação binária de anomalias.")
+    if versao != VERSAO_EXPORTACAO:
+        raise ValueError(f"Versão de exportação não suportada: {versao}")
+    posicao = _PREAMBULO.size
+    cabecalho = json.loads(dados[posicao:posicao + tamanho].decode("utf-8"))
+    posicao += tamanho
+
+    def fatia(dtype, quantidade):
+        nonlocal posicao
+        valores = np.frombuffer(dados, dtype=dtype, count=quantidade, offset=posicao)
+        posicao += valores.nbytes
+        return valores
+
+    elementos, registros = cabecalho["elementos"], cabecalho["registros"]
+    guids = fatia(f"S{cabecalho['largura_guid']}", elementos)
+    return AnomaliasExportadas(
+        regras={int(k): v for k, v in cabecalho["regras"].items()},
+        tipos=cabecalho["tipos"],
+        guids=guids.astype(str).tolist(),
+        tipo_elemento=fatia("<u2", elementos),
+        regra=fatia("<u2", registros),
+        indice=fatia("<u4", registros),
+    )
+
+
+def ler_anomalias(caminho: str) -> AnomaliasExportadas:
+    """Lê uma exportação de anomalias, reconhecendo o formato pelo conteúdo."""
+    with open(caminho, 'rb') as f:
+        inicio = f.read(len(MAGICO))
+    return _ler_binario(caminho) if inicio == MAGICO else _ler_jsonl(caminho)
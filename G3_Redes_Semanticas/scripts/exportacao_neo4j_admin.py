@@ -0,0 +1,228 @@
+# exportacao_neo4j_admin.py
+
+"""
+Exportação do grafo do importador semântico para a carga offline do Neo4j
+(`neo4j-admin database import full`).
+
+Na primeira carga de um modelo grande, mesmo as transações em lote (UNWIND)
+custam muito mais que o importador offline, que escreve os arquivos do banco
+direto, sem transações nem índices a manter. Em vez de enviar os nós e as
+relações ao servidor, o importador grava o layout que o neo4j-admin espera:
+um arquivo de cabeçalho e um de dados para cada grupo.
+
+    nos_Element.header.csv / nos_Element.csv[.gz]
+        guid:ID(Element), name, ifc_type, entrada:long, saida:long,
+        tipos_ancestrais:string[], e uma coluna tipada por propriedade
+        ("Conjunto.Propriedade"); o label Element vem do argumento --nodes
+    rel_<TIPO>.header.csv / rel_<TIPO>.csv[.gz]
+        :START_ID(Element), :END_ID(Element)
+    esquema.cypher    restrições e índices (esquema_grafo), aplicados depois
+                      da carga com o cypher-shell
+    importar.sh       a linha de comando do neo4j-admin para esses arquivos
+
+O resultado é o mesmo grafo das transações do importador (QUERY_NOS):
+- cada nó tem só o label Element, e o tipo IFC fica na propriedade
+  ifc_type, indexada pelo esquema;
+- os GUIDs repetidos no IFC (que o MERGE fundiria) são gravados uma vez só:
+  vale a primeira ocorrência, e as demais são contadas;
+- as relações são deduplicadas por (filho, pai), como no MERGE, e as que
+  apontam para elementos fora do grafo são descartadas, como no MATCH.
+
+A escrita é em fluxo: cada linha vai para o arquivo (opcionalmente gzip, que
+o neo4j-admin lê direto) assim que é produzida. Os tipos das colunas de
+propriedade precisam ser conhecidos antes da primeira linha e são decididos
+por tipos_das_colunas: long, double, boolean ou, se os valores de uma coluna
+misturam tipos, string.
+"""
+
+import os
+import csv
+import gzip
+import math
+import shlex
+
+ID_ELEMENTOS = "Element"  # espaço de ids e label comum dos nós
+NIVEL_COMPRESSAO = 6      # gzip: quase a taxa do nível 9, bem mais rápido
+DELIMITADOR_ARRAY = ";"
+
+TIPO_LONG = "long"
+TIPO_DOUBLE = "double"
+TIPO_BOOLEAN = "boolean"
+TIPO_STRING = "string"
+
+
+def tipo_valor(valor) -> str:
+    """Tipo de coluna do neo4j-admin para um valor de propriedade."""
+    if isinstance(valor, bool):
+        return TIPO_BOOLEAN
+    if isinstance(valor, int):
+        return TIPO_LONG
+    if isinstance(valor, float):
+        return TIPO_DOUBLE
+    return TIPO_STRING
+
+
+def tipos_das_colunas(propriedades) -> dict:
+    """
+    Tipo de cada coluna de propriedade, a partir das linhas {guid, coluna, valor}
+    da extração: inteiros e reais viram double; qualquer outra mistura, string.
+    """
+    tipos = {}
+    for p in propriedades:
+        if p["valor"] is None:
+            continue
+        novo = tipo_valor(p["valor"])
+        atual = tipos.setdefault(p["coluna"], novo)
+        if atual != novo:
+            tipos[p["coluna"]] = TIPO_DOUBLE if {atual, novo} == {TIPO_LONG, TIPO_DOUBLE} else TIPO_STRING
+    return tipos
+
+
+def formatar_valor(valor, tipo: str) -> str:
+    """Texto do valor no CSV; vazio = propriedade ausente no nó."""
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "true" if valor else "false"
+    if tipo == TIPO_DOUBLE:
+        valor = float(valor)
+        if math.isnan(valor):
+            return "NaN"
+        if math.isinf(valor):
+            return "Infinity" if valor > 0 else "-Infinity"
+        return repr(valor)
+    return str(valor)
+
+
+class ArquivoCsv:
+    """Par cabeçalho + dados de um grupo do neo4j-admin, com os dados gravados em fluxo."""
+
+    def __init__(self, diretorio: str, nome: str, cabecalho: list, comprimir: bool = False):
+        self.cabecalho_caminho = os.path.join(diretorio, f"{nome}.header.csv")
+        self.caminho = os.path.join(diretorio, f"{nome}.csv" + (".gz" if comprimir else ""))
+        self.linhas = 0
+        self.multilinha = False
+        with open(self.cabecalho_caminho, 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerow(cabecalho)
+        if comprimir:
+            self._arquivo = gzip.open(self.caminho, 'wt', encoding='utf-8', newline='',
+                                      compresslevel=NIVEL_COMPRESSAO)
+        else:
+            self._arquivo = open(self.caminho, 'w', encoding='utf-8', newline='')
+        self._escritor = csv.writer(self._arquivo)
+
+    def gravar(self, campos: list):
+        # Quebras de linha dentro de um campo exigem --multiline-fields no neo4j-admin
+        if not self.multilinha:
+            self.multilinha = any('\n' in c or '\r' in c for c in campos)
+        self._escritor.writerow(campos)
+        self.linhas += 1
+
+    def fechar(self):
+        self._arquivo.close()
+
+    def argumento(self) -> str:
+        """Par 'cabeçalho,dados' com caminhos relativos ao diretório da exportação."""
+        return f"{os.path.basename(self.cabecalho_caminho)},{os.path.basename(self.caminho)}"
+
+
+class ExportadorNeo4jAdmin:
+    """
+    Grava os nós e as relações do importador semântico no diretório de
+    exportação. Os nós devem vir antes das relações: as relações só são
+    gravadas entre GUIDs já exportados.
+    """
+
+    def __init__(self, diretorio: str, comprimir: bool = False):
+        """
+        :param diretorio: Diretório da exportação (criado se não existir)
+        :param comprimir: Grava os arquivos de dados com gzip
+        """
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.comprimir = comprimir
+        self.nos = None
+        self.relacoes = {}            # tipo -> ArquivoCsv
+        self.guids_repetidos = 0
+        self.relacoes_descartadas = 0
+        self.colunas_ignoradas = []
+        self._guids = set()
+
+    def exportar_nos(self, elementos, tipos_colunas: dict, indice=None):
+        """
+        :param elementos: Linhas {guid, name, ifc_type, props} (elements_data)
+        :param tipos_colunas: Coluna de propriedade -> tipo (ver tipos_das_colunas)
+        :param indice: IndiceAncestrais já construído, com os nós indexados por GUID
+        """
+        # O ':' separa nome e tipo no cabeçalho: essas colunas não têm representação
+        self.colunas_ignoradas = sorted(c for c in tipos_colunas if ":" in c)
+        colunas = sorted(c for c in tipos_colunas if ":" not in c)
+        cabecalho = [f"guid:ID({ID_ELEMENTOS})", "name", "ifc_type",
+                     "entrada:long", "saida:long", "tipos_ancestrais:string[]"]
+        cabecalho += [c if tipos_colunas[c] == TIPO_STRING else f"{c}:{tipos_colunas[c]}" for c in colunas]
+        rotulos = {}
+        if indice is not None:
+            rotulos = {r["uri"]: r for r in indice.linhas()}
+
+        self.nos = ArquivoCsv(self.diretorio, f"nos_{ID_ELEMENTOS}", cabecalho, self.comprimir)
+        for e in elementos:
+            guid = e["guid"]
+            if guid in self._guids:
+                self.guids_repetidos += 1
+                continue
+            self._guids.add(guid)
+            r = rotulos.get(guid)
+            props = e["props"]
+            campos = [guid, e["name"], e["ifc_type"]]
+            if r is None:
+                campos += ["", "", ""]
+            else:
+                campos += [str(r["entrada"]), str(r["saida"]), DELIMITADOR_ARRAY.join(r["tipos_ancestrais"])]
+            campos += [formatar_valor(props.get(c), tipos_colunas[c]) for c in colunas]
+            self.nos.gravar(campos)
+        self.nos.fechar()
+
+    def exportar_relacoes(self, tipo_rel: str, relacoes):
+        """:param relacoes: Linhas {child_guid, parent_guid} do tipo `tipo_rel`"""
+        arquivo = ArquivoCsv(self.diretorio, f"rel_{tipo_rel}",
+                             [f":START_ID({ID_ELEMENTOS})", f":END_ID({ID_ELEMENTOS})"], self.comprimir)
+        vistas = set()
+        for r in relacoes:
+            par = (r["child_guid"], r["parent_guid"])
+            if par in vistas:
+                continue
+            if par[0] not in self._guids or par[1] not in self._guids:
+                self.relacoes_descartadas += 1
+                continue
+            vistas.add(par)
+            arquivo.gravar(list(par))
+        arquivo.fechar()
+        self.relacoes[tipo_rel] = arquivo
+
+    def comando(self, banco: str = "neo4j") -> list:
+        """Argumentos do neo4j-admin para importar os arquivos (executado no diretório da exportação)."""
+        argumentos = ["neo4j-admin", "database", "import", "full", banco, "--overwrite-destination",
+                      f"--array-delimiter={DELIMITADOR_ARRAY}", f"--nodes={ID_ELEMENTOS}={self.nos.argumento()}"]
+        argumentos += [f"--relationships={tipo}={arquivo.argumento()}"
+                       for tipo, arquivo in self.relacoes.items() if arquivo.linhas]
+        if any(a.multilinha for a in [self.nos, *self.relacoes.values()]):
+            argumentos.append("--multiline-fields=true")
+        return argumentos
+
+    def gravar_roteiro(self, comandos_esquema: list, banco: str = "neo4j") -> str:
+        """
+        Grava esquema.cypher e importar.sh no diretório da exportação.
+
+        :return: Caminho do importar.sh
+        """
+        with open(os.path.join(self.diretorio, "esquema.cypher"), 'w', encoding='utf-8') as f:
+            f.writelines(f"{comando};\n" for comando in comandos_esquema)
+        caminho = os.path.join(self.diretorio, "importar.sh")
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write("#!/bin/sh\n")
+            f.write("# Carga offline: o banco deve estar parado. Depois de iniciá-lo, crie o esquema com\n")
+            f.write(f"#   cypher-shell -d {banco} -f esquema.cypher\n")
+            f.write('cd "$(dirname "$0")" || exit 1\n')
+            f.write(" ".join(shlex.quote(a) for a in self.comando(banco)) + "\n")
+        os.chmod(caminho, 0o755)
+        return caminho
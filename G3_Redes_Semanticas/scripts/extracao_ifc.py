@@ -0,0 +1,441 @@
+# extracao_ifc.py
+
+"""
+Camada de extração do modelo IFC.
+
+Todas as funções são geradores: percorrem as entidades do arquivo IFC sob
+demanda e produzem linhas (dicionários) ou triplas RDF uma a uma, sem montar
+listas ou grafos completos em memória.
+
+Além da contenção espacial, são extraídas relações complementares entre
+produtos (ver TIPOS_RELACOES): a agregação (IfcRelAggregates), que pendura
+andares em edifícios e espaços em andares, e as aberturas
+(IfcRelVoidsElement / IfcRelFillsElement), das quais também se deriva a
+aresta direta porta/janela -> elemento hospedeiro (ex.: parede).
+
+As arestas de contenção confirmadas pela geometria (relação derivada
+`isWithin`, ver geometria_ifc.py) são uma etapa à parte,
+iterar_contencao_geometrica: a verificação geométrica custa mais que todo
+o resto da extração e só é necessária para as regras DENTRO_DE, então os
+importadores e o backend em memória só a executam quando pedida.
+
+As quantidades (IfcElementQuantity) e os valores simples dos conjuntos de
+propriedades (IfcPropertySet) viram linhas {guid, coluna, valor}: os
+conjuntos do tipo (IfcRelDefinesByType) vêm primeiro, e os da ocorrência
+(IfcRelDefinesByProperties) os sobrescrevem. A coluna é o nome qualificado
+"Conjunto.Propriedade" (ver nome_coluna). Na mesma passada, o tipo
+(IfcRelDefinesByType) e o material (IfcRelAssociatesMaterial, do tipo ou
+da ocorrência) viram as colunas sem conjunto COLUNA_TIPO e COLUNA_MATERIAL
+(ver indice_associacoes.py).
+
+O ExtratorParalelo distribui a mesma extração por um pool de processos:
+cada worker abre o arquivo IFC uma vez e processa fatias contíguas das
+entidades, e as fatias são reunidas na ordem original. A contenção
+geométrica também é dividida: posicionamentos e caixas dos produtos são
+lidos por fatias nos workers, e só a montagem (vetorizada) fica no
+processo principal.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import ifcopenshell  # type: ignore
+from rdflib import Literal, Namespace  # type: ignore
+from rdflib.namespace import RDF, RDFS  # type: ignore
+
+from indice_espacial import REL_AGREGACAO, REL_ABERTURA, REL_PREENCHIMENTO, REL_HOSPEDAGEM
+from indice_associacoes import COLUNA_MATERIAL, COLUNA_TIPO
+from geometria_ifc import (iterar_contencao_geometrica, ler_posicionamentos, ler_produtos, ler_arestas,
+                           concatenar, montar_contencao, tolerancia_padrao, ExtratorCaixas)
+
+# Vocabulário customizado usado pelo importador RDF
+BLDG = Namespace("https://example.com/building#")
+
+
+def iterar_elementos(ifc):
+    """
+    Percorre todos os IfcProduct do modelo.
+
+    :param ifc: Arquivo aberto com ifcopenshell
+    :return: Gerador de dicionários {guid, name, ifc_type}
+    """
+    for e in ifc.by_type('IfcProduct'):
+        yield linha_elemento(e)
+
+
+def iterar_contencoes(ifc):
+    """
+    Percorre as relações IfcRelContainedInSpatialStructure do modelo.
+
+    :param ifc: Arquivo aberto com ifcopenshell
+    :return: Gerador de dicionários {child_guid, parent_guid}
+    """
+    for rel in ifc.by_type('IfcRelContainedInSpatialStructure'):
+        yield from linhas_contencao(rel)
+
+
+def iterar_relacoes(ifc):
+    """
+    Percorre as relações complementares do modelo (ver TIPOS_RELACOES),
+    sem a contenção geométrica (ver iterar_contencao_geometrica).
+
+    :param ifc: Arquivo aberto com ifcopenshell
+    :return: Gerador de dicionários {child_guid, parent_guid, relacao}
+    """
+    for tipo_ifc, linhas in TIPOS_RELACOES.items():
+        for rel in ifc.by_type(tipo_ifc):
+            yield from linhas(rel)
+
+
+def iterar_propriedades(ifc):
+    """
+    Percorre as quantidades e propriedades simples atribuídas aos produtos
+    (ver TIPOS_PROPRIEDADES).
+
+    :param ifc: Arquivo aberto com ifcopenshell
+    :return: Gerador de dicionários {guid, coluna, valor}
+    """
+    for tipo_ifc, linhas in TIPOS_PROPRIEDADES.items():
+        for rel in ifc.by_type(tipo_ifc):
+            yield from linhas(rel)
+
+
+def linha_elemento(e) -> dict:
+    """Converte um IfcProduct em linha {guid, name, ifc_type}."""
+    return {
+        "guid": e.GlobalId,
+        "name": e.Name,
+        "ifc_type": e.is_a(),
+    }
+
+
+def linhas_contencao(rel):
+    """Converte uma IfcRelContainedInSpatialStructure em linhas filho -> pai."""
+    if rel.RelatingStructure:
+        parent_guid = rel.RelatingStructure.GlobalId
+        for child in rel.RelatedElements:
+            yield {"child_guid": child.GlobalId, "parent_guid": parent_guid}
+
+
+def linhas_agregacao(rel):
+    """
+    Converte uma IfcRelAggregates em linhas parte -> todo. Apenas produtos
+    entram no grafo: a agregação do terreno ao IfcProject é descartada.
+    """
+    todo = rel.RelatingObject
+    if todo is None or not todo.is_a('IfcProduct'):
+        return
+    for parte in rel.RelatedObjects:
+        if parte.is_a('IfcProduct'):
+            yield {"child_guid": parte.GlobalId, "parent_guid": todo.GlobalId, "relacao": REL_AGREGACAO}
+
+
+def linhas_abertura(rel):
+    """Converte uma IfcRelVoidsElement em linha abertura -> elemento recortado."""
+    abertura, hospedeiro = rel.RelatedOpeningElement, rel.RelatingBuildingElement
+    if abertura is not None and hospedeiro is not None:
+        yield {"child_guid": abertura.GlobalId, "parent_guid": hospedeiro.GlobalId, "relacao": REL_ABERTURA}
+
+
+def linhas_preenchimento(rel):
+    """
+    Converte uma IfcRelFillsElement em linha porta/janela -> abertura e,
+    seguindo a abertura até o elemento recortado, na aresta derivada
+    porta/janela -> hospedeiro. As regras de hospedagem consultam só esta
+    última: um salto, sem juntar aberturas no grafo.
+    """
+    abertura, elemento = rel.RelatingOpeningElement, rel.RelatedBuildingElement
+    if abertura is None or elemento is None:
+        return
+    yield {"child_guid": elemento.GlobalId, "parent_guid": abertura.GlobalId, "relacao": REL_PREENCHIMENTO}
+    for recorte in abertura.VoidsElements or ():
+        if recorte.RelatingBuildingElement is not None:
+            yield {"child_guid": elemento.GlobalId, "parent_guid": recorte.RelatingBuildingElement.GlobalId,
+                   "relacao": REL_HOSPEDAGEM}
+
+
+# Relações complementares: tipo IFC -> conversor em linhas {child_guid, parent_guid, relacao}
+TIPOS_RELACOES = {
+    'IfcRelAggregates': linhas_agregacao,
+    'IfcRelVoidsElement': linhas_abertura,
+    'IfcRelFillsElement': linhas_preenchimento,
+}
+
+
+def nome_coluna(conjunto: str, nome: str) -> str:
+    """Nome qualificado da coluna de uma propriedade: "Conjunto.Propriedade"."""
+    return f"{'_'.join(conjunto.split())}.{'_'.join(nome.split())}"
+
+
+def valores_definicao(definicao):
+    """
+    Pares (coluna, valor) de um IfcElementQuantity ou IfcPropertySet.
+    Apenas quantidades simples e IfcPropertySingleValue têm um valor único;
+    quantidades compostas, listas e enumerações são ignoradas.
+    """
+    if definicao.is_a('IfcElementQuantity'):
+        for q in definicao.Quantities:
+            if q.is_a('IfcPhysicalSimpleQuantity') and q[3] is not None:
+                # O 4º atributo é o valor em todas as quantidades simples (LengthValue, AreaValue...)
+                yield nome_coluna(definicao.Name or "", q.Name), q[3]
+    elif definicao.is_a('IfcPropertySet'):
+        for p in definicao.HasProperties:
+            if p.is_a('IfcPropertySingleValue') and p.NominalValue is not None:
+                yield nome_coluna(definicao.Name or "", p.Name), p.NominalValue.wrappedValue
+
+
+def nome_material(material) -> str:
+    """Nome de um material associado (IfcMaterial, conjuntos de camadas/perfis/constituintes, listas)."""
+    if material.is_a('IfcMaterialLayerSetUsage'):
+        material = material.ForLayerSet
+    elif material.is_a('IfcMaterialProfileSetUsage'):
+        material = material.ForProfileSet
+    if material.is_a('IfcMaterialLayerSet'):
+        nome = material.LayerSetName
+    elif material.is_a('IfcMaterialList'):
+        nome = " | ".join(m.Name or m.is_a() for m in material.Materials)
+    else:
+        nome = getattr(material, "Name", None)
+    return nome or material.is_a()
+
+
+def material_associado(objeto):
+    """Nome do material associado diretamente ao objeto (ocorrência ou tipo), ou None."""
+    for rel in objeto.HasAssociations or ():
+        if rel.is_a('IfcRelAssociatesMaterial') and rel.RelatingMaterial is not None:
+            return nome_material(rel.RelatingMaterial)
+    return None
+
+
+def linhas_propriedades_tipo(rel):
+    """
+    Converte uma IfcRelDefinesByType nas propriedades herdadas pelas
+    ocorrências, no nome do tipo e no material atribuído ao tipo.
+    """
+    tipo = rel.RelatingType
+    valores = [par for definicao in tipo.HasPropertySets or () for par in valores_definicao(definicao)]
+    valores.append((COLUNA_TIPO, tipo.Name or tipo.is_a()))
+    material = material_associado(tipo)
+    if material is not None:
+        valores.append((COLUNA_MATERIAL, material))
+    for objeto in rel.RelatedObjects:
+        for coluna, valor in valores:
+            yield {"guid": objeto.GlobalId, "coluna": coluna, "valor": valor}
+
+
+def linhas_propriedades(rel):
+    """Converte uma IfcRelDefinesByProperties nas propriedades das ocorrências."""
+    definicao = rel.RelatingPropertyDefinition
+    if definicao is None or not definicao.is_a('IfcPropertySetDefinition'):
+        return
+    valores = list(valores_definicao(definicao))
+    for objeto in rel.RelatedObjects:
+        for coluna, valor in valores:
+            yield {"guid": objeto.GlobalId, "coluna": coluna, "valor": valor}
+
+
+def linhas_material(rel):
+    """
+    Converte uma IfcRelAssociatesMaterial no material das ocorrências. O
+    material de um tipo chega às ocorrências por linhas_propriedades_tipo.
+    """
+    if rel.RelatingMaterial is None:
+        return
+    material = nome_material(rel.RelatingMaterial)
+    for objeto in rel.RelatedObjects:
+        if objeto.is_a('IfcProduct'):
+            yield {"guid": objeto.GlobalId, "coluna": COLUNA_MATERIAL, "valor": material}
+
+
+# Propriedades: tipo IFC -> conversor em linhas {guid, coluna, valor}.
+# A ordem importa: os valores da ocorrência sobrescrevem os do tipo.
+TIPOS_PROPRIEDADES = {
+    'IfcRelDefinesByType': linhas_propriedades_tipo,
+    'IfcRelDefinesByProperties': linhas_propriedades,
+    'IfcRelAssociatesMaterial': linhas_material,
+}
+
+
+def triplas_de_elemento(elemento):
+    """Triplas RDF de um elemento: tipo e, se existir, o rótulo (nome)."""
+    subject = BLDG[elemento["guid"]]
+    yield (subject, RDF.type, BLDG[elemento["ifc_type"]])
+    if elemento["name"]:
+        yield (subject, RDFS.label, Literal(elemento["name"]))
+
+
+def triplas_de_contencao(contencao):
+    """Tripla RDF (filho) -> (estáContidoEm) -> (pai)."""
+    yield (BLDG[contencao["child_guid"]], BLDG.isContainedIn, BLDG[contencao["parent_guid"]])
+
+
+def triplas_de_relacao(relacao):
+    """Tripla RDF (filho) -> (relação) -> (pai) de uma relação complementar."""
+    yield (BLDG[relacao["child_guid"]], BLDG[relacao["relacao"]], BLDG[relacao["parent_guid"]])
+
+
+def triplas_de_propriedade(propriedade):
+    """Tripla RDF (elemento) -> (coluna) -> (valor literal) de uma propriedade."""
+    yield (BLDG[propriedade["guid"]], BLDG[propriedade["coluna"]], Literal(propriedade["valor"]))
+
+
+def gerar_triplas(elementos, contencoes, contador: dict = None, relacoes=(), propriedades=()):
+    """
+    Produz, em fluxo, todas as triplas RDF do modelo IFC.
+
+    :param elementos: Iterável de linhas de elemento (ver iterar_elementos)
+    :param contencoes: Iterável de linhas de contenção (ver iterar_contencoes)
+    :param contador: Dicionário opcional atualizado com o número de
+                     'elementos', 'contencoes', 'relacoes' e 'propriedades' produzidos
+    :param relacoes: Iterável de linhas de relações complementares (ver iterar_relacoes)
+    :param propriedades: Iterável de linhas de propriedades (ver iterar_propriedades)
+    :return: Gerador de triplas (s, p, o)
+    """
+    if contador is None:
+        contador = {}
+    contador.setdefault("elementos", 0)
+    contador.setdefault("contencoes", 0)
+    contador.setdefault("relacoes", 0)
+    contador.setdefault("propriedades", 0)
+
+    for elemento in elementos:
+        contador["elementos"] += 1
+        yield from triplas_de_elemento(elemento)
+
+    for contencao in contencoes:
+        contador["contencoes"] += 1
+        yield from triplas_de_contencao(contencao)
+
+    for relacao in relacoes:
+        contador["relacoes"] += 1
+        yield from triplas_de_relacao(relacao)
+
+    for propriedade in propriedades:
+        contador["propriedades"] += 1
+        yield from triplas_de_propriedade(propriedade)
+
+
+def tripla_para_ntriples(s, p, o) -> str:
+    """Serializa uma tripla no formato N-Triples (uma linha)."""
+    return f"{s.n3()} {p.n3()} {o.n3()} .\n"
+
+
+# ==============================
+# Extração paralela
+# ==============================
+
+# Estado de cada processo worker (inicializado uma vez por processo)
+_ifc_worker = None
+_entidades_worker = {}
+
+
+def _inicializar_worker(caminho_ifc: str):
+    global _ifc_worker
+    _ifc_worker = ifcopenshell.open(caminho_ifc)
+    _entidades_worker.clear()
+
+
+def _extrair_fatia(tarefa):
+    """Extrai as linhas da fatia `indice` de `total` das entidades `tipo_ifc`."""
+    tipo_ifc, indice, total = tarefa
+    fatia = _fatia(tipo_ifc, indice, total)
+
+    if tipo_ifc == 'IfcProduct':
+        return [linha_elemento(e) for e in fatia]
+    linhas = TIPOS_RELACOES.get(tipo_ifc) or TIPOS_PROPRIEDADES.get(tipo_ifc, linhas_contencao)
+    return [linha for rel in fatia for linha in linhas(rel)]
+
+
+def _fatia(tipo_ifc: str, indice: int, total: int) -> list:
+    entidades = _entidades_worker.get(tipo_ifc)
+    if entidades is None:
+        entidades = _ifc_worker.by_type(tipo_ifc)
+        _entidades_worker[tipo_ifc] = entidades
+    return entidades[len(entidades) * indice // total:len(entidades) * (indice + 1) // total]
+
+
+def _ler_geometria_fatia(tarefa):
+    """Posicionamentos ou produtos (com as caixas locais) da fatia `indice` de `total`."""
+    tipo_ifc, indice, total = tarefa
+    if tipo_ifc == 'IfcLocalPlacement':
+        return ler_posicionamentos(_fatia(tipo_ifc, indice, total))
+    extrator = _entidades_worker.get("_extrator_caixas")
+    if extrator is None:
+        extrator = _entidades_worker["_extrator_caixas"] = ExtratorCaixas(_ifc_worker)
+    return ler_produtos(_fatia(tipo_ifc, indice, total), extrator)
+
+
+def _ler_arestas_geometria():
+    """Arestas declaradas e tolerância padrão, que dependem do modelo inteiro."""
+    return ler_arestas(_ifc_worker), tolerancia_padrao(_ifc_worker)
+
+
+class ExtratorParalelo:
+    """
+    Extração de elementos e contenções com um pool de processos.
+
+    O resultado é idêntico (inclusive na ordem) ao de iterar_elementos e
+    iterar_contencoes, pois as fatias são contíguas e reunidas em sequência.
+    Use como gerenciador de contexto para encerrar o pool ao final.
+    """
+
+    # Fatias por worker: mais fatias que workers equilibram a carga
+    FATIAS_POR_WORKER = 4
+
+    def __init__(self, caminho_ifc: str, workers: int):
+        if workers < 1:
+            raise ValueError("O número de workers deve ser maior que zero.")
+        self.caminho_ifc = caminho_ifc
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_inicializar_worker,
+            initargs=(caminho_ifc,),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        self.pool.shutdown()
+
+    def _iterar(self, tipo_ifc: str):
+        total = self.workers * self.FATIAS_POR_WORKER
+        tarefas = [(tipo_ifc, i, total) for i in range(total)]
+        # map() devolve os resultados na ordem das tarefas: a junção é determinística
+        for linhas in self.pool.map(_extrair_fatia, tarefas):
+            yield from linhas
+
+    def elementos(self):
+        """Gerador de linhas de elemento, na mesma ordem de iterar_elementos."""
+        return self._iterar('IfcProduct')
+
+    def contencoes(self):
+        """Gerador de linhas de contenção, na mesma ordem de iterar_contencoes."""
+        return self._iterar('IfcRelContainedInSpatialStructure')
+
+    def relacoes(self):
+        """Gerador de linhas de relações complementares, na mesma ordem de iterar_relacoes."""
+        for tipo_ifc in TIPOS_RELACOES:
+            yield from self._iterar(tipo_ifc)
+
+    def contencao_geometrica(self):
+        """
+        Gerador das linhas de contenção geométrica, as mesmas de
+        iterar_contencao_geometrica: a leitura de posicionamentos e caixas
+        é dividida em fatias entre os workers, e a montagem é feita aqui.
+        """
+        total = self.workers * self.FATIAS_POR_WORKER
+        arestas = self.pool.submit(_ler_arestas_geometria)
+        posicionamentos = self.pool.map(_ler_geometria_fatia, [('IfcLocalPlacement', i, total) for i in range(total)])
+        produtos = self.pool.map(_ler_geometria_fatia, [('IfcProduct', i, total) for i in range(total)])
+        posicionamentos, produtos = concatenar(list(posicionamentos)), concatenar(list(produtos))
+        arestas, tolerancia = arestas.result()
+        yield from montar_contencao(posicionamentos, produtos, arestas, tolerancia).linhas()
+
+    def propriedades(self):
+        """Gerador de linhas de propriedades, na mesma ordem de iterar_propriedades."""
+        for tipo_ifc in TIPOS_PROPRIEDADES:
+            yield from self._iterar(tipo_ifc)
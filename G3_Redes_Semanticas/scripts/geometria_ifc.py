@@ -0,0 +1,648 @@
+# geometria_ifc.py
+
+"""
+Contenção geométrica: o elemento está mesmo dentro do contêiner declarado?
+
+A contenção do grafo é relacional — um elemento "está" no andar porque uma
+IfcRelContainedInSpatialStructure diz isso. Este módulo confere a afirmação
+com a geometria:
+
+1. Posicionamentos: as cadeias de IfcLocalPlacement são resolvidas uma
+   única vez, com memoização, em um array NumPy (n, 4, 4) de transformações
+   globais. As matrizes locais são montadas em bloco e as cadeias são
+   compostas nível a nível (todos os posicionamentos de mesma profundidade
+   em uma única multiplicação matricial).
+2. Caixas: cada produto recebe a caixa (AABB) da sua representação nas
+   coordenadas do objeto — IfcBoundingBox, extrusões, malhas, B-reps,
+   itens mapeados — e os 8 vértices de todas as caixas são levados ao
+   sistema global de uma vez. Andares sem geometria própria ocupam a faixa
+   de cotas entre a sua elevação e a do andar seguinte do mesmo edifício.
+3. Verificação: para cada aresta declarada filho -> pai (contenção ou
+   agregação), o teste "caixa do filho dentro da extensão do pai" é
+   vetorizado sobre todas as arestas. Para as que falham, uma grade
+   uniforme (GradeUniforme) sobre os elementos espaciais indica em que
+   contêineres o elemento de fato está, sem comparações par a par.
+
+As arestas confirmadas viram a relação derivada `isWithin`, consultada pelas
+regras `VERIFICAR X DENTRO_DE Y`. Um elemento sem geometria, ou um pai sem
+extensão definida (ex.: edifício sem representação), não contradiz a
+declaração: a aresta é mantida e contada em `sem_geometria`.
+"""
+
+import argparse
+
+import numpy as np  # type: ignore
+
+from indice_espacial import REL_GEOMETRICA
+
+# Folga (em metros) admitida entre a caixa do elemento e a do contêiner
+TOLERANCIA_PADRAO_M = 0.01
+
+# Representações usadas para a caixa, em ordem de preferência
+IDENTIFICADORES_REPRESENTACAO = ("Box", "Body", "Facetation")
+
+# Contêineres espaciais (IfcSpatialStructureElement no IFC2X3)
+TIPOS_ESPACIAIS = ("IfcSpatialElement", "IfcSpatialStructureElement")
+
+# Limite de células por eixo da grade uniforme
+MAX_CELULAS_EIXO = 64
+
+INFINITO = np.inf
+
+
+# ==============================
+# Posicionamentos
+# ==============================
+
+def _coordenadas3d(valores, padrao=(0.0, 0.0, 0.0)):
+    if valores is None:
+        return padrao
+    valores = tuple(float(v) for v in valores)
+    return valores + (0.0,) * (3 - len(valores))
+
+
+def _eixos(posicionamento):
+    """(origem, eixo z, eixo x) de um IfcAxis2Placement2D/3D."""
+    origem = _coordenadas3d(posicionamento.Location.Coordinates if posicionamento.Location else None)
+    eixo_z = (0.0, 0.0, 1.0)
+    if posicionamento.is_a('IfcAxis2Placement3D') and posicionamento.Axis is not None:
+        eixo_z = _coordenadas3d(posicionamento.Axis.DirectionRatios)
+    eixo_x = (1.0, 0.0, 0.0)
+    if posicionamento.RefDirection is not None:
+        eixo_x = _coordenadas3d(posicionamento.RefDirection.DirectionRatios)
+    return origem, eixo_z, eixo_x
+
+
+def matrizes_locais(origens, eixos_z, eixos_x) -> np.ndarray:
+    """
+    Matrizes 4x4 (n, 4, 4) de n sistemas de coordenadas, montadas em bloco.
+    Eixos degenerados (nulos ou paralelos) recebem as direções padrão.
+    """
+    origens = np.asarray(origens, dtype=float).reshape(-1, 3)
+    z = np.asarray(eixos_z, dtype=float).reshape(-1, 3)
+    x = np.asarray(eixos_x, dtype=float).reshape(-1, 3)
+
+    norma_z = np.linalg.norm(z, axis=1, keepdims=True)
+    z = np.where(norma_z > 1e-12, z / np.maximum(norma_z, 1e-12), (0.0, 0.0, 1.0))
+    x = x - np.sum(x * z, axis=1, keepdims=True) * z
+    norma_x = np.linalg.norm(x, axis=1, keepdims=True)
+    # x paralelo a z: qualquer direção perpendicular serve
+    alternativo = np.where(np.abs(z[:, :1]) < 0.9, (1.0, 0.0, 0.0), (0.0, 1.0, 0.0))
+    alternativo = alternativo - np.sum(alternativo * z, axis=1, keepdims=True) * z
+    x = np.where(norma_x > 1e-12, x, alternativo)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    y = np.cross(z, x)
+
+    matrizes = np.zeros((len(origens), 4, 4))
+    matrizes[:, :3, 0] = x
+    matrizes[:, :3, 1] = y
+    matrizes[:, :3, 2] = z
+    matrizes[:, :3, 3] = origens
+    matrizes[:, 3, 3] = 1.0
+    return matrizes
+
+
+def matriz_posicionamento(posicionamento) -> np.ndarray:
+    """Matriz 4x4 de um único IfcAxis2Placement (identidade se ausente)."""
+    if posicionamento is None:
+        return np.eye(4)
+    return matrizes_locais(*(np.array([v]) for v in _eixos(posicionamento)))[0]
+
+
+def ler_posicionamentos(posicionamentos) -> dict:
+    """
+    Atributos de uma lista (ou fatia) de IfcLocalPlacement em arrays: id da
+    entidade, id do posicionamento de referência (-1 se não houver) e os
+    eixos do posicionamento relativo. É a parte cara da resolução (acesso
+    aos atributos das entidades) e pode ser feita por fatias em paralelo.
+    """
+    n = len(posicionamentos)
+    ids, ids_pais = np.empty(n, dtype=np.int64), np.full(n, -1, dtype=np.int64)
+    origens, eixos_z, eixos_x = np.zeros((n, 3)), np.zeros((n, 3)), np.zeros((n, 3))
+    for i, p in enumerate(posicionamentos):
+        ids[i] = p.id()
+        relativo = p.RelativePlacement
+        if relativo is not None and relativo.is_a('IfcPlacement'):
+            origens[i], eixos_z[i], eixos_x[i] = _eixos(relativo)
+        else:
+            eixos_z[i], eixos_x[i] = (0.0, 0.0, 1.0), (1.0, 0.0, 0.0)
+        if p.PlacementRelTo is not None:
+            ids_pais[i] = p.PlacementRelTo.id()
+    return {"ids": ids, "ids_pais": ids_pais, "origens": origens, "eixos_z": eixos_z, "eixos_x": eixos_x}
+
+
+def resolver_posicionamentos(posicionamentos):
+    """
+    Transformações globais de uma lista de IfcLocalPlacement.
+
+    :return: ({id da entidade: linha}, array (n, 4, 4))
+    """
+    return compor_posicionamentos(ler_posicionamentos(posicionamentos))
+
+
+def compor_posicionamentos(dados: dict):
+    """
+    Transformações globais a partir dos arrays de ler_posicionamentos.
+
+    Cada cadeia PlacementRelTo é percorrida uma única vez (a profundidade
+    de cada nó é memoizada); as matrizes globais são compostas por nível,
+    com uma multiplicação em bloco por profundidade. Ciclos são cortados.
+
+    :return: ({id da entidade: linha}, array (n, 4, 4))
+    """
+    linha_por_id = {int(i): linha for linha, i in enumerate(dados["ids"])}
+    origens, eixos_z, eixos_x = dados["origens"], dados["eixos_z"], dados["eixos_x"]
+    n = len(origens)
+    # Posicionamentos que não são locais (ex.: IfcGridPlacement) contam como raiz
+    pai = np.array([linha_por_id.get(int(i), -1) if i >= 0 else -1 for i in dados["ids_pais"]], dtype=np.int64)
+
+    profundidade = np.full(n, -1, dtype=np.int64)
+    for i in range(n):
+        caminho, no_caminho = [], set()
+        no = i
+        while no >= 0 and profundidade[no] < 0 and no not in no_caminho:
+            no_caminho.add(no)
+            caminho.append(no)
+            no = pai[no]
+        if no >= 0 and profundidade[no] < 0:
+            # Ciclo: o último nó do caminho passa a ser raiz
+            pai[caminho[-1]] = -1
+            base = -1
+        else:
+            base = profundidade[no] if no >= 0 else -1
+        for no in reversed(caminho):
+            base += 1
+            profundidade[no] = base
+
+    matrizes = matrizes_locais(origens, eixos_z, eixos_x)
+    for nivel in range(1, int(profundidade.max(initial=0)) + 1):
+        linhas = np.flatnonzero(profundidade == nivel)
+        matrizes[linhas] = matrizes[pai[linhas]] @ matrizes[linhas]
+    return linha_por_id, matrizes
+
+
+def vertices_caixas(minimos: np.ndarray, maximos: np.ndarray) -> np.ndarray:
+    """Os 8 vértices (n, 8, 3) de n caixas alinhadas aos eixos."""
+    seletor = np.array([[(i >> k) & 1 for k in range(3)] for i in range(8)], dtype=bool)
+    return np.where(seletor[None], maximos[:, None, :], minimos[:, None, :])
+
+
+def transformar_caixas(matrizes: np.ndarray, minimos: np.ndarray, maximos: np.ndarray):
+    """Caixas globais (mínimos, máximos) das caixas locais transformadas por n matrizes."""
+    vertices = vertices_caixas(minimos, maximos)
+    globais = np.einsum('nij,nkj->nki', matrizes[:, :3, :3], vertices) + matrizes[:, None, :3, 3]
+    return globais.min(axis=1), globais.max(axis=1)
+
+
+# ==============================
+# Caixas locais das representações
+# ==============================
+
+class ExtratorCaixas:
+    """
+    Caixa de cada produto nas coordenadas do objeto, a partir dos itens da
+    representação. Formas compartilhadas entre produtos e representações
+    mapeadas (tipos de porta, janela, mobiliário repetidos) são calculadas
+    uma vez e reutilizadas.
+    """
+
+    def __init__(self, ifc):
+        self.ifc = ifc
+        self._formas = {}
+        self._mapeadas = {}
+
+    def caixa_produto(self, produto):
+        """(mínimo, máximo) da representação do produto, ou None."""
+        forma = produto.Representation
+        if forma is None:
+            return None
+        chave = forma.id()
+        if chave not in self._formas:
+            self._formas[chave] = self._caixa_forma(forma)
+        return self._formas[chave]
+
+    def _caixa_forma(self, forma):
+        representacoes = {}
+        for r in forma.Representations or ():
+            representacoes.setdefault(r.RepresentationIdentifier, r)
+        for identificador in IDENTIFICADORES_REPRESENTACAO:
+            if identificador in representacoes:
+                return self.caixa_representacao(representacoes[identificador])
+        return None
+
+    def caixa_representacao(self, representacao):
+        pontos = [p for p in (self.pontos_item(item) for item in representacao.Items or ()) if p is not None]
+        if not pontos:
+            return None
+        pontos = np.concatenate(pontos)
+        return pontos.min(axis=0), pontos.max(axis=0)
+
+    def pontos_item(self, item):
+        """Pontos (k, 3) cujo envoltório é a caixa do item, ou None."""
+        if item.is_a('IfcBoundingBox'):
+            canto = np.array(_coordenadas3d(item.Corner.Coordinates))
+            return np.array([canto, canto + (item.XDim, item.YDim, item.ZDim)])
+        if item.is_a('IfcExtrudedAreaSolid'):
+            return self._pontos_extrusao(item)
+        if item.is_a('IfcTessellatedFaceSet'):
+            return np.asarray(item.Coordinates.CoordList, dtype=float)
+        if item.is_a('IfcBooleanResult'):
+            # Recortes só removem material: a caixa do primeiro operando basta
+            return self.pontos_item(item.FirstOperand)
+        if item.is_a('IfcMappedItem'):
+            return self._pontos_mapeados(item)
+        if item.is_a('IfcManifoldSolidBrep') or item.is_a('IfcShellBasedSurfaceModel') \
+                or item.is_a('IfcFaceBasedSurfaceModel'):
+            coordenadas = [p.Coordinates for p in self.ifc.traverse(item)
+                           if p.is_a('IfcCartesianPoint') and len(p.Coordinates) == 3]
+            return np.asarray(coordenadas, dtype=float) if coordenadas else None
+        return None
+
+    def _pontos_extrusao(self, solido):
+        perfil = pontos_perfil(solido.SweptArea, self.ifc)
+        if perfil is None:
+            return None
+        minimo, maximo = perfil.min(axis=0), perfil.max(axis=0)
+        base = np.array([[minimo[0], minimo[1], 0.0], [maximo[0], minimo[1], 0.0],
+                         [minimo[0], maximo[1], 0.0], [maximo[0], maximo[1], 0.0]])
+        direcao = np.array(_coordenadas3d(solido.ExtrudedDirection.DirectionRatios))
+        direcao /= np.linalg.norm(direcao) or 1.0
+        pontos = np.concatenate([base, base + direcao * solido.Depth])
+        matriz = matriz_posicionamento(solido.Position)
+        return pontos @ matriz[:3, :3].T + matriz[:3, 3]
+
+    def _pontos_mapeados(self, item):
+        origem = item.MappingSource
+        chave = origem.id()
+        if chave not in self._mapeadas:
+            caixa = self.caixa_representacao(origem.MappedRepresentation)
+            if caixa is not None:
+                caixa = vertices_caixas(caixa[0][None], caixa[1][None])[0]
+                matriz = matriz_operador(item.MappingTarget) @ matriz_posicionamento(origem.MappingOrigin)
+                caixa = caixa @ matriz[:3, :3].T + matriz[:3, 3]
+            self._mapeadas[chave] = caixa
+        return self._mapeadas[chave]
+
+
+def matriz_operador(operador) -> np.ndarray:
+    """Matriz 4x4 de um IfcCartesianTransformationOperator (escala incluída)."""
+    if operador is None:
+        return np.eye(4)
+    eixo_x = _coordenadas3d(operador.Axis1.DirectionRatios if operador.Axis1 else None, (1.0, 0.0, 0.0))
+    eixo_z = (0.0, 0.0, 1.0)
+    if operador.is_a('IfcCartesianTransformationOperator3D') and operador.Axis3 is not None:
+        eixo_z = _coordenadas3d(operador.Axis3.DirectionRatios)
+    origem = _coordenadas3d(operador.LocalOrigin.Coordinates)
+    matriz = matrizes_locais([origem], [eixo_z], [eixo_x])[0]
+    escala = operador.Scale if operador.Scale is not None else 1.0
+    escalas = [escala, escala, escala]
+    if operador.is_a('IfcCartesianTransformationOperator3DnonUniform'):
+        escalas[1] = operador.Scale2 if operador.Scale2 is not None else escala
+        escalas[2] = operador.Scale3 if operador.Scale3 is not None else escala
+    matriz[:3, :3] *= escalas
+    return matriz
+
+
+def pontos_perfil(perfil, ifc):
+    """Pontos 2D (k, 2) cujo envoltório é o retângulo do perfil, ou None."""
+    if perfil.is_a('IfcArbitraryClosedProfileDef'):
+        curva = perfil.OuterCurve
+        if curva.is_a('IfcPolyline'):
+            pontos = [p.Coordinates[:2] for p in curva.Points]
+        elif curva.is_a('IfcIndexedPolyCurve'):
+            pontos = [c[:2] for c in curva.Points.CoordList]
+        else:
+            # Curvas compostas: aproxima pelos pontos de controle
+            pontos = [p.Coordinates[:2] for p in ifc.traverse(curva) if p.is_a('IfcCartesianPoint')]
+        return np.asarray(pontos, dtype=float) if pontos else None
+
+    if perfil.is_a('IfcRectangleProfileDef'):
+        meia_x, meia_y = perfil.XDim / 2, perfil.YDim / 2
+    elif perfil.is_a('IfcCircleProfileDef'):
+        meia_x = meia_y = perfil.Radius
+    elif perfil.is_a('IfcEllipseProfileDef'):
+        meia_x, meia_y = perfil.SemiAxis1, perfil.SemiAxis2
+    elif perfil.is_a('IfcParameterizedProfileDef'):
+        # Perfis de aço (I, L, T, U, C, Z): retângulo de largura x altura total
+        info = perfil.get_info()
+        largura = next((info[a] for a in ("OverallWidth", "Width", "FlangeWidth") if info.get(a)), None)
+        altura = next((info[a] for a in ("OverallDepth", "Depth") if info.get(a)), None)
+        if largura is None or altura is None:
+            return None
+        meia_x, meia_y = largura / 2, altura / 2
+    else:
+        return None
+
+    pontos = np.array([[-meia_x, -meia_y, 0.0], [meia_x, -meia_y, 0.0],
+                       [-meia_x, meia_y, 0.0], [meia_x, meia_y, 0.0]])
+    matriz = matriz_posicionamento(perfil.Position)
+    return (pontos @ matriz[:3, :3].T + matriz[:3, 3])[:, :2]
+
+
+# ==============================
+# Índice espacial
+# ==============================
+
+class GradeUniforme:
+    """
+    Índice espacial de caixas em uma grade regular 3D.
+
+    Cada caixa é registrada nas células que ela ocupa; extensões infinitas
+    (ex.: a faixa de um andar, ilimitada em x e y) são recortadas pelos
+    limites da cena. O tamanho das células em cada eixo segue a mediana do
+    tamanho das caixas, de modo que cada célula guarda poucos candidatos.
+    Uma caixa que contém outra contém o seu centro: basta consultar a célula
+    do centro de cada caixa procurada.
+    """
+
+    def __init__(self, minimos: np.ndarray, maximos: np.ndarray, limites, folga: float = 0.0):
+        self.minimos = minimos
+        self.maximos = maximos
+        self.folga = folga
+        self.inferior = np.asarray(limites[0], dtype=float)
+        extensao = np.maximum(np.asarray(limites[1], dtype=float) - self.inferior, 1e-9)
+
+        self.celulas = np.ones(3, dtype=np.int64)
+        tamanhos = maximos - minimos
+        for eixo in range(3):
+            finitos = tamanhos[:, eixo][np.isfinite(tamanhos[:, eixo]) & (tamanhos[:, eixo] > 0)]
+            if len(finitos):
+                self.celulas[eixo] = int(np.clip(np.ceil(extensao[eixo] / np.median(finitos)), 1, MAX_CELULAS_EIXO))
+        self.tamanho_celula = extensao / self.celulas
+
+        self.por_celula = {}
+        inicio = self._celula(minimos - folga)
+        fim = self._celula(maximos + folga)
+        for indice, (a, b) in enumerate(zip(inicio, fim)):
+            faixas = np.meshgrid(*(np.arange(a[e], b[e] + 1) for e in range(3)), indexing='ij')
+            for celula in np.ravel_multi_index([f.ravel() for f in faixas], self.celulas):
+                self.por_celula.setdefault(int(celula), []).append(indice)
+        self.por_celula = {c: np.array(v, dtype=np.int64) for c, v in self.por_celula.items()}
+
+    def _celula(self, pontos: np.ndarray) -> np.ndarray:
+        relativos = np.nan_to_num((pontos - self.inferior) / self.tamanho_celula, posinf=1e18, neginf=-1e18)
+        return np.clip(np.floor(relativos), 0, self.celulas - 1).astype(np.int64)
+
+    def contendo(self, minimos: np.ndarray, maximos: np.ndarray) -> list:
+        """Para cada caixa consultada, os índices das caixas do índice que a contêm."""
+        centros = (minimos + maximos) / 2
+        celulas = np.ravel_multi_index(self._celula(centros).T, self.celulas)
+        resultado = [np.empty(0, dtype=np.int64)] * len(minimos)
+        ordem = np.argsort(celulas, kind='stable')
+        grupos = np.split(ordem, np.flatnonzero(np.diff(celulas[ordem])) + 1)
+        for grupo in grupos:
+            if not len(grupo):
+                continue
+            candidatos = self.por_celula.get(int(celulas[grupo[0]]))
+            if candidatos is None:
+                continue
+            dentro = np.all(minimos[grupo, None, :] >= self.minimos[None, candidatos] - self.folga, axis=2) & \
+                np.all(maximos[grupo, None, :] <= self.maximos[None, candidatos] + self.folga, axis=2)
+            for posicao, linha in zip(grupo, dentro):
+                resultado[posicao] = candidatos[linha]
+        return resultado
+
+
+# ==============================
+# Contenção geométrica
+# ==============================
+
+def _escala_unidade(ifc) -> float:
+    """Metros por unidade de comprimento do modelo (1.0 se não declarada)."""
+    try:
+        import ifcopenshell.util.unit  # type: ignore
+        return ifcopenshell.util.unit.calculate_unit_scale(ifc) or 1.0
+    except Exception:
+        return 1.0
+
+
+def tolerancia_padrao(ifc) -> float:
+    """TOLERANCIA_PADRAO_M convertida para a unidade de comprimento do modelo."""
+    return TOLERANCIA_PADRAO_M / _escala_unidade(ifc)
+
+
+class ContencaoGeometrica:
+    """
+    Caixas globais de todos os produtos e resultado da verificação das
+    arestas declaradas filho -> pai. Ver analisar_contencao_geometrica.
+    """
+
+    def __init__(self, guids: list, tipos: list, minimos: np.ndarray, maximos: np.ndarray,
+                 filhos: np.ndarray, pais: np.ndarray, dentro: np.ndarray, verificavel: np.ndarray,
+                 grade: GradeUniforme, conteineres: np.ndarray):
+        self.guids = guids
+        self.tipos = tipos
+        self.minimos = minimos
+        self.maximos = maximos
+        self.filhos = filhos
+        self.pais = pais
+        self.dentro = dentro
+        self.verificavel = verificavel
+        self.grade = grade
+        self.conteineres = conteineres
+
+    def estatisticas(self) -> dict:
+        return {
+            "arestas": len(self.filhos),
+            "confirmadas": int(np.sum(self.dentro & self.verificavel)),
+            "divergentes": int(np.sum(~self.dentro)),
+            "sem_geometria": int(np.sum(~self.verificavel)),
+        }
+
+    def linhas(self):
+        """Linhas {child_guid, parent_guid, relacao} das arestas não contraditas pela geometria."""
+        for filho, pai in zip(self.filhos[self.dentro], self.pais[self.dentro]):
+            yield {"child_guid": self.guids[filho], "parent_guid": self.guids[pai], "relacao": REL_GEOMETRICA}
+
+    def divergencias(self):
+        """
+        Arestas contraditas pela geometria, com os contêineres (do mais
+        específico ao mais amplo) em que o elemento de fato está.
+        """
+        divergentes = np.flatnonzero(~self.dentro)
+        filhos = self.filhos[divergentes]
+        candidatos = self.grade.contendo(self.minimos[filhos], self.maximos[filhos]) if self.grade else \
+            [np.empty(0, dtype=np.int64)] * len(filhos)
+        volumes = np.prod(self.maximos - self.minimos, axis=1)
+        for aresta, encontrados in zip(divergentes, candidatos):
+            encontrados = self.conteineres[encontrados]
+            encontrados = encontrados[np.argsort(volumes[encontrados], kind='stable')]
+            filho, pai = self.filhos[aresta], self.pais[aresta]
+            yield {
+                "child_guid": self.guids[filho],
+                "tipo": self.tipos[filho],
+                "parent_guid": self.guids[pai],
+                "tipo_pai": self.tipos[pai],
+                "candidatos": [self.guids[c] for c in encontrados if c != filho],
+            }
+
+
+def _arestas_declaradas(ifc):
+    """Pares (filho, pai) de contenção espacial e de agregação entre produtos."""
+    for rel in ifc.by_type('IfcRelContainedInSpatialStructure'):
+        if rel.RelatingStructure is not None:
+            for filho in rel.RelatedElements:
+                yield filho, rel.RelatingStructure
+    for rel in ifc.by_type('IfcRelAggregates'):
+        if rel.RelatingObject is not None and rel.RelatingObject.is_a('IfcProduct'):
+            for parte in rel.RelatedObjects:
+                if parte.is_a('IfcProduct'):
+                    yield parte, rel.RelatingObject
+
+
+def _espacial(produto) -> bool:
+    return any(produto.is_a(tipo) for tipo in TIPOS_ESPACIAIS)
+
+
+def ler_produtos(produtos, extrator: ExtratorCaixas) -> dict:
+    """
+    Dados de uma lista (ou fatia) de IfcProduct em arrays: id, GUID, tipo,
+    id do posicionamento (-1 se não houver), caixa local (NaN sem
+    geometria), se é contêiner espacial e, para os andares, o id do todo
+    que os agrega (-1 nos demais). Como ler_posicionamentos, pode ser
+    feita por fatias em paralelo.
+    """
+    n = len(produtos)
+    dados = {
+        "ids": np.empty(n, dtype=np.int64), "guids": [], "tipos": [],
+        "ids_posicionamentos": np.full(n, -1, dtype=np.int64),
+        "minimos": np.full((n, 3), np.nan), "maximos": np.full((n, 3), np.nan),
+        "espacial": np.zeros(n, dtype=bool), "ids_todo_andar": np.full(n, -1, dtype=np.int64),
+        "andar": np.zeros(n, dtype=bool),
+    }
+    for i, p in enumerate(produtos):
+        dados["ids"][i] = p.id()
+        dados["guids"].append(p.GlobalId)
+        dados["tipos"].append(p.is_a())
+        if p.ObjectPlacement is not None:
+            dados["ids_posicionamentos"][i] = p.ObjectPlacement.id()
+        caixa = extrator.caixa_produto(p)
+        if caixa is not None:
+            dados["minimos"][i], dados["maximos"][i] = caixa
+        dados["espacial"][i] = _espacial(p)
+        if p.is_a('IfcBuildingStorey'):
+            dados["andar"][i] = True
+            todo = next((r.RelatingObject for r in p.Decomposes or ()), None)
+            if todo is not None:
+                dados["ids_todo_andar"][i] = todo.id()
+    return dados
+
+
+def ler_arestas(ifc) -> np.ndarray:
+    """Ids das entidades (filho, pai) das arestas declaradas, em um array (k, 2)."""
+    return np.array([(f.id(), p.id()) for f, p in _arestas_declaradas(ifc)], dtype=np.int64).reshape(-1, 2)
+
+
+def concatenar(partes: list) -> dict:
+    """Junta, na ordem, os dicionários de arrays de várias fatias (ler_posicionamentos / ler_produtos)."""
+    return {chave: (sum((parte[chave] for parte in partes), []) if isinstance(partes[0][chave], list)
+                    else np.concatenate([parte[chave] for parte in partes]))
+            for chave in partes[0]}
+
+
+def analisar_contencao_geometrica(ifc, tolerancia: float = None) -> ContencaoGeometrica:
+    """
+    Calcula as caixas globais dos produtos e confere as arestas declaradas.
+
+    :param ifc: Arquivo aberto com ifcopenshell
+    :param tolerancia: Folga, em unidades do modelo; por padrão,
+                       TOLERANCIA_PADRAO_M convertida para a unidade do arquivo
+    """
+    if tolerancia is None:
+        tolerancia = tolerancia_padrao(ifc)
+    return montar_contencao(ler_posicionamentos(ifc.by_type('IfcLocalPlacement')),
+                            ler_produtos(ifc.by_type('IfcProduct'), ExtratorCaixas(ifc)),
+                            ler_arestas(ifc), tolerancia)
+
+
+def montar_contencao(posicionamentos: dict, produtos: dict, arestas: np.ndarray,
+                     tolerancia: float) -> ContencaoGeometrica:
+    """
+    Verificação da contenção sobre os arrays já lidos do modelo (ver
+    ler_posicionamentos, ler_produtos e ler_arestas); não acessa o IFC.
+
+    :param tolerancia: Folga, em unidades do modelo
+    """
+    linha_produto = {int(i): linha for linha, i in enumerate(produtos["ids"])}
+    n = len(produtos["ids"])
+
+    # 1. Transformações globais de todos os posicionamentos
+    linha_posicionamento, matrizes = compor_posicionamentos(posicionamentos)
+    matrizes_produtos = np.broadcast_to(np.eye(4), (n, 4, 4)).copy()
+    for i, id_posicionamento in enumerate(produtos["ids_posicionamentos"].tolist()):
+        linha = linha_posicionamento.get(id_posicionamento)
+        if linha is not None:
+            matrizes_produtos[i] = matrizes[linha]
+
+    # 2. Caixas locais -> caixas globais, em bloco
+    minimos, maximos = produtos["minimos"].copy(), produtos["maximos"].copy()
+    com_caixa = ~np.isnan(minimos[:, 0])
+    minimos[com_caixa], maximos[com_caixa] = transformar_caixas(
+        matrizes_produtos[com_caixa], minimos[com_caixa], maximos[com_caixa])
+
+    # 3. Andares sem geometria: faixa de cotas até o próximo andar do mesmo edifício
+    andares_por_edificio = {}
+    for i in np.flatnonzero(produtos["andar"] & ~com_caixa).tolist():
+        andares_por_edificio.setdefault(int(produtos["ids_todo_andar"][i]), []).append(i)
+    for andares in andares_por_edificio.values():
+        cotas = matrizes_produtos[andares, 2, 3]
+        ordem = np.argsort(cotas, kind='stable')
+        for posicao, i in enumerate(np.asarray(andares)[ordem]):
+            acima = cotas[ordem][posicao + 1:]
+            acima = acima[acima > cotas[ordem][posicao]]
+            minimos[i] = (-INFINITO, -INFINITO, cotas[ordem][posicao])
+            maximos[i] = (INFINITO, INFINITO, acima[0] if len(acima) else INFINITO)
+    com_extensao = ~np.isnan(minimos[:, 0])
+
+    # 4. Verificação vetorizada das arestas declaradas
+    arestas = [(linha_produto[f], linha_produto[p]) for f, p in arestas.tolist()
+               if f in linha_produto and p in linha_produto]
+    filhos = np.array([f for f, _ in arestas], dtype=np.int64)
+    pais = np.array([p for _, p in arestas], dtype=np.int64)
+    verificavel = com_extensao[filhos] & com_extensao[pais]
+    dentro = np.ones(len(arestas), dtype=bool)
+    if verificavel.any():
+        f, p = filhos[verificavel], pais[verificavel]
+        dentro[verificavel] = np.all(minimos[f] >= minimos[p] - tolerancia, axis=1) & \
+            np.all(maximos[f] <= maximos[p] + tolerancia, axis=1)
+
+    # 5. Grade sobre os contêineres espaciais (usada para localizar os divergentes)
+    conteineres = np.flatnonzero(produtos["espacial"] & com_extensao).astype(np.int64)
+    grade = None
+    if len(conteineres):
+        finitos_min = np.where(np.isfinite(minimos[com_extensao]), minimos[com_extensao], np.nan)
+        finitos_max = np.where(np.isfinite(maximos[com_extensao]), maximos[com_extensao], np.nan)
+        limites = (np.nan_to_num(np.nanmin(finitos_min, axis=0)), np.nan_to_num(np.nanmax(finitos_max, axis=0)))
+        grade = GradeUniforme(minimos[conteineres], maximos[conteineres], limites, tolerancia)
+
+    return ContencaoGeometrica(produtos["guids"], produtos["tipos"],
+                               minimos, maximos, filhos, pais, dentro, verificavel, grade, conteineres)
+
+
+def iterar_contencao_geometrica(ifc):
+    """
+    Percorre as arestas derivadas de contenção geométrica (isWithin).
+
+    :param ifc: Arquivo aberto com ifcopenshell
+    :return: Gerador de dicionários {child_guid, parent_guid, relacao}
+    """
+    yield from analisar_contencao_geometrica(ifc).linhas()
+
+
+if __name__ == "__main__":
+    import ifcopenshell  # type: ignore
+
+    parser_arg = argparse.ArgumentParser(description="Verificação geométrica da contenção espacial")
+    parser_arg.add_argument("ifc", type=str, help="Arquivo IFC")
+    parser_arg.add_argument("--tolerancia", type=float, default=None,
+                            help=f"Folga em unidades do modelo (padrão: {TOLERANCIA_PADRAO_M} m)")
+    args = parser_arg.parse_args()
+
+    resultado = analisar_contencao_geometrica(ifcopenshell.open(args.ifc), args.tolerancia)
+    stats = resultado.estatisticas()
+    print(f"📐 {stats['arestas']} arestas declaradas: {stats['confirmadas']} confirmadas pela geometria, "
+          f"{stats['divergentes']} divergentes, {stats['sem_geometria']} sem geometria para conferir.")
+    for d in resultado.divergencias():
+        provavel = d["candidatos"][0] if d["candidatos"] else "nenhum contêiner"
+        print(f"   - 🚨 {d['tipo']} {d['child_guid']} fora de {d['tipo_pai']} {d['parent_guid']} "
+              f"(provável: {provavel})")
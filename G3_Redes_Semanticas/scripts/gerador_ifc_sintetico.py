@@ -0,0 +1,332 @@
+# gerador_ifc_sintetico.py
+
+"""
+Gerador de modelos IFC sintéticos para testes de escala.
+
+Gera um arquivo IFC4 (STEP) com projeto -> terreno -> edifício -> andares
+(IfcRelAggregates) e, em cada andar, paredes, portas, janelas e lajes
+contidas no andar (IfcRelContainedInSpatialStructure). Cada porta e janela
+é hospedada em uma parede do mesmo andar por uma abertura
+(IfcOpeningElement + IfcRelVoidsElement + IfcRelFillsElement). Uma fração
+das paredes, portas e janelas é deixada propositalmente sem contenção nem
+abertura ("órfãos"), para que as regras do auditor encontrem anomalias.
+
+Cada andar tem um posicionamento na sua cota (ALTURA_ANDAR por andar) e
+cada elemento, um posicionamento relativo ao andar e uma representação
+'Box' (IfcBoundingBox) compartilhada por tipo. Uma fração dos elementos
+contidos é posicionada fora da faixa de cotas do seu andar ("deslocados"),
+para as regras geométricas (DENTRO_DE).
+
+Cada tipo tem um conjunto de quantidades (IfcElementQuantity
+"Qto_<Tipo>BaseQuantities", com as dimensões e o volume da caixa)
+compartilhado pelos seus elementos por IfcRelDefinesByProperties, um por
+andar. Uma fração dos elementos recebe o conjunto com volume nulo
+("volume nulo"), para as regras de QUANTIDADE.
+
+Cada tipo também tem um IfcTypeObject (IfcWallType...) com um material
+(IfcRelAssociatesMaterial no tipo), atribuído aos elementos por
+IfcRelDefinesByType, um por andar. Uma fração dos elementos fica sem tipo
+e, portanto, sem material ("sem tipo"), para as regras TEM TIPO / TEM MATERIAL.
+
+O arquivo é escrito linha a linha, sem montar o modelo em memória, e é
+determinístico para uma mesma semente.
+"""
+
+import uuid
+import random
+import argparse
+
+import ifcopenshell.guid  # type: ignore
+
+# Proporção de cada tipo entre os elementos de um andar
+PROPORCOES_PADRAO = {
+    "IfcWall": 0.5,
+    "IfcDoor": 0.2,
+    "IfcWindow": 0.2,
+    "IfcSlab": 0.1,
+}
+
+# Tipos que podem ficar órfãos (sem contenção espacial nem hospedeiro)
+TIPOS_ORFAOS = ("IfcWall", "IfcDoor", "IfcWindow")
+
+# Tipos hospedados em uma parede por meio de uma abertura
+TIPOS_HOSPEDADOS = ("IfcDoor", "IfcWindow")
+
+# Geometria: pé-direito dos andares, lado da área ocupada em planta e
+# caixa (dx, dy, dz, cota da base) de cada tipo, relativa ao andar
+ALTURA_ANDAR = 3.0
+LADO_PLANTA = 100.0
+CAIXAS_POR_TIPO = {
+    "IfcWall": (4.0, 0.2, 2.8, 0.0),
+    "IfcDoor": (0.9, 0.1, 2.1, 0.0),
+    "IfcWindow": (1.2, 0.1, 1.2, 1.0),
+    "IfcSlab": (5.0, 5.0, 0.2, 0.0),
+}
+
+# IfcTypeObject de cada tipo: entidade, atributos após ElementType no IFC4 e material
+TIPOS_OBJETO = {
+    "IfcWall": ("IfcWallType", ".NOTDEFINED.", "Alvenaria"),
+    "IfcDoor": ("IfcDoorType", ".NOTDEFINED.,.NOTDEFINED.,$,$", "Madeira"),
+    "IfcWindow": ("IfcWindowType", ".NOTDEFINED.,.NOTDEFINED.,$,$", "Vidro"),
+    "IfcSlab": ("IfcSlabType", ".NOTDEFINED.", "Concreto"),
+}
+
+# Número de atributos após (GlobalId, OwnerHistory, Name) de cada entidade no IFC4
+ATRIBUTOS_RESTANTES = {
+    "IfcProject": 6,
+    "IfcSite": 11,
+    "IfcBuilding": 9,
+    "IfcBuildingStorey": 7,
+    "IfcWall": 6,
+    "IfcDoor": 10,
+    "IfcWindow": 10,
+    "IfcSlab": 6,
+    "IfcOpeningElement": 6,
+}
+
+
+def _texto_step(valor: str) -> str:
+    return "'" + valor.replace("'", "''") + "'"
+
+
+class EscritorStep:
+    """Escreve entidades STEP numeradas sequencialmente em um arquivo."""
+
+    def __init__(self, arquivo, rng: random.Random):
+        self.arquivo = arquivo
+        self.rng = rng
+        self.proximo_id = 1
+
+    def novo_guid(self) -> str:
+        return ifcopenshell.guid.compress(uuid.UUID(int=self.rng.getrandbits(128)).hex)
+
+    def entidade(self, tipo: str, atributos: str) -> int:
+        id_entidade = self.proximo_id
+        self.proximo_id += 1
+        self.arquivo.write(f"#{id_entidade}={tipo.upper()}({atributos});\n")
+        return id_entidade
+
+    def produto(self, tipo: str, nome: str, posicionamento: int = None, representacao: int = None) -> int:
+        # Em todo IfcProduct: Description, ObjectType, ObjectPlacement, Representation, ...
+        restantes = ["$"] * ATRIBUTOS_RESTANTES[tipo]
+        if posicionamento is not None:
+            restantes[2] = f"#{posicionamento}"
+        if representacao is not None:
+            restantes[3] = f"#{representacao}"
+        return self.entidade(tipo, f"{_texto_step(self.novo_guid())},$,{_texto_step(nome)},{','.join(restantes)}")
+
+    def posicionamento(self, x: float, y: float, z: float, relativo_a: int = None) -> int:
+        """IfcLocalPlacement na posição (x, y, z), relativo a outro posicionamento."""
+        ponto = self.entidade("IfcCartesianPoint", f"({x:.3f},{y:.3f},{z:.3f})")
+        eixos = self.entidade("IfcAxis2Placement3D", f"#{ponto},$,$")
+        relativo = f"#{relativo_a}" if relativo_a is not None else "$"
+        return self.entidade("IfcLocalPlacement", f"{relativo},#{eixos}")
+
+    def representacao_caixa(self, contexto: int, dx: float, dy: float, dz: float, z: float) -> int:
+        """IfcProductDefinitionShape com uma representação 'Box' (IfcBoundingBox)."""
+        canto = self.entidade("IfcCartesianPoint", f"(0.,0.,{z:.3f})")
+        caixa = self.entidade("IfcBoundingBox", f"#{canto},{dx:.3f},{dy:.3f},{dz:.3f}")
+        forma = self.entidade("IfcShapeRepresentation", f"#{contexto},'Box','BoundingBox',(#{caixa})")
+        return self.entidade("IfcProductDefinitionShape", f"$,$,(#{forma})")
+
+    def relacao(self, tipo: str, relacionados: list, relacionador: int, relacionador_primeiro: bool):
+        lista = "(" + ",".join(f"#{i}" for i in relacionados) + ")"
+        if relacionador_primeiro:
+            # IfcRelAggregates: RelatingObject, RelatedObjects
+            argumentos = f"#{relacionador},{lista}"
+        else:
+            # IfcRelContainedInSpatialStructure: RelatedElements, RelatingStructure
+            argumentos = f"{lista},#{relacionador}"
+        return self.entidade(tipo, f"{_texto_step(self.novo_guid())},$,$,$,{argumentos}")
+
+    def conjunto_quantidades(self, nome: str, dx: float, dy: float, dz: float, volume: float) -> int:
+        """IfcElementQuantity com comprimento, largura, altura e volume líquido."""
+        quantidades = [
+            self.entidade("IfcQuantityLength", f"'Length',$,$,{dx:.3f},$"),
+            self.entidade("IfcQuantityLength", f"'Width',$,$,{dy:.3f},$"),
+            self.entidade("IfcQuantityLength", f"'Height',$,$,{dz:.3f},$"),
+            self.entidade("IfcQuantityVolume", f"'NetVolume',$,$,{volume:.6f},$"),
+        ]
+        lista = "(" + ",".join(f"#{q}" for q in quantidades) + ")"
+        return self.entidade("IfcElementQuantity",
+                             f"{_texto_step(self.novo_guid())},$,{_texto_step(nome)},$,$,{lista}")
+
+    def tipo_objeto(self, tipo: str, nome: str) -> int:
+        """IfcTypeObject do tipo de elemento, com o material associado ao próprio tipo."""
+        entidade, atributos, nome_material = TIPOS_OBJETO[tipo]
+        tipo_objeto = self.entidade(entidade, f"{_texto_step(self.novo_guid())},$,{_texto_step(nome)},"
+                                              f"$,$,$,$,$,$,{atributos}")
+        material = self.entidade("IfcMaterial", f"{_texto_step(nome_material)},$,$")
+        self.definicao("IfcRelAssociatesMaterial", [tipo_objeto], material)
+        return tipo_objeto
+
+    def definicao(self, tipo: str, relacionados: list, definidor: int):
+        """
+        Relação 1:N com os relacionados primeiro (RelatedObjects, Relating...):
+        IfcRelDefinesByProperties, IfcRelDefinesByType, IfcRelAssociatesMaterial.
+        """
+        lista = "(" + ",".join(f"#{i}" for i in relacionados) + ")"
+        return self.entidade(tipo, f"{_texto_step(self.novo_guid())},$,$,$,{lista},#{definidor}")
+
+    def relacao_simples(self, tipo: str, relacionador: int, relacionado: int):
+        """Relação 1:1, como IfcRelVoidsElement e IfcRelFillsElement."""
+        return self.entidade(tipo, f"{_texto_step(self.novo_guid())},$,$,$,#{relacionador},#{relacionado}")
+
+
+def gerar_modelo_sintetico(caminho: str, andares: int, elementos_por_andar: int,
+                           fracao_orfaos: float = 0.05, semente: int = 42,
+                           proporcoes: dict = None, fracao_deslocados: float = 0.02,
+                           fracao_volume_nulo: float = 0.01, fracao_sem_tipo: float = 0.01) -> dict:
+    """
+    Gera um modelo IFC sintético.
+
+    :param caminho: Arquivo .ifc de saída
+    :param andares: Número de andares (IfcBuildingStorey)
+    :param elementos_por_andar: Número de elementos em cada andar
+    :param fracao_orfaos: Fração (0..1) de paredes, portas e janelas sem contenção
+    :param semente: Semente do gerador aleatório (GUIDs e escolha dos órfãos)
+    :param proporcoes: Proporção de cada tipo IFC entre os elementos do andar
+    :param fracao_deslocados: Fração (0..1) dos elementos contidos posicionados
+                              abaixo da cota do seu andar
+    :param fracao_volume_nulo: Fração (0..1) dos elementos com NetVolume = 0
+    :param fracao_sem_tipo: Fração (0..1) dos elementos sem tipo nem material
+    :return: Estatísticas do modelo gerado (produtos, órfãos por tipo etc.)
+    """
+    rng = random.Random(semente)
+    proporcoes = proporcoes or PROPORCOES_PADRAO
+    total_proporcoes = sum(proporcoes.values())
+
+    # Quantidade de cada tipo por andar (o resto do arredondamento vai para o primeiro tipo)
+    quantidades = {t: int(elementos_por_andar * p / total_proporcoes) for t, p in proporcoes.items()}
+    primeiro_tipo = next(iter(quantidades))
+    quantidades[primeiro_tipo] += elementos_por_andar - sum(quantidades.values())
+
+    estatisticas = {
+        "andares": andares,
+        "elementos_por_andar": elementos_por_andar,
+        "fracao_orfaos": fracao_orfaos,
+        "produtos": 0,
+        "orfaos": {t: 0 for t in TIPOS_ORFAOS},
+        "fracao_deslocados": fracao_deslocados,
+        "deslocados": {t: 0 for t in quantidades},
+        "fracao_volume_nulo": fracao_volume_nulo,
+        "volume_nulo": {t: 0 for t in quantidades},
+        "fracao_sem_tipo": fracao_sem_tipo,
+        "sem_tipo": {t: 0 for t in quantidades},
+        "aberturas": 0,
+        "por_tipo": {t: 0 for t in quantidades},
+    }
+
+    with open(caminho, 'w', encoding='utf-8', newline='\n') as f:
+        f.write("ISO-10303-21;\nHEADER;\n")
+        f.write("FILE_DESCRIPTION(('ViewDefinition [ReferenceView]'),'2;1');\n")
+        f.write(f"FILE_NAME({_texto_step('sintetico.ifc')},'2025-01-01T00:00:00',(''),(''),'','','');\n")
+        f.write("FILE_SCHEMA(('IFC4'));\nENDSEC;\nDATA;\n")
+
+        step = EscritorStep(f, rng)
+        origem = step.entidade("IfcCartesianPoint", "(0.,0.,0.)")
+        sistema = step.entidade("IfcAxis2Placement3D", f"#{origem},$,$")
+        contexto = step.entidade("IfcGeometricRepresentationContext", f"$,'Model',3,1.E-05,#{sistema},$")
+        projeto = step.entidade(
+            "IfcProject", f"{_texto_step(step.novo_guid())},$,'Projeto Sintetico',$,$,$,$,(#{contexto}),$")
+        pos_terreno = step.posicionamento(0.0, 0.0, 0.0)
+        pos_edificio = step.posicionamento(0.0, 0.0, 0.0, pos_terreno)
+        terreno = step.produto("IfcSite", "Terreno", pos_terreno)
+        edificio = step.produto("IfcBuilding", "Edificio", pos_edificio)
+        formas = {t: step.representacao_caixa(contexto, *CAIXAS_POR_TIPO[t])
+                  for t in quantidades if t in CAIXAS_POR_TIPO}
+        # Conjuntos de quantidades por tipo: (volume da caixa, volume nulo)
+        conjuntos = {}
+        for t in formas:
+            dx, dy, dz, _ = CAIXAS_POR_TIPO[t]
+            nome = f"Qto_{t[3:]}BaseQuantities"
+            conjuntos[t] = (step.conjunto_quantidades(nome, dx, dy, dz, dx * dy * dz),
+                            step.conjunto_quantidades(nome, dx, dy, dz, 0.0))
+        tipos_objeto = {t: step.tipo_objeto(t, f"{t[3:]} padrao")
+                        for t in quantidades if t in TIPOS_OBJETO}
+        step.relacao("IfcRelAggregates", [terreno], projeto, True)
+        step.relacao("IfcRelAggregates", [edificio], terreno, True)
+        estatisticas["produtos"] += 2
+
+        ids_andares = []
+        for n in range(andares):
+            pos_andar = step.posicionamento(0.0, 0.0, n * ALTURA_ANDAR, pos_edificio)
+            andar = step.produto("IfcBuildingStorey", f"Andar {n:03d}", pos_andar)
+            ids_andares.append(andar)
+            estatisticas["produtos"] += 1
+
+            contidos = []
+            paredes = []
+            definidos = {}  # (relação, conjunto de quantidades ou tipo) -> elementos do andar
+            for tipo, quantidade in quantidades.items():
+                for i in range(quantidade):
+                    orfao = tipo in TIPOS_ORFAOS and rng.random() < fracao_orfaos
+                    # Deslocados atravessam a cota do andar: ficam fora da sua faixa
+                    deslocado = not orfao and rng.random() < fracao_deslocados
+                    z = -ALTURA_ANDAR / 2 if deslocado else 0.0
+                    posicao = step.posicionamento(rng.uniform(0, LADO_PLANTA), rng.uniform(0, LADO_PLANTA), z,
+                                                  pos_andar)
+                    elemento = step.produto(tipo, f"{tipo[3:]} {n:03d}-{i:06d}", posicao, formas.get(tipo))
+                    estatisticas["produtos"] += 1
+                    estatisticas["por_tipo"][tipo] += 1
+                    if tipo in conjuntos:
+                        volume_nulo = rng.random() < fracao_volume_nulo
+                        chave = ("IfcRelDefinesByProperties", conjuntos[tipo][volume_nulo])
+                        definidos.setdefault(chave, []).append(elemento)
+                        estatisticas["volume_nulo"][tipo] += volume_nulo
+                    if tipo in tipos_objeto:
+                        if rng.random() < fracao_sem_tipo:
+                            estatisticas["sem_tipo"][tipo] += 1
+                        else:
+                            definidos.setdefault(("IfcRelDefinesByType", tipos_objeto[tipo]), []).append(elemento)
+                    if orfao:
+                        estatisticas["orfaos"][tipo] += 1
+                        continue
+                    if deslocado:
+                        estatisticas["deslocados"][tipo] += 1
+                    contidos.append(elemento)
+                    if tipo == "IfcWall":
+                        paredes.append(elemento)
+                    elif tipo in TIPOS_HOSPEDADOS and paredes:
+                        abertura = step.produto("IfcOpeningElement", f"Abertura {n:03d}-{i:06d}")
+                        step.relacao_simples("IfcRelVoidsElement", rng.choice(paredes), abertura)
+                        step.relacao_simples("IfcRelFillsElement", abertura, elemento)
+                        estatisticas["produtos"] += 1
+                        estatisticas["aberturas"] += 1
+
+            if contidos:
+                step.relacao("IfcRelContainedInSpatialStructure", contidos, andar, False)
+            for (relacao, definidor), elementos in definidos.items():
+                step.definicao(relacao, elementos, definidor)
+
+        if ids_andares:
+            step.relacao("IfcRelAggregates", ids_andares, edificio, True)
+
+        f.write("ENDSEC;\nEND-ISO-10303-21;\n")
+
+    return estatisticas
+
+
+if __name__ == "__main__":
+    parser_arg = argparse.ArgumentParser(description="Gerador de modelos IFC sintéticos")
+    parser_arg.add_argument("saida", type=str, help="Arquivo .ifc de saída")
+    parser_arg.add_argument("--andares", type=int, default=10, help="Número de andares")
+    parser_arg.add_argument("--elementos-por-andar", type=int, default=100,
+                            help="Número de elementos em cada andar")
+    parser_arg.add_argument("--fracao-orfaos", type=float, default=0.05,
+                            help="Fração de paredes, portas e janelas sem contenção")
+    parser_arg.add_argument("--fracao-deslocados", type=float, default=0.02,
+                            help="Fração dos elementos contidos posicionados fora da faixa do andar")
+    parser_arg.add_argument("--fracao-volume-nulo", type=float, default=0.01,
+                            help="Fração dos elementos com quantidade NetVolume nula")
+    parser_arg.add_argument("--fracao-sem-tipo", type=float, default=0.01,
+                            help="Fração dos elementos sem tipo (IfcTypeObject) nem material")
+    parser_arg.add_argument("--semente", type=int, default=42, help="Semente aleatória")
+    args = parser_arg.parse_args()
+
+    stats = gerar_modelo_sintetico(args.saida, args.andares, args.elementos_por_andar,
+                                   args.fracao_orfaos, args.semente, fracao_deslocados=args.fracao_deslocados,
+                                   fracao_volume_nulo=args.fracao_volume_nulo, fracao_sem_tipo=args.fracao_sem_tipo)
+    print(f"✅ Modelo '{args.saida}' gerado: {stats['produtos']} produtos, "
+          f"{sum(stats['orfaos'].values())} órfãos, {sum(stats['deslocados'].values())} deslocados, "
+          f"{sum(stats['volume_nulo'].values())} com volume nulo, {sum(stats['sem_tipo'].values())} sem tipo.")
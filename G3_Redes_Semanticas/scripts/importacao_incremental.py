@@ -0,0 +1,236 @@
+# importacao_incremental.py
+
+"""
+Importação incremental baseada em manifesto.
+
+O manifesto é um arquivo JSON local, salvo ao lado do IFC, que guarda para
+cada GlobalId um hash do conteúdo relevante ao grafo (tipo IFC, nome, pais
+de contenção e das relações complementares, valores das propriedades) e o
+tipo IFC (necessário para retirar o label antigo do nó), além de um hash só
+dos pais e dos rótulos do índice de ancestrais (entrada, saida,
+tipos_ancestrais) gravados no elemento.
+Comparando o manifesto salvo com o do modelo revisado obtemos apenas os
+elementos inseridos, atualizados e removidos; aplicar_diferenca leva essas
+alterações a um destino de lotes no esquema RDF (Neo4j ou grafo em memória).
+
+Os intervalos do índice de ancestrais só se movem com inserções, remoções ou
+troca de pais (estrutura_alterada); linhas_indice_a_gravar compara os
+rótulos novos com os do manifesto e devolve só os que precisam ir ao banco.
+"""
+
+import os
+import json
+import hashlib
+from collections import defaultdict
+from contextlib import nullcontext
+from itertools import islice
+
+from extracao_ifc import BLDG, gerar_triplas
+from persistencia_lote import EscritorEmLote, TAMANHO_LOTE_PADRAO
+
+VERSAO_MANIFESTO = 4
+
+
+def caminho_manifesto(caminho_ifc: str, esquema: str) -> str:
+    """
+    Arquivo de manifesto associado a um modelo IFC.
+
+    :param esquema: Nome do esquema de grafo ('rdf' ou 'semantico'); cada
+                    importador mantém o seu manifesto
+    """
+    return f"{caminho_ifc}.{esquema}.manifesto.json"
+
+
+def mapa_pais(contencoes) -> dict:
+    """
+    Monta o mapa filho -> pai de contenção (ou de outra relação).
+
+    Linhas de relações complementares (com a chave 'relacao') entram como
+    'relacao:pai'. Se um elemento aparecer em mais de uma relação, os pais
+    são combinados em ordem alfabética para que o hash continue determinístico.
+    """
+    pais = {}
+    for c in contencoes:
+        pai = f"{c['relacao']}:{c['parent_guid']}" if "relacao" in c else c["parent_guid"]
+        atual = pais.get(c["child_guid"])
+        if atual is None:
+            pais[c["child_guid"]] = pai
+        else:
+            pais[c["child_guid"]] = "|".join(sorted(set(atual.split("|")) | {pai}))
+    return pais
+
+
+def mapa_propriedades(propriedades) -> dict:
+    """
+    Monta o mapa GlobalId -> texto canônico das propriedades do elemento.
+    Como no grafo, um valor posterior da mesma coluna sobrescreve o anterior;
+    as colunas são ordenadas para que o hash continue determinístico.
+    """
+    valores = {}
+    for p in propriedades:
+        valores.setdefault(p["guid"], {})[p["coluna"]] = p["valor"]
+    return {
+        guid: "\x1e".join(f"{coluna}={valor!r}" for coluna, valor in sorted(colunas.items()))
+        for guid, colunas in valores.items()
+    }
+
+
+def hash_elemento(elemento: dict, pai, propriedades: str = None) -> str:
+    """Hash do conteúdo do elemento que é refletido no grafo."""
+    conteudo = "\x1f".join((elemento["ifc_type"], elemento["name"] or "", pai or "", propriedades or ""))
+    return hashlib.sha1(conteudo.encode("utf-8")).hexdigest()
+
+
+def calcular_manifesto(elementos, pais: dict, propriedades: dict = None) -> dict:
+    """
+    :param elementos: Iterável de linhas de elemento (ver extracao_ifc)
+    :param pais: Mapa filho -> pai (ver mapa_pais)
+    :param propriedades: Mapa GlobalId -> propriedades (ver mapa_propriedades)
+    :return: Dicionário GlobalId -> {"hash", "tipo", "pais"}
+    """
+    propriedades = propriedades or {}
+    return {
+        e["guid"]: {"hash": hash_elemento(e, pais.get(e["guid"]), propriedades.get(e["guid"])),
+                    "tipo": e["ifc_type"],
+                    "pais": hashlib.sha1((pais.get(e["guid"]) or "").encode("utf-8")).hexdigest()}
+        for e in elementos
+    }
+
+
+def carregar_manifesto(caminho: str):
+    """Lê o manifesto salvo; retorna None se ele não existir ou for inválido."""
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Manifesto '{caminho}' ignorado: {e}")
+        return None
+    if dados.get("versao") != VERSAO_MANIFESTO:
+        return None
+    return dados.get("elementos", {})
+
+
+def salvar_manifesto(caminho: str, manifesto: dict):
+    """Grava o manifesto de forma atômica (arquivo temporário + rename)."""
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({"versao": VERSAO_MANIFESTO, "elementos": manifesto}, f)
+    os.replace(temporario, caminho)
+
+
+def comparar_manifestos(antigo: dict, novo: dict) -> dict:
+    """
+    Diferença entre dois manifestos.
+
+    :return: Dicionário com as listas de GlobalIds 'inseridos', 'atualizados'
+             e 'removidos' (cada lista em ordem alfabética)
+    """
+    inseridos = sorted(g for g in novo if g not in antigo)
+    removidos = sorted(g for g in antigo if g not in novo)
+    atualizados = sorted(
+        g for g in novo
+        if g in antigo and antigo[g]["hash"] != novo[g]["hash"]
+    )
+    return {"inseridos": inseridos, "atualizados": atualizados, "removidos": removidos}
+
+
+def estrutura_alterada(diferenca: dict, antigo: dict, novo: dict) -> bool:
+    """Indica se houve inserção, remoção ou troca de pais, as únicas alterações que movem o índice de ancestrais."""
+    if diferenca["inseridos"] or diferenca["removidos"]:
+        return True
+    return any(antigo[g].get("pais") != novo[g]["pais"] for g in diferenca["atualizados"])
+
+
+def registrar_indice(manifesto: dict, linhas):
+    """Guarda no manifesto os rótulos do índice (linhas {uri: GUID, entrada, saida, tipos_ancestrais})."""
+    for r in linhas:
+        if r["uri"] in manifesto:
+            manifesto[r["uri"]]["indice"] = [r["entrada"], r["saida"], r["tipos_ancestrais"]]
+
+
+def linhas_indice_a_gravar(diferenca: dict, antigo: dict, novo: dict, indice=None) -> list:
+    """
+    Linhas do índice de ancestrais (com a chave GUID) que precisam ser
+    gravadas, registrando em `novo` os rótulos de todos os elementos.
+
+    Os nós inseridos e atualizados são regravados sem os rótulos e sempre
+    os recebem; dos demais, só os que mudaram em relação a `antigo`.
+
+    :param indice: IndiceAncestrais construído sobre o modelo inteiro; None
+                   se a estrutura não mudou (ver estrutura_alterada): os
+                   rótulos anteriores são reaproveitados
+    """
+    recriados = set(diferenca["inseridos"]) | set(diferenca["atualizados"])
+    if indice is None:
+        for guid, entrada in novo.items():
+            if "indice" in antigo.get(guid, {}):
+                entrada["indice"] = antigo[guid]["indice"]
+        return [{"uri": g, "entrada": novo[g]["indice"][0], "saida": novo[g]["indice"][1],
+                 "tipos_ancestrais": novo[g]["indice"][2]}
+                for g in sorted(recriados) if "indice" in novo[g]]
+
+    linhas = []
+    for r in indice.linhas():
+        anterior = antigo.get(r["uri"], {}).get("indice")
+        if r["uri"] in recriados or anterior != [r["entrada"], r["saida"], r["tipos_ancestrais"]]:
+            linhas.append(r)
+    registrar_indice(novo, indice.linhas())
+    return linhas
+
+
+def em_blocos(itens, tamanho: int):
+    """Divide uma lista (ou um gerador, consumido aos poucos) em blocos de até `tamanho` itens."""
+    itens = iter(itens)
+    while True:
+        bloco = list(islice(itens, tamanho))
+        if not bloco:
+            return
+        yield bloco
+
+
+def aplicar_diferenca(destino, diferenca: dict, antigo: dict, elementos_por_guid: dict, contencoes: list,
+                      relacoes: list, propriedades: list, tamanho_lote: int = TAMANHO_LOTE_PADRAO,
+                      instrumentacao=None) -> EscritorEmLote:
+    """
+    Aplica no destino (esquema RDF) as remoções, atualizações e inserções de
+    uma diferença de manifestos.
+
+    :param diferenca: Resultado de comparar_manifestos
+    :param antigo: Manifesto anterior (dá o tipo antigo dos atualizados)
+    :param elementos_por_guid: Linhas de elemento do modelo atual, por GlobalId
+    :param contencoes, relacoes, propriedades: Linhas do modelo atual
+    :param instrumentacao: Se informada, recebe um span por fase
+    :return: O EscritorEmLote usado, com as estatísticas da escrita
+    """
+    def etapa(nome):
+        return instrumentacao.etapa(nome) if instrumentacao is not None else nullcontext({})
+
+    # Remoções: o nó e todas as suas relações
+    with etapa("remocao"):
+        for bloco in em_blocos([str(BLDG[g]) for g in diferenca["removidos"]], tamanho_lote):
+            destino.remover_recursos(bloco)
+
+    # Atualizações: retira as triplas antigas (agrupadas pelo tipo anterior)
+    with etapa("retracao"):
+        atualizados_por_tipo = defaultdict(list)
+        for guid in diferenca["atualizados"]:
+            atualizados_por_tipo[antigo[guid]["tipo"]].append(str(BLDG[guid]))
+        for tipo, uris in atualizados_por_tipo.items():
+            for bloco in em_blocos(uris, tamanho_lote):
+                destino.retrair_recursos(tipo, bloco)
+
+    # Inserções e atualizações: grava as triplas atuais desses elementos
+    alterados = set(diferenca["inseridos"]) | set(diferenca["atualizados"])
+    escritor = EscritorEmLote(destino, tamanho_lote=tamanho_lote)
+    with etapa("escrita_grafo"):
+        escritor.adicionar_todas(gerar_triplas(
+            (e for g, e in elementos_por_guid.items() if g in alterados),
+            (c for c in contencoes if c["child_guid"] in alterados),
+            relacoes=(r for r in relacoes if r["child_guid"] in alterados),
+            propriedades=(p for p in propriedades if p["guid"] in alterados),
+        ))
+        escritor.descarregar()
+    return escritor
+
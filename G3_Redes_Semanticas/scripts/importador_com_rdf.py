@@ -1,10 +1,24 @@
 # importador_com_rdf.py
 
 import os
+import argparse
+import itertools
+from collections import Counter
 import ifcopenshell
-from rdflib import Graph as RdfGraph, URIRef, Literal, Namespace
-from rdflib.namespace import RDF, RDFS
+from rdflib import Graph as RdfGraph
 from py2neo import Graph as NeoGraph
+from persistencia_lote import (EscritorEmLote, DestinoNeo4j, TAMANHO_LOTE_PADRAO, PROFUNDIDADE_FILA_PADRAO,
+                               registrar_contrapressao)
+from extracao_ifc import (BLDG, gerar_triplas, tripla_para_ntriples, iterar_elementos,
+                          iterar_contencoes, iterar_relacoes, iterar_propriedades,
+                          iterar_contencao_geometrica, ExtratorParalelo)
+from indice_espacial import IndiceAncestrais
+from instrumentacao import Instrumentacao
+from esquema_grafo import garantir_esquema
+from snapshot_modelo import obter_snapshot
+from importacao_incremental import (caminho_manifesto, carregar_manifesto, salvar_manifesto,
+                                    mapa_pais, mapa_propriedades, calcular_manifesto, comparar_manifestos,
+                                    em_blocos, aplicar_diferenca, estrutura_alterada, linhas_indice_a_gravar)
 
 # --- CONFIGURAÇÕES ---
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "17091980")
@@ -12,102 +26,316 @@ NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
 IFC_FILE_PATH = '../modelo_ifc/Building-Architecture.ifc'
 
-# 1. Definição dos Namespaces RDF (Boas práticas da Web Semântica)
-BLDG = Namespace("https://example.com/building#") # Nosso vocabulário customizado
+# 1. Namespace RDF (Boas práticas da Web Semântica): BLDG, definido em extracao_ifc.py
 
 # --- FUNÇÃO PRINCIPAL ---
-def executar_importacao_rdf():
-    print("Iniciando pipeline de importação: IFC -> RDF -> Neo4j")
+def executar_importacao_rdf(tamanho_lote: int = TAMANHO_LOTE_PADRAO, destino=None,
+                            streaming: bool = False, arquivo_rdf: str = None, workers: int = 1,
+                            incremental: bool = False, snapshot: bool = False,
+                            instrumentacao: Instrumentacao = None, pipeline: bool = False,
+                            profundidade_fila: int = PROFUNDIDADE_FILA_PADRAO, geometria: bool = False):
+    """
+    Executa o pipeline IFC -> RDF -> Neo4j.
+
+    :param tamanho_lote: Número máximo de triplas por query UNWIND
+    :param destino: Destino alternativo dos lotes (ex.: DestinoMemoria);
+                    se omitido, grava no Neo4j configurado
+    :param streaming: Se True, as triplas vão direto do IFC para os lotes,
+                      sem montar o grafo RDF em memória
+    :param arquivo_rdf: Se informado, salva também o RDF completo neste arquivo
+                        (em modo streaming, gravado incrementalmente em N-Triples)
+    :param workers: Número de processos para a extração do IFC (1 = sequencial)
+    :param incremental: Se True, aplica apenas as diferenças em relação ao
+                        manifesto da última importação, sem limpar o banco
+    :param snapshot: Se True, lê o modelo do snapshot colunar (ver
+                     snapshot_modelo.py), criando-o na primeira execução
+    :param instrumentacao: Recebe os spans de cada etapa e os contadores de
+                           escrita; também controla o modo silencioso
+    :param pipeline: Se True, os lotes são gravados por uma thread escritora
+                     enquanto a extração continua (implica streaming; ver
+                     persistencia_lote.FilaDeEscrita)
+    :param profundidade_fila: Lotes prontos que podem aguardar a escritora
+    :param geometria: Se True, grava também a contenção geométrica (isWithin),
+                      exigida pelas regras DENTRO_DE (ver geometria_ifc.py)
+    :return: Estatísticas da escrita em lote
+    """
+    instrumentacao = instrumentacao or Instrumentacao()
+    info = instrumentacao.info
+    if pipeline and incremental:
+        print("O modo pipeline vale só para a importação completa: não pode ser combinado com a incremental.")
+        return
+    # A sobreposição só existe se os lotes saem durante a extração
+    streaming = streaming or pipeline
+    info("Iniciando pipeline de importação: IFC -> RDF -> Neo4j")
 
     # 2. Inicialização dos Grafos
+    extrator = None
     try:
-        ifc = ifcopenshell.open(IFC_FILE_PATH)
-        rdf_graph = RdfGraph()
-        neo_graph = NeoGraph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-        print("✅ Arquivo IFC lido e grafos inicializados.")
+        if snapshot:
+            # Arrays mapeados em memória: dispensa o parsing do IFC
+            with instrumentacao.etapa("abertura_modelo", fonte="snapshot"):
+                modelo = obter_snapshot(IFC_FILE_PATH, geometria, info)
+            elementos, contencoes, relacoes = modelo.elementos(), modelo.contencoes(), modelo.relacoes()
+            propriedades = modelo.propriedades()
+            if geometria:
+                relacoes = itertools.chain(relacoes, modelo.contencao_geometrica())
+        elif workers > 1:
+            # Cada worker abre o IFC por conta própria e extrai fatias das entidades
+            extrator = ExtratorParalelo(IFC_FILE_PATH, workers)
+            elementos, contencoes, relacoes = extrator.elementos(), extrator.contencoes(), extrator.relacoes()
+            propriedades = extrator.propriedades()
+            if geometria:
+                relacoes = itertools.chain(relacoes, extrator.contencao_geometrica())
+            info(f"✅ Extração paralela com {workers} workers.")
+        else:
+            with instrumentacao.etapa("abertura_modelo", fonte="ifc"):
+                ifc = ifcopenshell.open(IFC_FILE_PATH)
+            elementos, contencoes, relacoes = iterar_elementos(ifc), iterar_contencoes(ifc), iterar_relacoes(ifc)
+            propriedades = iterar_propriedades(ifc)
+            if geometria:
+                relacoes = itertools.chain(relacoes, iterar_contencao_geometrica(ifc))
+        neo_graph = None
+        if destino is None:
+            neo_graph = NeoGraph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+            # Restrição de unicidade em Resource.uri: os MERGE viram buscas no índice
+            garantir_esquema(neo_graph)
+            destino = DestinoNeo4j(neo_graph)
+        info("✅ Arquivo IFC lido e grafos inicializados.")
     except Exception as e:
         print(f"❌ Erro na inicialização: {e}")
+        if extrator:
+            extrator.fechar()
         return
 
+    try:
+        if incremental:
+            stats = _importar_incremental(elementos, contencoes, relacoes, propriedades, destino, neo_graph,
+                                          tamanho_lote, instrumentacao)
+        else:
+            stats = _importar(elementos, contencoes, relacoes, propriedades, destino, neo_graph, tamanho_lote,
+                              streaming, arquivo_rdf, instrumentacao,
+                              profundidade_fila if pipeline else 0)
+        instrumentacao.registrar_estatisticas(stats, "importacao")
+        return stats
+    finally:
+        if extrator:
+            extrator.fechar()
+
+
+def _gravar_indice_espacial(linhas, destino, tamanho_lote: int, instrumentacao: Instrumentacao):
+    """
+    Grava nos nós os rótulos do índice de ancestrais (regras CONTIDO_EM*).
+
+    :param linhas: Linhas {uri, entrada, saida, tipos_ancestrais} com a chave GUID
+    """
+    with instrumentacao.etapa("indice_espacial") as dados:
+        total = 0
+        for bloco in em_blocos(linhas, tamanho_lote):
+            destino.gravar_indice_espacial([dict(r, uri=str(BLDG[r["uri"]])) for r in bloco])
+            total += len(bloco)
+        dados["nos"] = total
+    instrumentacao.info(f"-> Índice de ancestrais gravado em {total} nós.")
+
+
+def _importar(elementos, contencoes, relacoes, propriedades, destino, neo_graph, tamanho_lote, streaming,
+              arquivo_rdf, instrumentacao: Instrumentacao, profundidade_fila: int = 0):
+    """Etapas 3 e 4 do pipeline: conversão para RDF e escrita em lote."""
+    info = instrumentacao.info
+
     # Limpa o banco de dados Neo4j
-    neo_graph.delete_all()
-    print("✅ Banco de dados Neo4j limpo.")
-
-    # 3. Populando o Grafo RDF a partir do IFC
-    print("\nIniciando a conversão de IFC para RDF...")
-    
-    # Adicionando todos os elementos como Recursos RDF
-    for element in ifc.by_type('IfcProduct'):
-        subject = BLDG[element.GlobalId] # Cria uma URI única para o elemento
-        
-        # Adiciona a tripla de tipo: (Elemento) -> (é do tipo) -> (Classe IFC)
-        rdf_graph.add((subject, RDF.type, BLDG[element.is_a()]))
-        # Adiciona a tripla de nome: (Elemento) -> (tem o rótulo) -> ("Nome do Elemento")
-        if element.Name:
-            rdf_graph.add((subject, RDFS.label, Literal(element.Name)))
-
-    print(f"-> {len(list(rdf_graph.subjects()))} elementos adicionados ao grafo RDF.")
-
-    # Adicionando as relações de contenção
-    for rel in ifc.by_type('IfcRelContainedInSpatialStructure'):
-        if rel.RelatingStructure:
-            parent_subject = BLDG[rel.RelatingStructure.GlobalId]
-            for child in rel.RelatedElements:
-                child_subject = BLDG[child.GlobalId]
-                # Adiciona a tripla: (Filho) -> (estáContidoEm) -> (Pai)
-                rdf_graph.add((child_subject, BLDG.isContainedIn, parent_subject))
-
-    print("-> Relações de contenção adicionadas ao grafo RDF.")
-    
-    # 4. Persistindo o Grafo RDF no Neo4j
-    print("\nIniciando a importação do grafo RDF para o Neo4j...")
-    
-    # Usaremos uma única transação para eficiência
-    tx = neo_graph.begin()
-    
-    node_count = 0
-    rel_count = 0
-    
-    # Itera sobre todas as triplas (s, p, o) do grafo RDF
-    for s, p, o in rdf_graph:
-        # Sujeito (s) sempre será um nó
-        # O predicado (p) será o tipo da relação
-        # O objeto (o) pode ser outro nó ou uma propriedade literal
-        
-        # Garante que o nó do sujeito exista
-        tx.run("MERGE (n:Resource {uri: $uri})", uri=str(s))
-        node_count += 1
-        
-        if isinstance(o, URIRef): # Se o objeto é uma URI, é uma relação entre nós
-            # Garante que o nó do objeto exista
-            tx.run("MERGE (n:Resource {uri: $uri})", uri=str(o))
-            node_count += 1
-            
-            # Cria a relação
-            # O nome da relação é o nome local do predicado (ex: isContainedIn)
-            rel_type = p.split('#')[-1] if '#' in p else p.split('/')[-1]
-            
-            # Query para criar a relação
-            query = """
-            MATCH (a:Resource {uri: $s_uri})
-            MATCH (b:Resource {uri: $o_uri})
-            MERGE (a)-[:`%s`]->(b)
-            """ % rel_type
-            tx.run(query, s_uri=str(s), o_uri=str(o))
-            rel_count += 1
-
-        elif isinstance(o, Literal): # Se o objeto é um Literal, é uma propriedade
-            # O nome da propriedade é o nome local do predicado (ex: label)
-            prop_name = p.split('#')[-1] if '#' in p else p.split('/')[-1]
-            
-            # Adiciona a propriedade ao nó do sujeito
-            query = f"MATCH (n:Resource {{uri: $uri}}) SET n.`{prop_name}` = $value"
-            tx.run(query, uri=str(s), value=str(o))
-
-    # Commit da transação
-    neo_graph.commit(tx)
-    print(f"-> Importação concluída. {node_count} nós e {rel_count} relações processadas.")
+    if neo_graph is not None:
+        neo_graph.delete_all()
+        info("✅ Banco de dados Neo4j limpo.")
+
+    escritor = EscritorEmLote(destino, tamanho_lote=tamanho_lote, profundidade_fila=profundidade_fila)
+    contador = {}
+
+    # O índice de ancestrais é montado enquanto as linhas passam pela conversão
+    indice = IndiceAncestrais()
+    elementos = indice.observar_elementos(elementos)
+    contencoes = indice.observar_relacoes(contencoes)
+    relacoes = indice.observar_relacoes(relacoes)
+
+    if streaming:
+        # 3+4. IFC -> triplas -> lotes -> Neo4j, sem materializar o grafo RDF.
+        # A memória fica limitada ao buffer de lotes do escritor.
+        if profundidade_fila:
+            info(f"\nIniciando importação em pipeline IFC -> RDF -> Neo4j "
+                 f"(escrita em segundo plano, fila de {profundidade_fila} lotes)...")
+        else:
+            info("\nIniciando importação em fluxo (streaming) IFC -> RDF -> Neo4j...")
+        arquivo_saida = open(arquivo_rdf, 'w', encoding='utf-8') if arquivo_rdf else None
+        # Extração, conversão e escrita acontecem intercaladas: um único span
+        with instrumentacao.etapa("extracao_conversao_escrita") as dados:
+            try:
+                for s, p, o in gerar_triplas(elementos, contencoes, contador, relacoes, propriedades):
+                    escritor.adicionar(s, p, o)
+                    if arquivo_saida:
+                        arquivo_saida.write(tripla_para_ntriples(s, p, o))
+            finally:
+                if arquivo_saida:
+                    arquivo_saida.close()
+            escritor.descarregar()
+            if escritor.pipeline:
+                dados["pipeline"] = escritor.pipeline
+
+        info(f"-> {contador['elementos']} elementos, {contador['contencoes']} relações de contenção, "
+              f"{contador['relacoes']} relações complementares e {contador['propriedades']} propriedades "
+              f"processados.")
+        if arquivo_rdf:
+            info(f"-> Grafo RDF salvo em '{arquivo_rdf}' (N-Triples).")
+        if escritor.pipeline:
+            registrar_contrapressao(instrumentacao, escritor.pipeline)
+    else:
+        # 3. Populando o Grafo RDF a partir do IFC
+        info("\nIniciando a conversão de IFC para RDF...")
+        rdf_graph = RdfGraph()
+        rdf_graph.bind("bldg", BLDG)
+        with instrumentacao.etapa("extracao_conversao"):
+            for tripla in gerar_triplas(elementos, contencoes, contador, relacoes, propriedades):
+                rdf_graph.add(tripla)
+
+        info(f"-> {contador['elementos']} elementos adicionados ao grafo RDF.")
+        info(f"-> {contador['contencoes']} relações de contenção adicionadas ao grafo RDF.")
+        info(f"-> {contador['relacoes']} relações complementares (agregação, aberturas) adicionadas ao grafo RDF.")
+        info(f"-> {contador['propriedades']} propriedades e quantidades adicionadas ao grafo RDF.")
+
+        if arquivo_rdf:
+            with instrumentacao.etapa("serializacao_rdf"):
+                rdf_graph.serialize(destination=arquivo_rdf)
+            info(f"-> Grafo RDF salvo em '{arquivo_rdf}'.")
+
+        # 4. Persistindo o Grafo RDF no Neo4j
+        info("\nIniciando a importação do grafo RDF para o Neo4j...")
+
+        # As triplas são agrupadas por predicado e enviadas em lotes UNWIND,
+        # evitando uma ida ao banco para cada tripla
+        with instrumentacao.etapa("escrita_grafo"):
+            escritor.adicionar_todas(rdf_graph)
+            escritor.descarregar()
+
+    _gravar_indice_espacial(indice.construir().linhas(), destino, tamanho_lote, instrumentacao)
+    destino.gravar_contagens_tipos(escritor.por_tipo)
+    for chave, valor in contador.items():
+        instrumentacao.incrementar(f"extraidos_{chave}", valor)
+
+    stats = escritor.estatisticas()
+    info(f"-> Importação concluída. {stats['nos']} nós e {stats['relacoes']} relações processadas "
+          f"em {stats['lotes']} lotes.")
+    info(f"-> {stats['triplas']} triplas em {stats['segundos']:.2f}s "
+          f"({stats['triplas_por_segundo']:.0f} triplas/s).")
+    return stats
+
+def _importar_incremental(elementos, contencoes, relacoes, propriedades, destino, neo_graph, tamanho_lote,
+                          instrumentacao: Instrumentacao):
+    """Aplica no grafo apenas as inserções, atualizações e remoções do modelo."""
+    info = instrumentacao.info
+    info("\nIniciando importação incremental...")
+    arquivo_manifesto = caminho_manifesto(IFC_FILE_PATH, "rdf")
+    antigo = carregar_manifesto(arquivo_manifesto)
+
+    with instrumentacao.etapa("extracao"):
+        contencoes = list(contencoes)
+        relacoes = list(relacoes)
+        propriedades = list(propriedades)
+        elementos_por_guid = {e["guid"]: e for e in elementos}
+    with instrumentacao.etapa("manifesto"):
+        novo = calcular_manifesto(elementos_por_guid.values(), mapa_pais(contencoes + relacoes),
+                                  mapa_propriedades(propriedades))
+
+    if antigo is None:
+        # Sem manifesto não sabemos o que está no banco: importação completa
+        info("ℹ️ Nenhum manifesto anterior encontrado. Executando importação completa.")
+        if neo_graph is not None:
+            neo_graph.delete_all()
+            info("✅ Banco de dados Neo4j limpo.")
+        antigo = {}
+
+    diferenca = comparar_manifestos(antigo, novo)
+    info(f"-> {len(diferenca['inseridos'])} inseridos, {len(diferenca['atualizados'])} atualizados, "
+          f"{len(diferenca['removidos'])} removidos.")
+
+    escritor = aplicar_diferenca(destino, diferenca, antigo, elementos_por_guid, contencoes, relacoes,
+                                 propriedades, tamanho_lote, instrumentacao)
+
+    # Os intervalos do índice de ancestrais só mudam com inserções, remoções ou
+    # troca de pais: só então o índice é recalculado, e só os rótulos que
+    # mudaram (e os dos nós regravados) vão para o banco
+    indice = None
+    if estrutura_alterada(diferenca, antigo, novo):
+        with instrumentacao.etapa("construcao_indice"):
+            indice = IndiceAncestrais().carregar(elementos_por_guid.values(), contencoes, relacoes).construir()
+    linhas_indice = linhas_indice_a_gravar(diferenca, antigo, novo, indice)
+    if linhas_indice:
+        _gravar_indice_espacial(linhas_indice, destino, tamanho_lote, instrumentacao)
+    destino.gravar_contagens_tipos(Counter(e["tipo"] for e in novo.values()))
+
+    salvar_manifesto(arquivo_manifesto, novo)
+    info(f"✅ Manifesto atualizado em '{arquivo_manifesto}'.")
+
+    stats = escritor.estatisticas()
+    stats.update({chave: len(guids) for chave, guids in diferenca.items()})
+    info(f"-> Importação incremental concluída. {stats['triplas']} triplas gravadas em {stats['lotes']} lotes.")
+    return stats
 
 # --- Execução Principal ---
 if __name__ == "__main__":
-    executar_importacao_rdf()
\ No newline at end of file
+    parser_arg = argparse.ArgumentParser(description="Importador IFC -> RDF -> Neo4j")
+    parser_arg.add_argument(
+        "--tamanho-lote", type=int, default=TAMANHO_LOTE_PADRAO,
+        help="Número de triplas enviadas ao Neo4j em cada UNWIND"
+    )
+    parser_arg.add_argument(
+        "--streaming", action="store_true",
+        help="Importa em fluxo, sem montar o grafo RDF completo em memória"
+    )
+    parser_arg.add_argument(
+        "--pipeline", action="store_true",
+        help="Grava os lotes em uma thread separada, sobrepondo extração e escrita (implica --streaming)"
+    )
+    parser_arg.add_argument(
+        "--profundidade-fila", type=int, default=PROFUNDIDADE_FILA_PADRAO,
+        help="Com --pipeline, número de lotes prontos que podem aguardar a escrita"
+    )
+    parser_arg.add_argument(
+        "--rdf-saida", type=str, default=None,
+        help="Salva também o grafo RDF completo neste arquivo"
+    )
+    parser_arg.add_argument(
+        "--workers", type=int, default=1,
+        help="Número de processos usados na extração do IFC"
+    )
+    parser_arg.add_argument(
+        "--incremental", action="store_true",
+        help="Aplica apenas as diferenças desde a última importação (manifesto local)"
+    )
+    parser_arg.add_argument(
+        "--snapshot", action="store_true",
+        help="Usa (ou cria) o snapshot colunar do modelo em vez de reprocessar o IFC"
+    )
+    parser_arg.add_argument(
+        "--geometria", action="store_true",
+        help="Grava também a contenção geométrica (isWithin), exigida pelas regras DENTRO_DE"
+    )
+    parser_arg.add_argument(
+        "--silencioso", action="store_true",
+        help="Não imprime mensagens de progresso (apenas erros)"
+    )
+    parser_arg.add_argument(
+        "--metricas", type=str, default=None,
+        help="Arquivo onde os spans e contadores da importação são exportados"
+    )
+    parser_arg.add_argument(
+        "--formato-metricas", choices=["jsonl", "prometheus"], default="jsonl",
+        help="Formato do arquivo de métricas"
+    )
+    args = parser_arg.parse_args()
+
+    instrumentacao = Instrumentacao(silencioso=args.silencioso)
+    executar_importacao_rdf(tamanho_lote=args.tamanho_lote, streaming=args.streaming,
+                            arquivo_rdf=args.rdf_saida, workers=args.workers,
+                            incremental=args.incremental, snapshot=args.snapshot,
+                            instrumentacao=instrumentacao, pipeline=args.pipeline,
+                            profundidade_fila=args.profundidade_fila, geometria=args.geometria)
+    if args.metricas:
+        instrumentacao.exportar(args.metricas, args.formato_metricas)
@@ -1,9 +1,24 @@
+import argparse
+import itertools
 import ifcopenshell
 from py2neo import Graph
+from extracao_ifc import (iterar_elementos, iterar_contencoes, iterar_relacoes, iterar_propriedades,
+                          iterar_contencao_geometrica, ExtratorParalelo)
+from indice_espacial import (IndiceAncestrais, REL_AGREGACAO, REL_ABERTURA, REL_PREENCHIMENTO, REL_HOSPEDAGEM,
+                             REL_GEOMETRICA)
+from esquema_grafo import garantir_esquema, COMANDOS_ESQUEMA
+from exportacao_neo4j_admin import ExportadorNeo4jAdmin, tipos_das_colunas
+from instrumentacao import Instrumentacao
+from persistencia_lote import (FilaDeEscrita, TAMANHO_LOTE_PADRAO, PROFUNDIDADE_FILA_PADRAO,
+                               registrar_contrapressao)
+from snapshot_modelo import obter_snapshot
+from importacao_incremental import (caminho_manifesto, carregar_manifesto, salvar_manifesto,
+                                    mapa_pais, mapa_propriedades, calcular_manifesto, comparar_manifestos,
+                                    em_blocos, estrutura_alterada, registrar_indice, linhas_indice_a_gravar)
 
 # --- ATENÇÃO: CONFIGURAÇÕES ---
 # Altere a senha para a que você definiu no Neo4j
-NEO4J_PASSWORD = "17091980" 
+NEO4J_PASSWORD = "17091980"
 
 # Caminho para o arquivo IFC. O "../" significa "voltar uma pasta".
 IFC_FILE_PATH = '../modelo_ifc/Building-Architecture.ifc'
@@ -12,67 +27,405 @@ IFC_FILE_PATH = '../modelo_ifc/Building-Architecture.ifc'
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 
-print("Iniciando a importação...")
-
-try:
-    # Abre o arquivo IFC
-    ifc = ifcopenshell.open(IFC_FILE_PATH)
-    print(f"Arquivo '{IFC_FILE_PATH}' lido com sucesso.")
-
-    # Conecta ao banco de dados
-    graph = Graph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-    print("Conexão com Neo4j estabelecida.")
-
-    # Limpa o banco de dados para garantir uma importação limpa
-    graph.delete_all()
-    print("Banco de dados anterior limpo.")
-
-    # --- Transação 1: Criar todos os nós de Elementos ---
-    # Pega todos os produtos (paredes, lajes, vigas, etc.)
-    elements = ifc.by_type('IfcProduct')
-
-    # Prepara os dados para uma inserção em massa (mais rápido)
-    elements_data = [
-        {
-            "guid": e.GlobalId, 
-            "name": e.Name if e.Name else "Sem Nome", 
-            "ifc_type": e.is_a()
-        } 
-        for e in elements
-    ]
-
-    # Query Cypher para criar os nós
-    query_nodes = """
-    UNWIND $elements as element
-    MERGE (n:Element {guid: element.guid})
-    SET n.name = element.name, n.ifc_type = element.ifc_type
-    """
-    graph.run(query_nodes, elements=elements_data)
-    print(f"-> {len(elements_data)} nós de elementos criados no grafo.")
-
-    # --- Transação 2: Criar as Relações de Contenção Espacial ---
-    rels_contained = ifc.by_type('IfcRelContainedInSpatialStructure')
-
-    rels_data = []
-    for rel in rels_contained:
-        if rel.RelatingStructure:
-            parent_guid = rel.RelatingStructure.GlobalId
-            for child in rel.RelatedElements:
-                rels_data.append({
-                    "child_guid": child.GlobalId,
-                    "parent_guid": parent_guid
-                })
-
-    query_rels = """
+# Relações complementares da extração -> tipo de relação neste esquema
+RELACOES_SEMANTICAS = {
+    REL_AGREGACAO: "FAZ_PARTE_DE",
+    REL_ABERTURA: "RECORTA",
+    REL_PREENCHIMENTO: "PREENCHE",
+    REL_HOSPEDAGEM: "HOSPEDADO_EM",
+    REL_GEOMETRICA: "ESTA_DENTRO_DE",
+}
+
+# Query Cypher para criar os nós (SET n = ... descarta as propriedades
+# antigas de um elemento atualizado; o índice é regravado depois)
+QUERY_NOS = """
+UNWIND $elements as element
+MERGE (n:Element {guid: element.guid})
+SET n = element.props
+SET n.guid = element.guid, n.name = element.name, n.ifc_type = element.ifc_type
+"""
+
+QUERY_INDICE = """
+UNWIND $rows as r
+MATCH (n:Element {guid: r.uri})
+SET n.entrada = r.entrada, n.saida = r.saida, n.tipos_ancestrais = r.tipos_ancestrais
+"""
+
+
+def query_relacoes(tipo_rel: str) -> str:
+    """Query que cria as relações filho -> pai de um tipo entre elementos já gravados."""
+    return f"""
     UNWIND $relations as rel
-    MATCH (child:Element {guid: rel.child_guid})
-    MATCH (parent:Element {guid: rel.parent_guid})
-    MERGE (child)-[:ESTA_CONTIDO_EM]->(parent)
+    MATCH (child:Element {{guid: rel.child_guid}})
+    MATCH (parent:Element {{guid: rel.parent_guid}})
+    MERGE (child)-[:{tipo_rel}]->(parent)
+    """
+
+
+def linha_no(e: dict, props: dict) -> dict:
+    """Linha {guid, name, ifc_type, props} de um elemento para QUERY_NOS."""
+    return {
+        "guid": e["guid"],
+        "name": e["name"] if e["name"] else "Sem Nome",
+        "ifc_type": e["ifc_type"],
+        "props": props,
+    }
+
+
+def _construir_indice(elements_data: list, rels_data: list, outras_rels_data: list,
+                      instrumentacao: Instrumentacao) -> IndiceAncestrais:
+    """Índice de ancestrais da árvore espacial (regras CONTIDO_EM*) sobre o modelo inteiro."""
+    with instrumentacao.etapa("construcao_indice"):
+        return IndiceAncestrais().carregar(elements_data, rels_data, outras_rels_data).construir()
+
+
+def executar_importacao(workers: int = 1, incremental: bool = False, snapshot: bool = False,
+                        instrumentacao: Instrumentacao = None, diretorio_csv: str = None,
+                        comprimir: bool = False, pipeline: bool = False,
+                        profundidade_fila: int = PROFUNDIDADE_FILA_PADRAO, geometria: bool = False):
+    """
+    Importa os elementos e as relações de contenção do IFC para o Neo4j.
+
+    :param workers: Número de processos para a extração do IFC (1 = sequencial)
+    :param incremental: Se True, aplica apenas as diferenças em relação ao
+                        manifesto da última importação, sem limpar o banco
+    :param snapshot: Se True, lê o modelo do snapshot colunar (ver
+                     snapshot_modelo.py), criando-o na primeira execução
+    :param instrumentacao: Recebe os spans de cada etapa; também controla o
+                           modo silencioso
+    :param diretorio_csv: Se informado, em vez de escrever no Neo4j, grava os
+                          nós e as relações para a carga offline com o
+                          neo4j-admin (ver exportacao_neo4j_admin)
+    :param comprimir: Na exportação para o neo4j-admin, grava os dados com gzip
+    :param pipeline: Na importação completa, grava os nós e as relações em
+                     lotes por uma thread escritora enquanto a extração
+                     continua (ver _importar_em_pipeline)
+    :param profundidade_fila: Lotes prontos que podem aguardar a escritora
+    :param geometria: Se True, importa também a contenção geométrica
+                      (ESTA_DENTRO_DE), exigida pelas regras DENTRO_DE
+    """
+    instrumentacao = instrumentacao or Instrumentacao()
+    info = instrumentacao.info
+    if diretorio_csv and incremental:
+        print("A exportação para o neo4j-admin gera um banco novo e não pode ser incremental.")
+        return
+    if pipeline and (incremental or diretorio_csv):
+        print("O modo pipeline vale só para a importação completa no Neo4j: "
+              "não pode ser combinado com a importação incremental nem com a exportação para o neo4j-admin.")
+        return
+    info("Iniciando a importação...")
+
+    extrator = None
+    try:
+        # Abre o arquivo IFC (ou distribui a leitura entre os workers)
+        if snapshot:
+            with instrumentacao.etapa("abertura_modelo", fonte="snapshot"):
+                modelo = obter_snapshot(IFC_FILE_PATH, geometria, info)
+            elementos, contencoes, relacoes = modelo.elementos(), modelo.contencoes(), modelo.relacoes()
+            propriedades = modelo.propriedades()
+            if geometria:
+                relacoes = itertools.chain(relacoes, modelo.contencao_geometrica())
+        elif workers > 1:
+            extrator = ExtratorParalelo(IFC_FILE_PATH, workers)
+            elementos, contencoes, relacoes = extrator.elementos(), extrator.contencoes(), extrator.relacoes()
+            propriedades = extrator.propriedades()
+            if geometria:
+                relacoes = itertools.chain(relacoes, extrator.contencao_geometrica())
+            info(f"Extração paralela de '{IFC_FILE_PATH}' com {workers} workers.")
+        else:
+            with instrumentacao.etapa("abertura_modelo", fonte="ifc"):
+                ifc = ifcopenshell.open(IFC_FILE_PATH)
+            elementos, contencoes, relacoes = iterar_elementos(ifc), iterar_contencoes(ifc), iterar_relacoes(ifc)
+            propriedades = iterar_propriedades(ifc)
+            if geometria:
+                relacoes = itertools.chain(relacoes, iterar_contencao_geometrica(ifc))
+            info(f"Arquivo '{IFC_FILE_PATH}' lido com sucesso.")
+
+        if pipeline:
+            graph = Graph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+            info("Conexão com Neo4j estabelecida.")
+            garantir_esquema(graph)
+            info("Restrições e índices do grafo garantidos.")
+            graph.delete_all()
+            info("Banco de dados anterior limpo.")
+            _importar_em_pipeline(graph, elementos, contencoes, relacoes, propriedades, profundidade_fila,
+                                  instrumentacao)
+            info("\nImportação para o Neo4j concluída com sucesso!")
+            return
+
+        # Pega todos os produtos (paredes, lajes, vigas, etc.)
+        # e prepara os dados para uma inserção em massa (mais rápido)
+        # As propriedades e quantidades vão no próprio nó ("Conjunto.Propriedade")
+        with instrumentacao.etapa("extracao"):
+            rels_data = list(contencoes)
+            outras_rels_data = [r for r in relacoes if r["relacao"] in RELACOES_SEMANTICAS]
+            propriedades_data = list(propriedades)
+            props_por_guid = {}
+            for p in propriedades_data:
+                props_por_guid.setdefault(p["guid"], {})[p["coluna"]] = p["valor"]
+            elements_data = [linha_no(e, props_por_guid.get(e["guid"], {})) for e in elementos]
+
+        if diretorio_csv:
+            indice = _construir_indice(elements_data, rels_data, outras_rels_data, instrumentacao)
+            _exportar_neo4j_admin(diretorio_csv, comprimir, elements_data, rels_data, outras_rels_data,
+                                  propriedades_data, indice, instrumentacao)
+            return
+
+        # Conecta ao banco de dados
+        graph = Graph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        info("Conexão com Neo4j estabelecida.")
+
+        # Restrição de unicidade em Element.guid: os MERGE/MATCH por guid
+        # passam a usar o índice em vez de varrer todos os nós
+        garantir_esquema(graph)
+        info("Restrições e índices do grafo garantidos.")
+
+        manifesto_antigo = None
+        if incremental:
+            arquivo_manifesto = caminho_manifesto(IFC_FILE_PATH, "semantico")
+            manifesto_antigo = carregar_manifesto(arquivo_manifesto)
+            manifesto_novo = calcular_manifesto(elements_data, mapa_pais(rels_data + outras_rels_data),
+                                                mapa_propriedades(propriedades_data))
+            if manifesto_antigo is None:
+                info("Nenhum manifesto anterior encontrado. Executando importação completa.")
+
+        if manifesto_antigo is None:
+            # Limpa o banco de dados para garantir uma importação limpa
+            graph.delete_all()
+            info("Banco de dados anterior limpo.")
+            linhas_indice = list(_construir_indice(elements_data, rels_data, outras_rels_data,
+                                                   instrumentacao).linhas())
+            if incremental:
+                registrar_indice(manifesto_novo, linhas_indice)
+        else:
+            # Mantém apenas o que mudou desde a última importação
+            diferenca = comparar_manifestos(manifesto_antigo, manifesto_novo)
+            info(f"Incremental: {len(diferenca['inseridos'])} inseridos, "
+                  f"{len(diferenca['atualizados'])} atualizados, {len(diferenca['removidos'])} removidos.")
+
+            query_remover = """
+            UNWIND $guids as guid
+            MATCH (n:Element {guid: guid})
+            DETACH DELETE n
+            """
+            graph.run(query_remover, guids=diferenca["removidos"])
+
+            # Elementos atualizados perdem a contenção (e as demais relações) antigas;
+            # as novas são recriadas abaixo
+            tipos_desligar = "|".join(["ESTA_CONTIDO_EM", *RELACOES_SEMANTICAS.values()])
+            query_desligar = f"""
+            UNWIND $guids as guid
+            MATCH (n:Element {{guid: guid}})-[r:{tipos_desligar}]->()
+            DELETE r
+            """
+            graph.run(query_desligar, guids=diferenca["atualizados"])
+
+            # Índice de ancestrais (regras CONTIDO_EM*): recalculado sobre o modelo
+            # inteiro só se a estrutura mudou; vão para o banco só os rótulos que
+            # mudaram e os dos nós regravados (SET n = ... apaga os anteriores)
+            indice = None
+            if estrutura_alterada(diferenca, manifesto_antigo, manifesto_novo):
+                indice = _construir_indice(elements_data, rels_data, outras_rels_data, instrumentacao)
+            linhas_indice = linhas_indice_a_gravar(diferenca, manifesto_antigo, manifesto_novo, indice)
+
+            alterados = set(diferenca["inseridos"]) | set(diferenca["atualizados"])
+            elements_data = [e for e in elements_data if e["guid"] in alterados]
+            rels_data = [r for r in rels_data if r["child_guid"] in alterados]
+            outras_rels_data = [r for r in outras_rels_data if r["child_guid"] in alterados]
+
+        # --- Transação 1: Criar todos os nós de Elementos ---
+        with instrumentacao.etapa("escrita_grafo", transacao="nos"):
+            graph.run(QUERY_NOS, elements=elements_data)
+        instrumentacao.incrementar("importacao_nos", len(elements_data))
+        info(f"-> {len(elements_data)} nós de elementos criados no grafo.")
+
+        # --- Transação 2: Criar as Relações de Contenção Espacial ---
+        with instrumentacao.etapa("escrita_grafo", transacao="ESTA_CONTIDO_EM"):
+            graph.run(query_relacoes("ESTA_CONTIDO_EM"), relations=rels_data)
+        instrumentacao.incrementar("importacao_relacoes", len(rels_data), tipo="ESTA_CONTIDO_EM")
+        info(f"-> {len(rels_data)} relações 'ESTA_CONTIDO_EM' criadas.")
+
+        # --- Transação 3: Relações complementares (agregação, aberturas, hospedagem) ---
+        for relacao, tipo_rel in RELACOES_SEMANTICAS.items():
+            linhas = [r for r in outras_rels_data if r["relacao"] == relacao]
+            with instrumentacao.etapa("escrita_grafo", transacao=tipo_rel):
+                graph.run(query_relacoes(tipo_rel), relations=linhas)
+            instrumentacao.incrementar("importacao_relacoes", len(linhas), tipo=tipo_rel)
+            info(f"-> {len(linhas)} relações '{tipo_rel}' criadas.")
+
+        # --- Transação 4: Rótulos do índice de ancestrais, em lotes ---
+        with instrumentacao.etapa("indice_espacial") as dados:
+            for bloco in em_blocos(linhas_indice, TAMANHO_LOTE_PADRAO):
+                graph.run(QUERY_INDICE, rows=bloco)
+            dados["nos"] = len(linhas_indice)
+        info(f"-> Índice de ancestrais gravado em {len(linhas_indice)} nós.")
+
+        if incremental:
+            salvar_manifesto(arquivo_manifesto, manifesto_novo)
+            info(f"Manifesto atualizado em '{arquivo_manifesto}'.")
+
+        info("\nImportação para o Neo4j concluída com sucesso!")
+
+    except Exception as e:
+        print(f"\nOcorreu um erro: {e}")
+    finally:
+        if extrator:
+            extrator.fechar()
+
+
+def _importar_em_pipeline(graph, elementos, contencoes, relacoes, propriedades, profundidade_fila: int,
+                          instrumentacao: Instrumentacao, tamanho_lote: int = TAMANHO_LOTE_PADRAO):
+    """
+    Importação completa com extração e escrita sobrepostas.
+
+    Em vez de montar elements_data e rels_data inteiros antes da primeira
+    transação, as linhas saem da extração em lotes de `tamanho_lote` e vão
+    para uma FilaDeEscrita, gravada por uma thread escritora enquanto o IFC
+    continua sendo lido. A escritora executa os lotes na ordem de envio:
+    todos os nós chegam ao banco antes da primeira relação, que os busca
+    com MATCH. Só as propriedades são lidas antes, porque vão no próprio nó.
     """
-    graph.run(query_rels, relations=rels_data)
-    print(f"-> {len(rels_data)} relações 'ESTA_CONTIDO_EM' criadas.")
+    info = instrumentacao.info
+    with instrumentacao.etapa("extracao", grupo="propriedades"):
+        props_por_guid = {}
+        for p in propriedades:
+            props_por_guid.setdefault(p["guid"], {})[p["coluna"]] = p["valor"]
+
+    indice = IndiceAncestrais()
+    fila = FilaDeEscrita(lambda query, parametros: graph.run(query, **parametros), profundidade_fila)
+    contagens = {}
+
+    def enviar(tipo, query, parametro, linhas):
+        fila.enviar(query, {parametro: linhas})
+        contagens[tipo] = contagens.get(tipo, 0) + len(linhas)
+
+    info(f"Importação em pipeline: lotes de {tamanho_lote} linhas, fila de {profundidade_fila} lotes.")
+    with instrumentacao.etapa("extracao_escrita") as dados:
+        try:
+            linhas_nos = (linha_no(e, props_por_guid.get(e["guid"], {}))
+                          for e in indice.observar_elementos(elementos))
+            for bloco in em_blocos(linhas_nos, tamanho_lote):
+                enviar("nos", QUERY_NOS, "elements", bloco)
+
+            for bloco in em_blocos(indice.observar_relacoes(contencoes), tamanho_lote):
+                enviar("ESTA_CONTIDO_EM", query_relacoes("ESTA_CONTIDO_EM"), "relations", bloco)
+
+            pendentes = {}
+            for r in indice.observar_relacoes(relacoes):
+                tipo_rel = RELACOES_SEMANTICAS.get(r["relacao"])
+                if tipo_rel is None:
+                    continue
+                bloco = pendentes.setdefault(tipo_rel, [])
+                bloco.append(r)
+                if len(bloco) >= tamanho_lote:
+                    enviar(tipo_rel, query_relacoes(tipo_rel), "relations", bloco)
+                    pendentes[tipo_rel] = []
+            for tipo_rel, bloco in pendentes.items():
+                if bloco:
+                    enviar(tipo_rel, query_relacoes(tipo_rel), "relations", bloco)
+        finally:
+            fila.fechar()
+        dados["pipeline"] = fila.estatisticas()
+
+    instrumentacao.incrementar("importacao_nos", contagens.get("nos", 0))
+    info(f"-> {contagens.get('nos', 0)} nós de elementos criados no grafo.")
+    for tipo_rel in ["ESTA_CONTIDO_EM", *RELACOES_SEMANTICAS.values()]:
+        instrumentacao.incrementar("importacao_relacoes", contagens.get(tipo_rel, 0), tipo=tipo_rel)
+        info(f"-> {contagens.get(tipo_rel, 0)} relações '{tipo_rel}' criadas.")
+    registrar_contrapressao(instrumentacao, dados["pipeline"])
+
+    linhas_indice = list(indice.construir().linhas())
+    with instrumentacao.etapa("indice_espacial") as dados:
+        for bloco in em_blocos(linhas_indice, tamanho_lote):
+            graph.run(QUERY_INDICE, rows=bloco)
+        dados["nos"] = len(linhas_indice)
+    info(f"-> Índice de ancestrais gravado em {len(linhas_indice)} nós.")
+
+
+def _exportar_neo4j_admin(diretorio: str, comprimir: bool, elements_data: list, rels_data: list,
+                          outras_rels_data: list, propriedades_data: list, indice, instrumentacao):
+    """Grava os nós e as relações da importação no layout do neo4j-admin database import."""
+    info = instrumentacao.info
+    exportador = ExportadorNeo4jAdmin(diretorio, comprimir)
+    with instrumentacao.etapa("exportacao_csv", grupo="nos") as dados:
+        exportador.exportar_nos(elements_data, tipos_das_colunas(propriedades_data), indice)
+        dados["linhas"] = exportador.nos.linhas
+    instrumentacao.incrementar("importacao_nos", exportador.nos.linhas)
+    info(f"-> {exportador.nos.linhas} nós de elementos exportados em '{exportador.nos.caminho}'.")
+    if exportador.guids_repetidos:
+        info(f"-> {exportador.guids_repetidos} GUID(s) repetido(s) no IFC gravado(s) uma única vez.")
+    if exportador.colunas_ignoradas:
+        info(f"-> Colunas com ':' no nome não exportadas: {', '.join(exportador.colunas_ignoradas)}")
+
+    grupos = {"ESTA_CONTIDO_EM": rels_data}
+    for relacao, tipo_rel in RELACOES_SEMANTICAS.items():
+        grupos[tipo_rel] = [r for r in outras_rels_data if r["relacao"] == relacao]
+    for tipo_rel, linhas in grupos.items():
+        with instrumentacao.etapa("exportacao_csv", grupo=tipo_rel) as dados:
+            exportador.exportar_relacoes(tipo_rel, linhas)
+            dados["linhas"] = exportador.relacoes[tipo_rel].linhas
+        instrumentacao.incrementar("importacao_relacoes", exportador.relacoes[tipo_rel].linhas, tipo=tipo_rel)
+        info(f"-> {exportador.relacoes[tipo_rel].linhas} relações '{tipo_rel}' exportadas.")
+    if exportador.relacoes_descartadas:
+        info(f"-> {exportador.relacoes_descartadas} relação(ões) com elemento fora do grafo descartada(s).")
+
+    roteiro = exportador.gravar_roteiro(COMANDOS_ESQUEMA)
+    info(f"\nExportação para o neo4j-admin concluída em '{diretorio}'.")
+    info(f"Com o Neo4j parado, execute '{roteiro}' e, depois de iniciá-lo, aplique o esquema.cypher.")
+
 
-    print("\nImportação para o Neo4j concluída com sucesso!")
+if __name__ == "__main__":
+    parser_arg = argparse.ArgumentParser(description="Importador IFC -> Neo4j")
+    parser_arg.add_argument(
+        "--workers", type=int, default=1,
+        help="Número de processos usados na extração do IFC"
+    )
+    parser_arg.add_argument(
+        "--incremental", action="store_true",
+        help="Aplica apenas as diferenças desde a última importação (manifesto local)"
+    )
+    parser_arg.add_argument(
+        "--snapshot", action="store_true",
+        help="Usa (ou cria) o snapshot colunar do modelo em vez de reprocessar o IFC"
+    )
+    parser_arg.add_argument(
+        "--pipeline", action="store_true",
+        help="Na importação completa, sobrepõe a extração do IFC e a escrita em lotes no Neo4j"
+    )
+    parser_arg.add_argument(
+        "--profundidade-fila", type=int, default=PROFUNDIDADE_FILA_PADRAO,
+        help="Com --pipeline, número de lotes prontos que podem aguardar a escrita"
+    )
+    parser_arg.add_argument(
+        "--exportar-csv", type=str, default=None, metavar="DIRETORIO",
+        help="Em vez de escrever no Neo4j, grava os CSVs para a carga offline com neo4j-admin database import"
+    )
+    parser_arg.add_argument(
+        "--comprimir", action="store_true",
+        help="Com --exportar-csv, grava os arquivos de dados com gzip"
+    )
+    parser_arg.add_argument(
+        "--geometria", action="store_true",
+        help="Importa também a contenção geométrica (ESTA_DENTRO_DE), exigida pelas regras DENTRO_DE"
+    )
+    parser_arg.add_argument(
+        "--silencioso", action="store_true",
+        help="Não imprime mensagens de progresso (apenas erros)"
+    )
+    parser_arg.add_argument(
+        "--metricas", type=str, default=None,
+        help="Arquivo onde os spans e contadores da importação são exportados"
+    )
+    parser_arg.add_argument(
+        "--formato-metricas", choices=["jsonl", "prometheus"], default="jsonl",
+        help="Formato do arquivo de métricas"
+    )
+    args = parser_arg.parse_args()
 
-except Exception as e:
-    print(f"\nOcorreu um erro: {e}")
\ No newline at end of file
+    instrumentacao = Instrumentacao(silencioso=args.silencioso)
+    executar_importacao(workers=args.workers, incremental=args.incremental, snapshot=args.snapshot,
+                        instrumentacao=instrumentacao, diretorio_csv=args.exportar_csv,
+                        comprimir=args.comprimir, pipeline=args.pipeline,
+                        profundidade_fila=args.profundidade_fila, geometria=args.geometria)
+    if args.metricas:
+        instrumentacao.exportar(args.metricas, args.formato_metricas)
@@ -0,0 +1,97 @@
+# indice_associacoes.py
+
+"""
+Índice denso de associações dos elementos: material e tipo (IfcTypeObject).
+
+Na extração (ver extracao_ifc), cada IfcRelDefinesByType e cada
+IfcRelAssociatesMaterial vira, em uma única passada, linhas de coluna sem
+conjunto — COLUNA_TIPO com o nome do tipo e COLUNA_MATERIAL com o nome do
+material — que chegam ao grafo como propriedades do nó. O material
+atribuído ao tipo vale para as ocorrências, a menos que a ocorrência tenha
+o seu próprio.
+
+Para as regras TEM MATERIAL / TEM TIPO, os elementos de um tipo IFC são
+reunidos em um IndiceAssociacoes: por associação, um array int32 denso
+alinhado aos elementos, com o código do material/tipo (posição na tabela de
+nomes) ou -1 quando não há associação. Verificar uma regra é uma varredura
+vetorial do array (codigos < 0), sem percorrer relação alguma por elemento.
+"""
+
+import numpy as np
+
+ASSOCIACAO_MATERIAL = "material"
+ASSOCIACAO_TIPO = "tipo"
+
+# Associação -> propriedade do nó que guarda o nome associado
+COLUNAS_ASSOCIACAO = {
+    ASSOCIACAO_MATERIAL: "material",
+    ASSOCIACAO_TIPO: "tipo_objeto",
+}
+COLUNA_MATERIAL = COLUNAS_ASSOCIACAO[ASSOCIACAO_MATERIAL]
+COLUNA_TIPO = COLUNAS_ASSOCIACAO[ASSOCIACAO_TIPO]
+
+SEM_ASSOCIACAO = -1
+
+
+class IndiceAssociacoes:
+    """Códigos de material e de tipo dos elementos, em arrays densos alinhados às URIs."""
+
+    def __init__(self, uris: list, rotulos: list, codigos: dict, nomes: dict):
+        """
+        :param uris: URIs dos elementos (uma por posição dos arrays)
+        :param rotulos: Rótulo (nome) de cada elemento, para o relatório
+        :param codigos: Associação -> array int32 (SEM_ASSOCIACAO = ausente)
+        :param nomes: Associação -> lista de nomes, indexada pelos códigos
+        """
+        self.uris = uris
+        self.rotulos = rotulos
+        self.codigos = codigos
+        self.nomes = nomes
+
+    def __len__(self):
+        return len(self.uris)
+
+    @classmethod
+    def de_valores(cls, uris: list, rotulos: list, valores: list):
+        """
+        Monta o índice a partir das propriedades de cada elemento (dicionários
+        com as chaves de COLUNAS_ASSOCIACAO), internando os nomes em uma passada.
+        """
+        codigos, nomes = {}, {}
+        for associacao, coluna in COLUNAS_ASSOCIACAO.items():
+            tabela, codigo_nome = [], {}
+            array = np.full(len(uris), SEM_ASSOCIACAO, dtype=np.int32)
+            for i, valores_elemento in enumerate(valores):
+                nome = valores_elemento.get(coluna)
+                if nome is None:
+                    continue
+                codigo = codigo_nome.get(nome)
+                if codigo is None:
+                    codigo = codigo_nome[nome] = len(tabela)
+                    tabela.append(nome)
+                array[i] = codigo
+            codigos[associacao] = array
+            nomes[associacao] = tabela
+        return cls(uris, rotulos, codigos, nomes)
+
+
+def anomalias_associacoes(indice: IndiceAssociacoes, tipo_filho: str, regras: list) -> dict:
+    """
+    Avalia as regras TEM MATERIAL / TEM TIPO de um tipo filho.
+
+    :param regras: Lista de (id_regra, associação, modo)
+    :return: {uri: [(id_regra, linha), ...]} dos elementos sem a associação,
+             na ordem do índice (ver colunas_propriedades.anomalias_propriedades)
+    """
+    anomalias = {}
+    if not regras or not len(indice):
+        return anomalias
+    violacoes = [(id_regra, indice.codigos[associacao] == SEM_ASSOCIACAO) for id_regra, associacao, _ in regras]
+    algum = np.logical_or.reduce([mascara for _, mascara in violacoes])
+    for i in np.flatnonzero(algum):
+        uri = indice.uris[i]
+        anomalias[uri] = [
+            (id_regra, {"elemento_anomalo": indice.rotulos[i], "id": uri, "tipo": tipo_filho})
+            for id_regra, mascara in violacoes if mascara[i]
+        ]
+    return anomalias
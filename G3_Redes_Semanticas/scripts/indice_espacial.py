@@ -0,0 +1,187 @@
+# indice_espacial.py
+
+"""
+Índice de ancestrais da árvore espacial do modelo.
+
+A árvore espacial é formada pelas arestas filho -> pai de contenção
+(IfcRelContainedInSpatialStructure) e de agregação (IfcRelAggregates):
+terreno -> edifício -> andar -> espaço -> elemento. Em vez de expandir
+caminhos de comprimento variável a cada regra, o índice é calculado uma
+única vez por importação:
+
+- Rótulos de intervalo (Euler tour): cada nó recebe `entrada` e `saida` em
+  uma busca em profundidade, e `a` é ancestral de `b` se e somente se
+  entrada[a] < entrada[b] <= saida[a] — uma comparação, O(1).
+- Tipos ancestrais: para cada nó, o conjunto dos tipos de todos os seus
+  ancestrais. A regra `VERIFICAR X CONTIDO_EM* Y` vira um teste de
+  pertinência nesse conjunto, também O(1). Irmãos compartilham o mesmo
+  conjunto (calculado uma vez por pai).
+
+Se um nó tiver mais de um pai, os intervalos usam o primeiro (a árvore
+geradora) e os tipos ancestrais combinam todos eles. Ciclos são ignorados.
+"""
+
+from collections import defaultdict
+
+# Nomes locais (predicados RDF / tipos de relação no grafo) das arestas
+REL_CONTENCAO = "isContainedIn"
+REL_AGREGACAO = "isPartOf"
+REL_ABERTURA = "voids"           # abertura -> elemento em que ela é recortada
+REL_PREENCHIMENTO = "fills"      # porta/janela -> abertura que ela preenche
+REL_HOSPEDAGEM = "isHostedBy"    # porta/janela -> elemento hospedeiro (derivada)
+REL_GEOMETRICA = "isWithin"      # elemento -> contêiner declarado que o contém geometricamente (derivada)
+
+# Relações que formam a árvore espacial
+RELACOES_ESPACIAIS = (REL_CONTENCAO, REL_AGREGACAO)
+
+VAZIO = frozenset()
+
+
+class IndiceAncestrais:
+    """
+    Índice de ancestrais sobre nós identificados por qualquer chave
+    (GUID no importador, URI no backend em memória).
+
+    Pode ser alimentado de uma vez (`adicionar_no` / `adicionar_aresta`) ou
+    em fluxo, envolvendo os geradores da extração com `observar_elementos`
+    e `observar_relacoes`; `construir` calcula os rótulos ao final.
+    """
+
+    def __init__(self):
+        self.tipos = {}                 # nó -> frozenset de tipos
+        self.pais = defaultdict(list)   # nó -> [pai, ...] (o primeiro é o da árvore geradora)
+        self.entrada = {}
+        self.saida = {}
+        self._ancestrais = {}           # nó -> frozenset de tipos ancestrais
+        self._construido = False
+
+    # --- Alimentação ---
+
+    def adicionar_no(self, no, tipos):
+        self.tipos[no] = frozenset(tipos)
+        self._construido = False
+
+    def adicionar_aresta(self, filho, pai):
+        if pai not in self.pais[filho]:
+            self.pais[filho].append(pai)
+        self._construido = False
+
+    def observar_elementos(self, elementos, chave=lambda guid: guid):
+        """Repassa as linhas de elemento, registrando o tipo de cada uma."""
+        for e in elementos:
+            self.adicionar_no(chave(e["guid"]), (e["ifc_type"],))
+            yield e
+
+    def observar_relacoes(self, linhas, chave=lambda guid: guid):
+        """Repassa as linhas filho -> pai, registrando as arestas espaciais."""
+        for linha in linhas:
+            if linha.get("relacao", REL_CONTENCAO) in RELACOES_ESPACIAIS:
+                self.adicionar_aresta(chave(linha["child_guid"]), chave(linha["parent_guid"]))
+            yield linha
+
+    def carregar(self, elementos, *grupos_de_linhas):
+        """Registra de uma vez elementos e arestas já extraídos."""
+        for _ in self.observar_elementos(elementos):
+            pass
+        for linhas in grupos_de_linhas:
+            for _ in self.observar_relacoes(linhas):
+                pass
+        return self
+
+    # --- Construção ---
+
+    def construir(self):
+        """Calcula os rótulos de intervalo e os tipos ancestrais."""
+        if self._construido:
+            return self
+        nos = set(self.tipos) | set(self.pais)
+        for pais in self.pais.values():
+            nos.update(pais)
+
+        # Árvore geradora: cada nó pendurado no primeiro pai
+        filhos = defaultdict(list)
+        for filho, pais in self.pais.items():
+            if pais and pais[0] != filho:
+                filhos[pais[0]].append(filho)
+
+        self.entrada, self.saida = {}, {}
+        contador = 0
+        raizes = sorted((n for n in nos if not self.pais.get(n)), key=str)
+        # Nós sem raiz (presos em um ciclo) também recebem intervalo
+        for raiz in raizes + sorted(nos - set(raizes), key=str):
+            if raiz in self.entrada:
+                continue
+            pilha = [(raiz, False)]
+            while pilha:
+                no, saindo = pilha.pop()
+                if saindo:
+                    self.saida[no] = contador - 1
+                    continue
+                if no in self.entrada:
+                    continue
+                self.entrada[no] = contador
+                contador += 1
+                pilha.append((no, True))
+                pilha.extend((f, False) for f in reversed(filhos.get(no, ())) if f not in self.entrada)
+
+        # Tipos ancestrais: pós-ordem iterativa sobre todos os pais, com
+        # memoização do conjunto "acima" de cada pai (compartilhado pelos filhos)
+        self._ancestrais = {}
+        acima = {}
+        em_andamento = set()
+        for inicio in nos:
+            pilha = [inicio]
+            while pilha:
+                no = pilha[-1]
+                if no in self._ancestrais:
+                    pilha.pop()
+                    continue
+                if no not in em_andamento:
+                    em_andamento.add(no)
+                    pilha.extend(p for p in self.pais.get(no, ())
+                                 if p not in self._ancestrais and p not in em_andamento)
+                    continue
+                pilha.pop()
+                em_andamento.discard(no)
+                conjuntos = []
+                for p in self.pais.get(no, ()):
+                    if p not in acima and p in self._ancestrais:
+                        acima[p] = self.tipos.get(p, VAZIO) | self._ancestrais[p]
+                    if p in acima:
+                        conjuntos.append(acima[p])
+                if not conjuntos:
+                    self._ancestrais[no] = VAZIO
+                elif len(conjuntos) == 1:
+                    self._ancestrais[no] = conjuntos[0]
+                else:
+                    self._ancestrais[no] = frozenset().union(*conjuntos)
+
+        self._construido = True
+        return self
+
+    # --- Consultas ---
+
+    def eh_ancestral(self, a, b) -> bool:
+        """True se `a` é ancestral (pai, avô, ...) de `b` na árvore espacial."""
+        ea, eb = self.entrada.get(a), self.entrada.get(b)
+        if ea is None or eb is None:
+            return False
+        return ea < eb <= self.saida[a]
+
+    def tipos_ancestrais(self, no) -> frozenset:
+        """Tipos de todos os ancestrais de `no`."""
+        return self._ancestrais.get(no, VAZIO)
+
+    def linhas(self, chave=lambda no: no):
+        """
+        Linhas {uri, entrada, saida, tipos_ancestrais} para gravação no grafo.
+
+        :param chave: Converte o nó na chave usada no grafo (ex.: GUID -> URI)
+        """
+        for no, entrada in self.entrada.items():
+            yield {
+                "uri": chave(no),
+                "entrada": entrada,
+                "saida": self.saida[no],
+                "tipos_ancestrais": sorted(self.tipos_ancestrais(no)),
+            }
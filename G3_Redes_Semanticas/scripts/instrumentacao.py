@@ -0,0 +1,145 @@
+# instrumentacao.py
+
+"""
+Instrumentação do pipeline: intervalos cronometrados (spans) e contadores.
+
+Cada etapa dos importadores e do auditor abre um span com
+`instrumentacao.etapa(nome, **rotulos)`; volumes (triplas, nós, linhas
+anômalas...) são somados com `incrementar`. Ao final, as medições podem ser
+exportadas como JSON lines (um registro por span/contador) ou no formato
+texto do Prometheus (para o textfile collector do node_exporter).
+
+As mensagens de progresso passam por `info`; com silencioso=True nada é
+impresso. Em laços quentes, teste `instrumentacao.silencioso` antes de
+montar a mensagem, para que nenhuma string seja formatada à toa.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+PREFIXO_PROMETHEUS = "bim_auditor"
+
+
+def _escapar_rotulo(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos_prometheus(rotulos: dict) -> str:
+    if not rotulos:
+        return ""
+    pares = ",".join(f'{chave}="{_escapar_rotulo(valor)}"' for chave, valor in sorted(rotulos.items()))
+    return "{" + pares + "}"
+
+
+class Instrumentacao:
+    """Coleta spans e contadores; pode ser usada por várias threads."""
+
+    def __init__(self, silencioso: bool = False):
+        self.silencioso = silencioso
+        self.spans = []       # [{"nome", "rotulos", "inicio", "segundos"}]
+        self.contadores = {}  # (nome, rótulos ordenados) -> valor
+        self._lock = threading.Lock()
+
+    def info(self, mensagem: str):
+        """Mensagem de progresso no console (omitida no modo silencioso)."""
+        if not self.silencioso:
+            print(mensagem)
+
+    @contextmanager
+    def etapa(self, nome: str, **rotulos):
+        """
+        Cronometra o bloco. O dicionário entregue pode receber dados
+        adicionais durante a execução (ex.: número de linhas produzidas).
+        """
+        extras = {}
+        inicio = time.time()
+        relogio = time.perf_counter()
+        try:
+            yield extras
+        finally:
+            span = {
+                "nome": nome,
+                "rotulos": rotulos,
+                "inicio": inicio,
+                "segundos": time.perf_counter() - relogio,
+            }
+            if extras:
+                span["dados"] = extras
+            with self._lock:
+                self.spans.append(span)
+
+    def incrementar(self, nome: str, valor=1, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def registrar_estatisticas(self, estatisticas: dict, prefixo: str, **rotulos):
+        """Soma como contadores os valores inteiros de um dicionário de estatísticas."""
+        for chave, valor in estatisticas.items():
+            if isinstance(valor, int) and not isinstance(valor, bool):
+                self.incrementar(f"{prefixo}_{chave}", valor, **rotulos)
+
+    # --- Exportação ---
+
+    def registros(self):
+        """Gerador de registros (dicionários) de spans e contadores."""
+        with self._lock:
+            spans = list(self.spans)
+            contadores = list(self.contadores.items())
+        for span in spans:
+            yield {"tipo": "span", **span}
+        for (nome, rotulos), valor in contadores:
+            yield {"tipo": "contador", "nome": nome, "rotulos": dict(rotulos), "valor": valor}
+
+    def exportar_jsonl(self, caminho: str):
+        """Acrescenta ao arquivo um registro JSON por linha."""
+        with open(caminho, 'a', encoding='utf-8') as f:
+            for registro in self.registros():
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    def texto_prometheus(self) -> str:
+        """
+        Formato de exposição do Prometheus: os spans viram
+        <prefixo>_etapa_segundos_total e <prefixo>_etapa_execucoes_total
+        (somados por nome e rótulos); os contadores, <prefixo>_<nome>_total.
+        """
+        segundos, execucoes = {}, {}
+        contadores = {}
+        for registro in self.registros():
+            if registro["tipo"] == "span":
+                chave = _rotulos_prometheus({"etapa": registro["nome"], **registro["rotulos"]})
+                segundos[chave] = segundos.get(chave, 0.0) + registro["segundos"]
+                execucoes[chave] = execucoes.get(chave, 0) + 1
+            else:
+                metrica = f"{PREFIXO_PROMETHEUS}_{registro['nome']}_total"
+                contadores.setdefault(metrica, []).append(
+                    (_rotulos_prometheus(registro["rotulos"]), registro["valor"]))
+
+        linhas = []
+        if segundos:
+            linhas.append(f"# TYPE {PREFIXO_PROMETHEUS}_etapa_segundos_total counter")
+            linhas.extend(f"{PREFIXO_PROMETHEUS}_etapa_segundos_total{r} {v:.6f}" for r, v in segundos.items())
+            linhas.append(f"# TYPE {PREFIXO_PROMETHEUS}_etapa_execucoes_total counter")
+            linhas.extend(f"{PREFIXO_PROMETHEUS}_etapa_execucoes_total{r} {v}" for r, v in execucoes.items())
+        for metrica, valores in contadores.items():
+            linhas.append(f"# TYPE {metrica} counter")
+            linhas.extend(f"{metrica}{r} {v}" for r, v in valores)
+        return "\n".join(linhas) + "\n"
+
+    def exportar_prometheus(self, caminho: str):
+        """Grava o arquivo .prom de forma atômica (lido pelo textfile collector)."""
+        temporario = caminho + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write(self.texto_prometheus())
+        os.replace(temporario, caminho)
+
+    def exportar(self, caminho: str, formato: str = "jsonl"):
+        if formato == "prometheus":
+            self.exportar_prometheus(caminho)
+        elif formato == "jsonl":
+            self.exportar_jsonl(caminho)
+        else:
+            raise ValueError(f"Formato de métricas desconhecido: {formato}")
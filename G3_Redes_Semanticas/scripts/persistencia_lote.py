@@ -0,0 +1,380 @@
+# persistencia_lote.py
+
+"""
+Persistência em lote de triplas RDF no grafo de destino.
+
+As triplas são agrupadas por predicado e por tipo de objeto (recurso, literal
+ou rdf:type) e enviadas em blocos `UNWIND $rows`, de modo que o número de
+idas e vindas ao banco cresce com o número de lotes, e não com o número de
+triplas.
+
+Com `profundidade_fila` > 0 (importação em pipeline), os lotes prontos não
+são enviados pela thread que os monta: vão para uma FilaDeEscrita limitada,
+esvaziada por uma thread escritora. A extração do IFC e a conversão das
+triplas continuam enquanto o banco processa o lote anterior; com a fila
+cheia, o produtor espera (contrapressão), e a memória fica limitada a
+`profundidade_fila` lotes em trânsito.
+"""
+
+import time
+import queue
+import threading
+from collections import defaultdict
+
+from rdflib import URIRef, Literal  # type: ignore
+from rdflib.namespace import RDF  # type: ignore
+
+TAMANHO_LOTE_PADRAO = 5000
+PROFUNDIDADE_FILA_PADRAO = 2  # buffer duplo: um lote sendo gravado, outro pronto
+
+# Tipos de lote (primeiro elemento da chave de agrupamento)
+LOTE_TIPO = "tipo"              # (s, rdf:type, Classe)  -> relação `type` + label no nó
+LOTE_RELACAO = "relacao"        # (s, p, URIRef)         -> relação entre recursos
+LOTE_PROPRIEDADE = "propriedade"  # (s, p, Literal)      -> propriedade no nó
+
+# Nó de metadados da importação (fora do label Resource): contagens de elementos por tipo
+ROTULO_METADADOS = "MetadadosImportacao"
+
+
+def nome_local(uri) -> str:
+    """Retorna o nome local de uma URI (parte após '#' ou a última '/')."""
+    uri = str(uri)
+    return uri.split('#')[-1] if '#' in uri else uri.split('/')[-1]
+
+
+def valor_literal(o: Literal):
+    """Valor gravado no nó: números e booleanos mantêm o tipo, o resto vira texto."""
+    valor = o.toPython()
+    return valor if isinstance(valor, (bool, int, float)) else str(o)
+
+
+class DestinoNeo4j:
+    """Destino que grava cada lote no Neo4j com uma única query UNWIND."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def executar_lote(self, tipo_lote: str, chave: str, linhas: list):
+        if tipo_lote == LOTE_TIPO:
+            query = f"""
+            UNWIND $rows AS r
+            MERGE (a:Resource {{uri: r.s}})
+            MERGE (b:Resource {{uri: r.o}})
+            MERGE (a)-[:`type`]->(b)
+            SET a:`{chave}`
+            """
+        elif tipo_lote == LOTE_RELACAO:
+            query = f"""
+            UNWIND $rows AS r
+            MERGE (a:Resource {{uri: r.s}})
+            MERGE (b:Resource {{uri: r.o}})
+            MERGE (a)-[:`{chave}`]->(b)
+            """
+        elif tipo_lote == LOTE_PROPRIEDADE:
+            query = f"""
+            UNWIND $rows AS r
+            MERGE (n:Resource {{uri: r.s}})
+            SET n.`{chave}` = r.v
+            """
+        else:
+            raise ValueError(f"Tipo de lote desconhecido: {tipo_lote}")
+
+        self.graph.run(query, rows=linhas)
+
+    def remover_recursos(self, uris: list):
+        """Remove os nós (e todas as suas relações) das URIs informadas."""
+        query = """
+        UNWIND $rows AS uri
+        MATCH (n:Resource {uri: uri})
+        DETACH DELETE n
+        """
+        self.graph.run(query, rows=uris)
+
+    def retrair_recursos(self, tipo: str, uris: list):
+        """
+        Desfaz as triplas de sujeito já gravadas (label do tipo, propriedades
+        literais e relações de saída), mantendo o nó e as relações que chegam
+        a ele, para que as triplas novas possam ser gravadas em seguida.
+        """
+        query = f"""
+        UNWIND $rows AS uri
+        MATCH (n:Resource {{uri: uri}})
+        REMOVE n:`{tipo}`
+        SET n = {{uri: n.uri}}
+        WITH n
+        OPTIONAL MATCH (n)-[r]->()
+        DELETE r
+        """
+        self.graph.run(query, rows=uris)
+
+    def gravar_indice_espacial(self, linhas: list):
+        """
+        Grava nos nós os rótulos do índice de ancestrais (ver indice_espacial):
+        intervalo `entrada`/`saida` e lista `tipos_ancestrais`.
+        """
+        query = """
+        UNWIND $rows AS r
+        MATCH (n:Resource {uri: r.uri})
+        SET n.entrada = r.entrada, n.saida = r.saida, n.tipos_ancestrais = r.tipos_ancestrais
+        """
+        self.graph.run(query, rows=linhas)
+
+    def gravar_contagens_tipos(self, contagens: dict):
+        """Grava o número de elementos de cada tipo IFC no nó de metadados."""
+        tipos = sorted(contagens)
+        query = f"""
+        MERGE (m:{ROTULO_METADADOS} {{chave: 'contagens_tipos'}})
+        SET m.tipos = $tipos, m.quantidades = $quantidades
+        """
+        self.graph.run(query, tipos=tipos, quantidades=[contagens[t] for t in tipos])
+
+
+class DestinoMemoria:
+    """
+    Destino local que reproduz em memória o efeito das queries de lote.
+    Útil para testar a importação sem um servidor Neo4j.
+    """
+
+    def __init__(self):
+        self.nos = {}        # uri -> {"labels": set, "props": dict}
+        self.relacoes = defaultdict(set)  # tipo_rel -> {(uri_origem, uri_destino)}
+        self.contagens = {}  # tipo IFC -> número de elementos (gravado pelo importador)
+        self.lotes_executados = 0
+
+    def _garantir_no(self, uri: str) -> dict:
+        no = self.nos.get(uri)
+        if no is None:
+            no = {"labels": {"Resource"}, "props": {"uri": uri}}
+            self.nos[uri] = no
+        return no
+
+    def executar_lote(self, tipo_lote: str, chave: str, linhas: list):
+        self.lotes_executados += 1
+        if tipo_lote in (LOTE_TIPO, LOTE_RELACAO):
+            tipo_rel = "type" if tipo_lote == LOTE_TIPO else chave
+            for r in linhas:
+                origem = self._garantir_no(r["s"])
+                self._garantir_no(r["o"])
+                self.relacoes[tipo_rel].add((r["s"], r["o"]))
+                if tipo_lote == LOTE_TIPO:
+                    origem["labels"].add(chave)
+        elif tipo_lote == LOTE_PROPRIEDADE:
+            for r in linhas:
+                self._garantir_no(r["s"])["props"][chave] = r["v"]
+        else:
+            raise ValueError(f"Tipo de lote desconhecido: {tipo_lote}")
+
+    def remover_recursos(self, uris: list):
+        removidos = set(uris)
+        for uri in removidos:
+            self.nos.pop(uri, None)
+        for pares in self.relacoes.values():
+            pares.difference_update({par for par in pares if par[0] in removidos or par[1] in removidos})
+
+    def retrair_recursos(self, tipo: str, uris: list):
+        retraidos = set(uris)
+        for uri in retraidos:
+            no = self.nos.get(uri)
+            if no is not None:
+                no["labels"].discard(tipo)
+                no["props"] = {"uri": uri}
+        for pares in self.relacoes.values():
+            pares.difference_update({par for par in pares if par[0] in retraidos})
+
+    def gravar_indice_espacial(self, linhas: list):
+        for r in linhas:
+            no = self.nos.get(r["uri"])
+            if no is not None:
+                no["props"].update(entrada=r["entrada"], saida=r["saida"],
+                                   tipos_ancestrais=r["tipos_ancestrais"])
+
+    def gravar_contagens_tipos(self, contagens: dict):
+        self.contagens = dict(contagens)
+
+
+class FilaDeEscrita:
+    """
+    Fila limitada entre um produtor e uma thread escritora que executa
+    `escrever(*item)` para cada item, na ordem de chegada.
+
+    Mede a contrapressão dos dois lados: o tempo que o produtor passou
+    esperando espaço na fila (a escrita é o gargalo) e o tempo que a
+    escritora passou esperando itens (a extração é o gargalo). Um erro na
+    escritora é relançado no produtor, no próximo enviar() ou em fechar().
+    """
+
+    _FIM = object()
+
+    def __init__(self, escrever, profundidade: int = PROFUNDIDADE_FILA_PADRAO, nome: str = "escritor"):
+        if profundidade < 1:
+            raise ValueError("A profundidade da fila deve ser maior que zero.")
+        self.escrever = escrever
+        self.profundidade = profundidade
+        self.itens = 0
+        self.espera_produtor = 0.0
+        self.espera_escritor = 0.0
+        self.ocupacao_maxima = 0
+        self._soma_ocupacao = 0
+        self._erro = None
+        self._fila = queue.Queue(maxsize=profundidade)
+        self._thread = threading.Thread(target=self._consumir, name=nome, daemon=True)
+        self._thread.start()
+
+    def enviar(self, *item):
+        if self._erro is not None:
+            raise self._erro
+        ocupacao = self._fila.qsize()
+        self._soma_ocupacao += ocupacao
+        self.ocupacao_maxima = max(self.ocupacao_maxima, ocupacao)
+        inicio = time.perf_counter()
+        self._fila.put(item)
+        self.espera_produtor += time.perf_counter() - inicio
+        self.itens += 1
+
+    def _consumir(self):
+        while True:
+            inicio = time.perf_counter()
+            item = self._fila.get()
+            self.espera_escritor += time.perf_counter() - inicio
+            if item is self._FIM:
+                return
+            # Depois de um erro, só esvazia a fila para o produtor não ficar bloqueado
+            if self._erro is None:
+                try:
+                    self.escrever(*item)
+                except Exception as e:
+                    self._erro = e
+
+    def fechar(self):
+        """Aguarda a escrita de tudo o que foi enviado."""
+        self._fila.put(self._FIM)
+        self._thread.join()
+        if self._erro is not None:
+            raise self._erro
+
+    def estatisticas(self) -> dict:
+        """Contrapressão do pipeline e o lado que limitou a vazão."""
+        return {
+            "itens": self.itens,
+            "profundidade": self.profundidade,
+            "ocupacao_media": self._soma_ocupacao / self.itens if self.itens else 0.0,
+            "ocupacao_maxima": self.ocupacao_maxima,
+            "espera_produtor_segundos": self.espera_produtor,
+            "espera_escritor_segundos": self.espera_escritor,
+            "gargalo": "escrita" if self.espera_produtor > self.espera_escritor else "extracao",
+        }
+
+
+def registrar_contrapressao(instrumentacao, estatisticas: dict, **rotulos):
+    """Registra e mostra a contrapressão de uma FilaDeEscrita (ver FilaDeEscrita.estatisticas)."""
+    instrumentacao.incrementar("pipeline_espera_segundos", estatisticas["espera_produtor_segundos"],
+                               lado="produtor", **rotulos)
+    instrumentacao.incrementar("pipeline_espera_segundos", estatisticas["espera_escritor_segundos"],
+                               lado="escritor", **rotulos)
+    instrumentacao.incrementar("pipeline_lotes", estatisticas["itens"], **rotulos)
+    instrumentacao.info(
+        f"-> Pipeline: produtor esperou {estatisticas['espera_produtor_segundos']:.2f}s pela escrita e "
+        f"escritor esperou {estatisticas['espera_escritor_segundos']:.2f}s pela extração; ocupação média "
+        f"{estatisticas['ocupacao_media']:.1f}/{estatisticas['profundidade']} (gargalo: {estatisticas['gargalo']}).")
+
+
+class EscritorEmLote:
+    """
+    Acumula triplas RDF em grupos (tipo de lote, chave) e descarrega cada
+    grupo no destino quando atinge `tamanho_lote` linhas. Conta, de
+    passagem, os elementos de cada tipo (`por_tipo`), usados pela análise
+    de regras do auditor.
+
+    Com `profundidade_fila` > 0, os lotes são gravados por uma thread
+    escritora (ver FilaDeEscrita); descarregar() espera o fim da escrita e
+    guarda a contrapressão medida em `pipeline`.
+    """
+
+    def __init__(self, destino, tamanho_lote: int = TAMANHO_LOTE_PADRAO, profundidade_fila: int = 0):
+        if tamanho_lote < 1:
+            raise ValueError("O tamanho do lote deve ser maior que zero.")
+        self.destino = destino
+        self.tamanho_lote = tamanho_lote
+        self.profundidade_fila = profundidade_fila
+        self.pipeline = None
+        self._fila = None
+        self.grupos = defaultdict(list)
+        self.triplas = 0
+        self.lotes = 0
+        self.nos = 0
+        self.relacoes = 0
+        self.propriedades = 0
+        self.por_tipo = defaultdict(int)
+        self.segundos = 0.0
+
+    def adicionar(self, s, p, o):
+        """Classifica a tripla e a coloca no grupo correspondente."""
+        if p == RDF.type and isinstance(o, URIRef):
+            chave = (LOTE_TIPO, nome_local(o))
+            linha = {"s": str(s), "o": str(o)}
+            self.nos += 2
+            self.relacoes += 1
+            self.por_tipo[chave[1]] += 1
+        elif isinstance(o, URIRef):
+            chave = (LOTE_RELACAO, nome_local(p))
+            linha = {"s": str(s), "o": str(o)}
+            self.nos += 2
+            self.relacoes += 1
+        elif isinstance(o, Literal):
+            chave = (LOTE_PROPRIEDADE, nome_local(p))
+            linha = {"s": str(s), "v": valor_literal(o)}
+            self.nos += 1
+            self.propriedades += 1
+        else:
+            # Nós em branco não são representados no grafo de propriedades
+            return
+
+        self.triplas += 1
+        grupo = self.grupos[chave]
+        grupo.append(linha)
+        if len(grupo) >= self.tamanho_lote:
+            self._enviar(chave, grupo)
+            self.grupos[chave] = []
+
+    def adicionar_todas(self, triplas):
+        for s, p, o in triplas:
+            self.adicionar(s, p, o)
+
+    def descarregar(self):
+        """Envia todos os grupos pendentes, inclusive os incompletos."""
+        for chave, grupo in list(self.grupos.items()):
+            if grupo:
+                self._enviar(chave, grupo)
+        self.grupos.clear()
+        if self._fila is not None:
+            fila, self._fila = self._fila, None
+            fila.fechar()
+            self.pipeline = fila.estatisticas()
+
+    def _enviar(self, chave, linhas):
+        if self.profundidade_fila > 0:
+            if self._fila is None:
+                self._fila = FilaDeEscrita(self._gravar, self.profundidade_fila)
+            self._fila.enviar(chave, linhas)
+        else:
+            self._gravar(chave, linhas)
+
+    def _gravar(self, chave, linhas):
+        tipo_lote, nome = chave
+        inicio = time.perf_counter()
+        self.destino.executar_lote(tipo_lote, nome, linhas)
+        self.segundos += time.perf_counter() - inicio
+        self.lotes += 1
+
+    def estatisticas(self) -> dict:
+        """Resumo da escrita: volume, número de lotes e vazão em triplas/s."""
+        vazao = self.triplas / self.segundos if self.segundos > 0 else 0.0
+        return {
+            "triplas": self.triplas,
+            "lotes": self.lotes,
+            "nos": self.nos,
+            "relacoes": self.relacoes,
+            "propriedades": self.propriedades,
+            "segundos": self.segundos,
+            "triplas_por_segundo": vazao,
+        }
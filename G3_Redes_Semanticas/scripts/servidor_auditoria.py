@@ -0,0 +1,445 @@
+# servidor_auditoria.py
+
+"""
+Serviço residente de auditoria: mantém o modelo e as regras compiladas em
+memória, vigia o arquivo IFC e o arquivo de regras e reaudita só o que mudou.
+
+Cada execução do bim_auditor paga a partida do interpretador, a conexão com
+o Neo4j, a gramática e todas as regras; cada importação, o parsing do IFC e
+a reconstrução do grafo. O serviço paga isso uma vez:
+
+- o modelo vive em um BackendMemoria. A cada gravação do IFC o arquivo é
+  relido, o manifesto (ver importacao_incremental) é comparado ao da
+  versão anterior e só os elementos inseridos, atualizados e removidos são
+  aplicados ao grafo (aplicar_diferenca). A carga inicial é a diferença
+  em relação a um manifesto vazio;
+- as regras são compiladas uma vez por texto: ao editar regras.txt, só as
+  linhas novas passam pelo parser LALR;
+- a contenção geométrica (isWithin) só é extraída enquanto houver uma
+  regra DENTRO_DE: a primeira que aparece faz o modelo ser relido com ela;
+- as anomalias são guardadas por texto de regra. Uma regra nova é sempre
+  executada; após uma alteração do modelo, só as regras que dependem dos
+  tipos alterados (ver regra_afetada) são reexecutadas, e as demais
+  reaproveitam o resultado anterior.
+
+A vigilância é por polling de (mtime, tamanho), sem dependências extras;
+uma alteração só é processada quando a assinatura fica estável entre duas
+leituras, para não ler um IFC no meio da gravação.
+
+Os resultados ficam disponíveis em uma API HTTP local (TCP em 127.0.0.1 ou
+socket Unix):
+
+    GET  /estado              resumo da última auditoria
+    GET  /anomalias[?regra=N] elementos anômalos (de uma regra ou de todas)
+    GET  /metricas            spans e contadores da última auditoria (Prometheus)
+    POST /auditar[?forcar=1]  verifica os arquivos agora (forcar: reexecuta tudo)
+
+Cada auditoria também regrava o relatório de GUIDs (e, se pedido, a
+exportação estruturada; ver exportacao_anomalias) para a revisão no Blender.
+"""
+
+import os
+import json
+import time
+import signal
+import argparse
+import threading
+import traceback
+import socketserver
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import ifcopenshell  # type: ignore
+
+from backend_grafo import BackendMemoria, MODO_ANCESTRAL, MODO_GEOMETRICO, MODOS_COLUNARES
+from bim_auditor import AuditorRegras, montar_plano, guid_da_uri
+from extracao_ifc import (iterar_elementos, iterar_contencoes, iterar_relacoes, iterar_propriedades,
+                          iterar_contencao_geometrica)
+from importacao_incremental import (mapa_pais, mapa_propriedades, calcular_manifesto, comparar_manifestos,
+                                    aplicar_diferenca)
+from exportacao_anomalias import ExportadorAnomalias
+from instrumentacao import Instrumentacao
+
+IFC_FILE_PATH = '../modelo_ifc/Building-Architecture.ifc'
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8765
+INTERVALO_VIGILANCIA = 0.5
+
+
+def assinatura_arquivo(caminho: str):
+    """(mtime em ns, tamanho) do arquivo, ou None se ele não existir."""
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return None
+    return estado.st_mtime_ns, estado.st_size
+
+
+def regra_afetada(tipos: tuple, tipos_alterados: set) -> bool:
+    """
+    Se uma regra compilada (filho, pai/critério, modo) pode mudar de resultado
+    quando elementos dos tipos `tipos_alterados` são inseridos, atualizados ou
+    removidos.
+
+    As regras colunares dependem só dos elementos do tipo filho; as
+    relacionais de um salto, também dos do tipo pai (um pai removido deixa o
+    filho órfão sem alterar o filho). No modo ancestral, qualquer nó
+    intermediário da árvore conta, então toda alteração reexecuta a regra.
+    """
+    tipo_filho, alvo, modo = tipos
+    if modo == MODO_ANCESTRAL:
+        return True
+    if modo in MODOS_COLUNARES:
+        return tipo_filho in tipos_alterados
+    return tipo_filho in tipos_alterados or alvo in tipos_alterados
+
+
+class _ColetorPorRegra:
+    """Coletor do executar_plano que apenas agrupa as linhas por id de regra."""
+
+    def __init__(self):
+        self.linhas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, id_regra, linha: dict):
+        with self._lock:
+            self.linhas.setdefault(id_regra, []).append(linha)
+
+
+class ServicoAuditoria:
+    """Modelo, regras compiladas e anomalias mantidos em memória entre auditorias."""
+
+    def __init__(self, caminho_ifc: str, caminho_regras: str, caminho_relatorio: str = None,
+                 caminho_exportacao: str = None, silencioso: bool = False):
+        """
+        :param caminho_ifc: Modelo vigiado
+        :param caminho_regras: Arquivo de regras vigiado
+        :param caminho_relatorio: Relatório de GUIDs regravado a cada auditoria
+        :param caminho_exportacao: Se informado, exportação estruturada regravada a cada auditoria
+        """
+        self.caminho_ifc = os.path.abspath(caminho_ifc)
+        self.caminho_regras = os.path.abspath(caminho_regras)
+        self.caminho_relatorio = caminho_relatorio
+        self.caminho_exportacao = caminho_exportacao
+        self.silencioso = silencioso
+        self.instrumentacao = Instrumentacao(silencioso=silencioso)
+        self.backend = BackendMemoria()
+        self.auditor = AuditorRegras(backend=self.backend, instrumentacao=self.instrumentacao)
+        self.geracao = 0
+        self.publicado = None     # {"resumo", "anomalias", "metricas"}: trocado de uma vez
+        self._manifesto = {}
+        self._compiladas = {}     # texto da regra -> (filho, pai/critério, modo) ou None
+        self._anomalias = {}      # texto da regra -> [linha, ...]
+        self._assinaturas = {"modelo": None, "regras": None}
+        self._geometria = False   # o modelo em memória tem a contenção geométrica
+        self._lock = threading.Lock()
+
+    # --- Modelo ---
+
+    def atualizar_modelo(self, instrumentacao: Instrumentacao):
+        """
+        Relê o IFC e aplica ao backend a diferença em relação à versão em memória.
+
+        :return: (diferença, tipos dos elementos alterados)
+        """
+        with instrumentacao.etapa("extracao"):
+            ifc = ifcopenshell.open(self.caminho_ifc)
+            elementos_por_guid = {e["guid"]: e for e in iterar_elementos(ifc)}
+            contencoes = list(iterar_contencoes(ifc))
+            relacoes = list(iterar_relacoes(ifc))
+            if self._geometria:
+                relacoes += iterar_contencao_geometrica(ifc)
+            propriedades = list(iterar_propriedades(ifc))
+        with instrumentacao.etapa("manifesto"):
+            novo = calcular_manifesto(elementos_por_guid.values(), mapa_pais(contencoes + relacoes),
+                                      mapa_propriedades(propriedades))
+        antigo = self._manifesto
+        diferenca = comparar_manifestos(antigo, novo)
+        aplicar_diferenca(self.backend, diferenca, antigo, elementos_por_guid, contencoes, relacoes,
+                          propriedades, instrumentacao=instrumentacao)
+        self._manifesto = novo
+
+        tipos = {antigo[g]["tipo"] for g in diferenca["atualizados"] + diferenca["removidos"]}
+        tipos |= {novo[g]["tipo"] for g in diferenca["inseridos"] + diferenca["atualizados"]}
+        return diferenca, tipos
+
+    # --- Regras ---
+
+    def compilar(self, regra_txt: str, instrumentacao: Instrumentacao):
+        """Compila uma regra (uma vez por texto); None se ela não puder ser traduzida."""
+        if regra_txt not in self._compiladas:
+            try:
+                with instrumentacao.etapa("parse"):
+                    arvore = self.auditor.parser.parse(regra_txt)
+                with instrumentacao.etapa("traducao"):
+                    self._compiladas[regra_txt] = self.auditor.interpretar_regra(arvore)
+            except Exception as e:
+                print(f"❌ Erro ao compilar a regra '{regra_txt}': {e}")
+                self._compiladas[regra_txt] = None
+        return self._compiladas[regra_txt]
+
+    # --- Auditoria ---
+
+    def verificar(self, forcar: bool = False):
+        """
+        Audita se o modelo ou as regras mudaram desde a última auditoria
+        (ou sempre, com forcar). Retorna o resumo publicado.
+        """
+        with self._lock:
+            modelo = assinatura_arquivo(self.caminho_ifc)
+            regras = assinatura_arquivo(self.caminho_regras)
+            mudou_modelo = modelo != self._assinaturas["modelo"]
+            mudou_regras = regras != self._assinaturas["regras"]
+            if self.publicado is not None and not (mudou_modelo or mudou_regras or forcar):
+                return self.publicado["resumo"]
+            self._assinaturas = {"modelo": modelo, "regras": regras}
+            try:
+                self._auditar(mudou_modelo, forcar)
+            except Exception as e:
+                print(f"❌ Erro na auditoria: {e}")
+                traceback.print_exc()
+                # O modelo em memória pode ter ficado pela metade: modelo e regras são
+                # relidos na próxima verificação
+                self._assinaturas["modelo"] = None
+                self._assinaturas["regras"] = None
+                if self.publicado is not None:
+                    self.publicado["resumo"]["erro"] = str(e)
+            return self.publicado["resumo"] if self.publicado is not None else {"erro": "Sem auditoria."}
+
+    def _auditar(self, mudou_modelo: bool, forcar: bool):
+        instrumentacao = Instrumentacao(silencioso=self.silencioso)
+        self.auditor.instrumentacao = instrumentacao
+        info = instrumentacao.info
+        inicio = time.perf_counter()
+
+        with instrumentacao.etapa("carregar_regras"):
+            _, _, regras = self.auditor.carregar_regras(self.caminho_regras)
+        compiladas_antes = len(self._compiladas)
+        with instrumentacao.etapa("compilacao"):
+            tipos_por_regra = {}
+            for idx, (_, regra_txt) in enumerate(regras, 1):
+                tipos = self.compilar(regra_txt, instrumentacao)
+                if tipos:
+                    tipos_por_regra[idx] = tipos
+        # A primeira regra DENTRO_DE faz o modelo ser relido com a contenção geométrica
+        if not self._geometria and any(modo == MODO_GEOMETRICO for _, _, modo in tipos_por_regra.values()):
+            self._geometria = mudou_modelo = True
+
+        alteracoes = None
+        invalidar = set()
+        if mudou_modelo:
+            with instrumentacao.etapa("atualizacao_modelo"):
+                diferenca, tipos_alterados = self.atualizar_modelo(instrumentacao)
+            alteracoes = {chave: len(guids) for chave, guids in diferenca.items()}
+            info(f"🔄 Modelo: {alteracoes['inseridos']} inseridos, {alteracoes['atualizados']} atualizados, "
+                 f"{alteracoes['removidos']} removidos.")
+            if tipos_alterados:
+                invalidar = {texto for texto, tipos in self._compiladas.items()
+                             if tipos and regra_afetada(tipos, tipos_alterados)}
+        if forcar:
+            invalidar = set(self._anomalias)
+
+        textos = {regra_txt for _, regra_txt in regras}
+        # Regras apagadas do arquivo não ocupam memória
+        self._compiladas = {t: c for t, c in self._compiladas.items() if t in textos}
+        self._anomalias = {t: a for t, a in self._anomalias.items() if t in textos and t not in invalidar}
+
+        pendentes = {idx: tipos for idx, tipos in tipos_por_regra.items()
+                     if regras[idx - 1][1] not in self._anomalias}
+        executadas = {regras[idx - 1][1] for idx in pendentes}
+        if pendentes:
+            coletor = _ColetorPorRegra()
+            with instrumentacao.etapa("execucao_plano"):
+                self.auditor.executar_plano(montar_plano(pendentes), coletor)
+            for idx in pendentes:
+                self._anomalias[regras[idx - 1][1]] = coletor.linhas.get(idx, [])
+
+        self.geracao += 1
+        anomalias = {idx: self._anomalias[regras[idx - 1][1]] for idx in tipos_por_regra}
+        with instrumentacao.etapa("relatorio"):
+            self._gravar_saidas(regras, anomalias)
+        resumo = self._resumo(regras, anomalias)
+        resumo["ultima_execucao"] = {
+            "segundos": time.perf_counter() - inicio,
+            "modelo": alteracoes,
+            "regras_compiladas": len(self._compiladas) - compiladas_antes,
+            "regras_executadas": len(executadas),
+            "regras_reaproveitadas": len(set(regras[idx - 1][1] for idx in tipos_por_regra) - executadas),
+        }
+        instrumentacao.incrementar("regras_executadas", len(executadas))
+        self.publicado = {"resumo": resumo, "anomalias": anomalias,
+                          "metricas": instrumentacao.texto_prometheus()}
+        info(f"✅ Auditoria {self.geracao}: {len(executadas)} regra(s) executada(s), "
+             f"{resumo['regras_com_anomalias']} com anomalias, em {resumo['ultima_execucao']['segundos']:.3f}s")
+
+    def _resumo(self, regras: list, anomalias: dict) -> dict:
+        por_regra = []
+        for idx, (linha_num, regra_txt) in enumerate(regras, 1):
+            if idx not in anomalias:
+                situacao, total = "falha_traducao", None
+            else:
+                total = len(anomalias[idx])
+                situacao = "com_anomalias" if total else "conforme"
+            por_regra.append({"id": idx, "linha": linha_num, "regra": regra_txt,
+                              "situacao": situacao, "anomalias": total})
+        com_anomalias = sum(1 for r in por_regra if r["situacao"] == "com_anomalias")
+        return {
+            "geracao": self.geracao,
+            "modelo": self.caminho_ifc,
+            "arquivo_regras": self.caminho_regras,
+            "elementos": len(self._manifesto),
+            "regras": por_regra,
+            "regras_com_anomalias": com_anomalias,
+            "conformidade": (len(regras) - com_anomalias) / len(regras) * 100 if regras else None,
+        }
+
+    def _gravar_saidas(self, regras: list, anomalias: dict):
+        """Relatório de GUIDs (sem repetição) e, se pedida, a exportação estruturada."""
+        if self.caminho_relatorio:
+            guids = {}
+            for linhas in anomalias.values():
+                for linha in linhas:
+                    guids.setdefault(guid_da_uri(linha.get("id")), None)
+            with open(self.caminho_relatorio, 'w', encoding='utf-8') as f:
+                f.writelines(f"{guid}\n" for guid in guids)
+        if self.caminho_exportacao:
+            exportador = ExportadorAnomalias(self.caminho_exportacao,
+                                             {idx: regra_txt for idx, (_, regra_txt) in enumerate(regras, 1)})
+            try:
+                for id_regra, linhas in anomalias.items():
+                    for linha in linhas:
+                        exportador.registrar(id_regra, guid_da_uri(linha.get("id")), linha.get("tipo"),
+                                             linha.get("elemento_anomalo"))
+            finally:
+                exportador.fechar()
+
+    # --- Vigilância ---
+
+    def vigiar(self, parar: threading.Event, intervalo: float = INTERVALO_VIGILANCIA):
+        """
+        Laço de vigilância: audita quando a assinatura de um dos arquivos muda
+        e permanece estável por uma leitura (gravação concluída).
+        """
+        vistas = None
+        while not parar.wait(intervalo):
+            atuais = (assinatura_arquivo(self.caminho_ifc), assinatura_arquivo(self.caminho_regras))
+            processadas = (self._assinaturas["modelo"], self._assinaturas["regras"])
+            if atuais != processadas and atuais == vistas and None not in atuais:
+                self.verificar()
+            vistas = atuais
+
+
+class ManipuladorAPI(BaseHTTPRequestHandler):
+    """Rotas da API; o serviço vem do servidor (atributo `servico`)."""
+
+    def _responder(self, corpo, status: int = 200, tipo: str = "application/json"):
+        dados = corpo.encode("utf-8") if isinstance(corpo, str) else json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{tipo}; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        servico = self.server.servico
+        url = urlparse(self.path)
+        publicado = servico.publicado
+        if publicado is None:
+            return self._responder({"erro": "Auditoria inicial em andamento."}, 503)
+        if url.path == "/estado":
+            return self._responder(publicado["resumo"])
+        if url.path == "/metricas":
+            return self._responder(publicado["metricas"], tipo="text/plain")
+        if url.path == "/anomalias":
+            consulta = parse_qs(url.query)
+            anomalias = publicado["anomalias"]
+            if "regra" in consulta:
+                try:
+                    ids = [int(consulta["regra"][0])]
+                except ValueError:
+                    return self._responder({"erro": "Parâmetro 'regra' inválido."}, 400)
+            else:
+                ids = sorted(anomalias)
+            return self._responder({
+                str(idx): [{"guid": guid_da_uri(l.get("id")), "nome": l.get("elemento_anomalo"), "tipo": l.get("tipo")}
+                           for l in anomalias.get(idx, [])]
+                for idx in ids
+            })
+        self._responder({"erro": f"Rota desconhecida: {url.path}"}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/auditar":
+            return self._responder({"erro": f"Rota desconhecida: {url.path}"}, 404)
+        forcar = parse_qs(url.query).get("forcar", ["0"])[0] not in ("0", "")
+        self._responder(self.server.servico.verificar(forcar=forcar))
+
+    def address_string(self):
+        # Em socket Unix o endereço do cliente é vazio
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def criar_servidor(servico: ServicoAuditoria, host: str = HOST_PADRAO, porta: int = PORTA_PADRAO,
+                   caminho_socket: str = None):
+    """Servidor HTTP da API, em TCP local ou, com caminho_socket, em socket Unix."""
+    if caminho_socket:
+        if os.path.exists(caminho_socket):
+            os.remove(caminho_socket)
+        servidor = ServidorUnix(caminho_socket, ManipuladorAPI)
+    else:
+        servidor = ThreadingHTTPServer((host, porta), ManipuladorAPI)
+    servidor.servico = servico
+    return servidor
+
+
+# --- EXECUÇÃO PRINCIPAL ---
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser_arg = argparse.ArgumentParser(description="Serviço residente de auditoria BIM")
+    parser_arg.add_argument("--ifc", type=str, default=os.path.join(script_dir, IFC_FILE_PATH),
+                            help="Arquivo IFC vigiado")
+    parser_arg.add_argument("--regras", type=str, default=os.path.join(script_dir, "regras.txt"),
+                            help="Arquivo de regras vigiado")
+    parser_arg.add_argument("--host", type=str, default=HOST_PADRAO, help="Endereço da API HTTP")
+    parser_arg.add_argument("--porta", type=int, default=PORTA_PADRAO, help="Porta da API HTTP")
+    parser_arg.add_argument("--socket", type=str, default=None,
+                            help="Atende a API em um socket Unix, em vez de TCP")
+    parser_arg.add_argument("--intervalo", type=float, default=INTERVALO_VIGILANCIA,
+                            help="Intervalo (s) entre as verificações dos arquivos")
+    parser_arg.add_argument("--relatorio", type=str, default=os.path.join(script_dir, "anomalias_detectadas.txt"),
+                            help="Relatório de GUIDs regravado a cada auditoria")
+    parser_arg.add_argument("--exportar", type=str, default=None,
+                            help="Exportação estruturada das anomalias, regravada a cada auditoria")
+    parser_arg.add_argument("--silencioso", action="store_true",
+                            help="Não imprime mensagens de progresso (apenas erros)")
+    args = parser_arg.parse_args()
+
+    servico = ServicoAuditoria(args.ifc, args.regras, caminho_relatorio=args.relatorio,
+                               caminho_exportacao=args.exportar, silencioso=args.silencioso)
+    servico.instrumentacao.info(f"📦 Carregando '{args.ifc}'...")
+    servico.verificar()
+
+    parar = threading.Event()
+    vigia = threading.Thread(target=servico.vigiar, args=(parar, args.intervalo), daemon=True)
+    vigia.start()
+    servidor = criar_servidor(servico, args.host, args.porta, args.socket)
+    # SIGTERM (ex.: systemd, kill) encerra como o Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    endereco = args.socket or f"http://{args.host}:{args.porta}"
+    servico.instrumentacao.info(f"🚀 Serviço de auditoria em {endereco} (vigiando o modelo e as regras)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servico.instrumentacao.info("\n🛑 Encerrando o serviço...")
+    finally:
+        parar.set()
+        servidor.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
@@ -0,0 +1,325 @@
+# snapshot_modelo.py
+
+"""
+Snapshot colunar do modelo extraído, para recargas sem parsing do IFC.
+
+O resultado da extração (elementos, contenções, relações complementares e
+propriedades) é salvo em um diretório
+`<arquivo>.ifc.snapshot/` ao lado do IFC, como arrays NumPy:
+
+    tipo.npy               uint16, código do tipo IFC de cada elemento
+    guid.npy               S22, GlobalId de largura fixa
+    nome_offsets.npy       int64 (n+1), início/fim de cada nome em nomes.npy
+    nomes.npy              uint8, nomes concatenados em UTF-8
+    contencao_indptr.npy   int64 (n+1), CSR filho -> pais de contenção
+    contencao_indices.npy  int32, índices (em elementos) dos pais
+    relacao_origem.npy     int32, filho de cada relação complementar (COO)
+    relacao_destino.npy    int32, pai de cada relação complementar
+    relacao_codigo.npy     uint8, código da relação (ex.: isPartOf)
+    prop_origem.npy        int32, elemento de cada valor de propriedade (COO)
+    prop_coluna.npy        uint16, código da coluna ("Conjunto.Propriedade")
+    prop_tipo.npy          uint8, tipo do valor (ver TIPOS_VALOR)
+    prop_numero.npy        float64, valor numérico (NaN para texto)
+    prop_texto_offsets.npy int64, início/fim de cada texto em prop_textos.npy
+    prop_textos.npy        uint8, valores de texto concatenados em UTF-8
+    meta.json              versão, hash do IFC, tabelas de tipos, relações e
+                           colunas, e se a contenção geométrica foi extraída
+
+Os arrays são abertos com mmap: carregar o snapshot não lê o arquivo
+inteiro, e só as páginas acessadas vão para a memória. O snapshot só é
+usado se o hash do IFC for o mesmo registrado em meta.json.
+
+A contenção geométrica (isWithin) é opcional, como na extração: ela fica
+nos mesmos arrays de relações, mas sai à parte em contencao_geometrica().
+Um snapshot salvo sem ela é refeito quando ela é pedida.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np  # type: ignore
+
+from indice_espacial import REL_GEOMETRICA
+
+VERSAO_SNAPSHOT = 5
+TAMANHO_GUID = 22
+
+ARRAYS = ("tipo", "guid", "nome_offsets", "nomes", "contencao_indptr", "contencao_indices",
+          "relacao_origem", "relacao_destino", "relacao_codigo",
+          "prop_origem", "prop_coluna", "prop_tipo", "prop_numero", "prop_texto_offsets", "prop_textos")
+
+# Tipo de cada valor de propriedade: código -> conversão a partir do float64
+TIPOS_VALOR = (float, int, bool, str)
+CODIGO_TIPO_VALOR = {tipo: codigo for codigo, tipo in enumerate(TIPOS_VALOR)}
+
+
+def caminho_snapshot(caminho_ifc: str) -> str:
+    return caminho_ifc + ".snapshot"
+
+
+def hash_arquivo(caminho: str) -> str:
+    """SHA-256 do arquivo, lido em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+class SnapshotModelo:
+    """Modelo extraído em arrays colunares (normalmente mapeados em memória)."""
+
+    def __init__(self, tipos: list, tipo, guid, nome_offsets, nomes, contencao_indptr, contencao_indices,
+                 relacoes: list, relacao_origem, relacao_destino, relacao_codigo,
+                 colunas: list, prop_origem, prop_coluna, prop_tipo, prop_numero, prop_texto_offsets, prop_textos,
+                 geometria: bool = False):
+        self.tipos = tipos
+        self.tipo = tipo
+        self.guid = guid
+        self.nome_offsets = nome_offsets
+        self.nomes = nomes
+        self.contencao_indptr = contencao_indptr
+        self.contencao_indices = contencao_indices
+        self.nomes_relacoes = relacoes
+        self.relacao_origem = relacao_origem
+        self.relacao_destino = relacao_destino
+        self.relacao_codigo = relacao_codigo
+        self.colunas = colunas
+        self.prop_origem = prop_origem
+        self.prop_coluna = prop_coluna
+        self.prop_tipo = prop_tipo
+        self.prop_numero = prop_numero
+        self.prop_texto_offsets = prop_texto_offsets
+        self.prop_textos = prop_textos
+        self.geometria = geometria
+
+    def __len__(self):
+        return len(self.guid)
+
+    @classmethod
+    def de_linhas(cls, elementos, contencoes, relacoes=(), propriedades=(), geometria: bool = False):
+        """
+        Monta o snapshot a partir das linhas de extracao_ifc.
+
+        :param geometria: As relações incluem a contenção geométrica
+        """
+        tipos, codigo_tipo = [], {}
+        codigos, guids, nomes, offsets = [], [], bytearray(), [0]
+        indice_guid = {}
+        for e in elementos:
+            if e["guid"] in indice_guid:
+                continue
+            indice_guid[e["guid"]] = len(guids)
+            codigo = codigo_tipo.get(e["ifc_type"])
+            if codigo is None:
+                codigo = codigo_tipo[e["ifc_type"]] = len(tipos)
+                tipos.append(e["ifc_type"])
+            codigos.append(codigo)
+            guids.append(e["guid"].encode("ascii"))
+            nomes += (e["name"] or "").encode("utf-8")
+            offsets.append(len(nomes))
+
+        # Contenções em CSR, indexadas pelo elemento filho
+        pais_por_filho = [[] for _ in guids]
+        for c in contencoes:
+            filho = indice_guid.get(c["child_guid"])
+            pai = indice_guid.get(c["parent_guid"])
+            if filho is not None and pai is not None:
+                pais_por_filho[filho].append(pai)
+        indptr = np.zeros(len(guids) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in pais_por_filho], out=indptr[1:])
+        indices = np.fromiter((p for pais in pais_por_filho for p in pais), dtype=np.int32, count=int(indptr[-1]))
+
+        # Relações complementares em COO, com o nome da relação internado
+        nomes_relacoes, codigo_relacao = [], {}
+        origens, destinos, codigos_rel = [], [], []
+        for r in relacoes:
+            filho = indice_guid.get(r["child_guid"])
+            pai = indice_guid.get(r["parent_guid"])
+            if filho is None or pai is None:
+                continue
+            codigo = codigo_relacao.get(r["relacao"])
+            if codigo is None:
+                codigo = codigo_relacao[r["relacao"]] = len(nomes_relacoes)
+                nomes_relacoes.append(r["relacao"])
+            origens.append(filho)
+            destinos.append(pai)
+            codigos_rel.append(codigo)
+
+        # Propriedades em COO: valores numéricos em float64 e textos concatenados
+        colunas, codigo_coluna = [], {}
+        prop_origem, prop_coluna, prop_tipo, prop_numero = [], [], [], []
+        textos, texto_offsets = bytearray(), [0]
+        for p in propriedades:
+            elemento = indice_guid.get(p["guid"])
+            if elemento is None:
+                continue
+            codigo = codigo_coluna.get(p["coluna"])
+            if codigo is None:
+                codigo = codigo_coluna[p["coluna"]] = len(colunas)
+                colunas.append(p["coluna"])
+            valor = p["valor"]
+            tipo = type(valor) if type(valor) in CODIGO_TIPO_VALOR else str
+            prop_origem.append(elemento)
+            prop_coluna.append(codigo)
+            prop_tipo.append(CODIGO_TIPO_VALOR[tipo])
+            if tipo is str:
+                prop_numero.append(np.nan)
+                textos += str(valor).encode("utf-8")
+            else:
+                prop_numero.append(float(valor))
+            texto_offsets.append(len(textos))
+
+        return cls(
+            tipos,
+            np.array(codigos, dtype=np.uint16),
+            np.array(guids, dtype=f"S{TAMANHO_GUID}"),
+            np.array(offsets, dtype=np.int64),
+            np.frombuffer(bytes(nomes), dtype=np.uint8),
+            indptr,
+            indices,
+            nomes_relacoes,
+            np.array(origens, dtype=np.int32),
+            np.array(destinos, dtype=np.int32),
+            np.array(codigos_rel, dtype=np.uint8),
+            colunas,
+            np.array(prop_origem, dtype=np.int32),
+            np.array(prop_coluna, dtype=np.uint16),
+            np.array(prop_tipo, dtype=np.uint8),
+            np.array(prop_numero, dtype=np.float64),
+            np.array(texto_offsets, dtype=np.int64),
+            np.frombuffer(bytes(textos), dtype=np.uint8),
+            geometria,
+        )
+
+    # --- Leitura no mesmo formato de extracao_ifc ---
+
+    def nome(self, i: int):
+        nome = bytes(self.nomes[self.nome_offsets[i]:self.nome_offsets[i + 1]]).decode("utf-8")
+        return nome or None
+
+    def elementos(self):
+        """Gerador de linhas {guid, name, ifc_type}, como iterar_elementos."""
+        for i in range(len(self)):
+            yield {
+                "guid": self.guid[i].decode("ascii"),
+                "name": self.nome(i),
+                "ifc_type": self.tipos[self.tipo[i]],
+            }
+
+    def contencoes(self):
+        """Gerador de linhas {child_guid, parent_guid}, como iterar_contencoes."""
+        indptr, indices = self.contencao_indptr, self.contencao_indices
+        for filho in np.flatnonzero(np.diff(indptr)):
+            guid_filho = self.guid[filho].decode("ascii")
+            for pai in indices[indptr[filho]:indptr[filho + 1]]:
+                yield {"child_guid": guid_filho, "parent_guid": self.guid[pai].decode("ascii")}
+
+    def relacoes(self, geometricas: bool = False):
+        """
+        Gerador de linhas {child_guid, parent_guid, relacao}, como
+        iterar_relacoes (ou, com `geometricas`, como iterar_contencao_geometrica).
+        """
+        codigos = [c for c, nome in enumerate(self.nomes_relacoes) if (nome == REL_GEOMETRICA) == geometricas]
+        selecao = np.flatnonzero(np.isin(self.relacao_codigo, codigos))
+        for filho, pai, codigo in zip(self.relacao_origem[selecao], self.relacao_destino[selecao],
+                                      self.relacao_codigo[selecao]):
+            yield {
+                "child_guid": self.guid[filho].decode("ascii"),
+                "parent_guid": self.guid[pai].decode("ascii"),
+                "relacao": self.nomes_relacoes[codigo],
+            }
+
+    def contencao_geometrica(self):
+        """Gerador das linhas isWithin, como iterar_contencao_geometrica."""
+        if not self.geometria:
+            raise ValueError("Snapshot salvo sem a contenção geométrica.")
+        yield from self.relacoes(geometricas=True)
+
+    def propriedades(self):
+        """Gerador de linhas {guid, coluna, valor}, como iterar_propriedades."""
+        offsets = self.prop_texto_offsets
+        for i, (elemento, coluna, codigo, numero) in enumerate(
+                zip(self.prop_origem, self.prop_coluna, self.prop_tipo, self.prop_numero)):
+            tipo = TIPOS_VALOR[codigo]
+            if tipo is str:
+                valor = bytes(self.prop_textos[offsets[i]:offsets[i + 1]]).decode("utf-8")
+            else:
+                valor = tipo(numero)
+            yield {"guid": self.guid[elemento].decode("ascii"), "coluna": self.colunas[coluna], "valor": valor}
+
+    # --- Persistência ---
+
+    def salvar(self, diretorio: str, hash_ifc: str):
+        """Grava o snapshot de forma atômica (diretório temporário + rename)."""
+        temporario = diretorio + ".tmp"
+        shutil.rmtree(temporario, ignore_errors=True)
+        os.makedirs(temporario)
+        for nome in ARRAYS:
+            np.save(os.path.join(temporario, f"{nome}.npy"), getattr(self, nome))
+        with open(os.path.join(temporario, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump({"versao": VERSAO_SNAPSHOT, "hash_ifc": hash_ifc, "tipos": self.tipos,
+                       "relacoes": self.nomes_relacoes, "colunas": self.colunas, "geometria": self.geometria}, f)
+        shutil.rmtree(diretorio, ignore_errors=True)
+        os.replace(temporario, diretorio)
+
+    @classmethod
+    def carregar(cls, diretorio: str, hash_ifc: str = None):
+        """
+        Abre o snapshot com mmap. Retorna None se ele não existir, for de
+        outra versão ou (quando hash_ifc é informado) de outro arquivo IFC.
+        """
+        try:
+            with open(os.path.join(diretorio, "meta.json"), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("versao") != VERSAO_SNAPSHOT:
+            return None
+        if hash_ifc is not None and meta.get("hash_ifc") != hash_ifc:
+            return None
+
+        def abrir(nome):
+            return np.load(os.path.join(diretorio, f"{nome}.npy"), mmap_mode="r")
+
+        arrays = {nome: abrir(nome) for nome in ARRAYS}
+        return cls(meta["tipos"], arrays["tipo"], arrays["guid"], arrays["nome_offsets"], arrays["nomes"],
+                   arrays["contencao_indptr"], arrays["contencao_indices"], meta["relacoes"],
+                   arrays["relacao_origem"], arrays["relacao_destino"], arrays["relacao_codigo"],
+                   meta["colunas"], arrays["prop_origem"], arrays["prop_coluna"], arrays["prop_tipo"],
+                   arrays["prop_numero"], arrays["prop_texto_offsets"], arrays["prop_textos"],
+                   meta.get("geometria", False))
+
+
+def obter_snapshot(caminho_ifc: str, geometria: bool = False, info=print) -> SnapshotModelo:
+    """
+    Retorna o snapshot do IFC, criando-o (com uma extração completa) se ele
+    ainda não existir, se o IFC tiver mudado ou se a contenção geométrica
+    for pedida e o snapshot tiver sido salvo sem ela.
+
+    :param info: Recebe as mensagens de progresso (ex.: Instrumentacao.info,
+                 que as omite no modo silencioso)
+    """
+    hash_ifc = hash_arquivo(caminho_ifc)
+    diretorio = caminho_snapshot(caminho_ifc)
+    snapshot = SnapshotModelo.carregar(diretorio, hash_ifc)
+    if snapshot is not None and (snapshot.geometria or not geometria):
+        info(f"⚡ Snapshot do modelo carregado de '{diretorio}' (sem parsing do IFC).")
+        return snapshot
+
+    import itertools
+    import ifcopenshell  # type: ignore
+    from extracao_ifc import (iterar_elementos, iterar_contencoes, iterar_relacoes, iterar_propriedades,
+                              iterar_contencao_geometrica)
+
+    ifc = ifcopenshell.open(caminho_ifc)
+    relacoes = iterar_relacoes(ifc)
+    if geometria:
+        relacoes = itertools.chain(relacoes, iterar_contencao_geometrica(ifc))
+    snapshot = SnapshotModelo.de_linhas(iterar_elementos(ifc), iterar_contencoes(ifc), relacoes,
+                                        iterar_propriedades(ifc), geometria)
+    snapshot.salvar(diretorio, hash_ifc)
+    info(f"💾 Snapshot do modelo salvo em '{diretorio}'.")
+    return SnapshotModelo.carregar(diretorio, hash_ifc)
@@ -0,0 +1,61 @@
+# test_exportacao_neo4j_admin.py
+
+"""
+Exportação para o neo4j-admin (importador_semantico.py --exportar-csv) sobre
+o modelo de exemplo: cabeçalhos, número de linhas e deduplicação de nós e
+relações, conferidos contra a extração do próprio IFC.
+
+    python -m pytest test_exportacao_neo4j_admin.py
+"""
+
+import os
+import csv
+import sys
+import subprocess
+
+import ifcopenshell  # type: ignore
+
+from extracao_ifc import iterar_elementos, iterar_contencoes, iterar_relacoes
+from importador_semantico import IFC_FILE_PATH, RELACOES_SEMANTICAS
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def ler_csv(caminho: str) -> list:
+    with open(caminho, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_exportar_csv_modelo_exemplo(tmp_path):
+    subprocess.run([sys.executable, "importador_semantico.py", "--exportar-csv", str(tmp_path), "--silencioso"],
+                   cwd=script_dir, check=True)
+
+    ifc = ifcopenshell.open(os.path.join(script_dir, IFC_FILE_PATH))
+    guids = {e["guid"] for e in iterar_elementos(ifc)}
+    esperadas = {"ESTA_CONTIDO_EM": {(c["child_guid"], c["parent_guid"]) for c in iterar_contencoes(ifc)}}
+    for tipo_rel in RELACOES_SEMANTICAS.values():
+        esperadas[tipo_rel] = set()
+    for r in iterar_relacoes(ifc):
+        if r["relacao"] in RELACOES_SEMANTICAS:
+            esperadas[RELACOES_SEMANTICAS[r["relacao"]]].add((r["child_guid"], r["parent_guid"]))
+
+    # Nós: cabeçalho fixo seguido das colunas de propriedade, um nó por GUID
+    cabecalho = ler_csv(tmp_path / "nos_Element.header.csv")[0]
+    assert cabecalho[:6] == ["guid:ID(Element)", "name", "ifc_type",
+                             "entrada:long", "saida:long", "tipos_ancestrais:string[]"]
+    nos = ler_csv(tmp_path / "nos_Element.csv")
+    assert all(len(linha) == len(cabecalho) for linha in nos)
+    guids_exportados = [linha[0] for linha in nos]
+    assert len(guids_exportados) == len(set(guids_exportados)) == len(guids)
+    assert set(guids_exportados) == guids
+
+    # Relações: um arquivo por tipo, pares (filho, pai) sem repetição
+    for tipo_rel, pares in esperadas.items():
+        assert ler_csv(tmp_path / f"rel_{tipo_rel}.header.csv")[0] == [":START_ID(Element)", ":END_ID(Element)"]
+        linhas = [tuple(linha) for linha in ler_csv(tmp_path / f"rel_{tipo_rel}.csv")]
+        assert len(linhas) == len(set(linhas))
+        assert set(linhas) == {par for par in pares if par[0] in guids and par[1] in guids}
+    assert esperadas["ESTA_CONTIDO_EM"]
+
+    roteiro = (tmp_path / "importar.sh").read_text(encoding='utf-8')
+    assert "--nodes=Element=nos_Element.header.csv,nos_Element.csv" in roteiro
@@ -1,20 +1,40 @@
 """
 Testador de Gramática BIM (Lark)
 
-Este script realiza testes na gramática definida em 'gramatica.lark' 
+Este script realiza testes na gramática definida em 'gramatica.lark'
 e no arquivo de regras 'regras.txt' ou qualquer outro informado via terminal.
 
 Funcionalidades:
 - Valida se a gramática está correta
-- Testa exemplos de regras individuais
-- Valida o arquivo completo de regras
-- Exibe a árvore de parsing
+- Testa exemplos de regras individuais (--exemplos)
+- Valida o arquivo completo de regras, apontando todas as linhas inválidas
+- Exibe a árvore de parsing (--arvore)
 - Exporta a árvore para arquivo (opcional)
+- Valida uma biblioteca inteira de arquivos de regras (--validar)
+
+Validação em lote: o parser LALR da gramática é gerado uma única vez como
+módulo Python autônomo (lark.tools.standalone), guardado em .cache_regras/
+sob o hash da gramática, e importado por cada processo de um pool — sem
+reconstruir as tabelas LALR nem carregar o Lark completo. Cada arquivo é
+validado linha a linha, como o auditor lê as regras: um erro de sintaxe é
+registrado (linha, coluna, token encontrado e tokens esperados) e a
+validação segue na linha seguinte, de modo que uma única passada aponta
+todas as linhas inválidas. O resultado pode ser gravado em JSON.
 """
 
 import os
+import io
+import sys
+import json
+import time
+import hashlib
 import argparse
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
 from lark import Lark, exceptions
+from lark.tools.standalone import gen_standalone
+
+from cache_regras import DIRETORIO_CACHE
 
 
 # ==============================
@@ -54,11 +74,85 @@ def inicializar_parser(gramatica_texto):
         exit(1)
 
 
-def testar_regras_individuais(parser):
+def linhas_de_regra(texto):
+    """
+    Linhas do arquivo que contêm regras, com o mesmo filtro do auditor
+    (sem linhas vazias nem comentários).
+
+    :return: Gerador de (número da linha, texto da linha)
+    """
+    for numero, linha in enumerate(texto.splitlines(), 1):
+        limpa = linha.strip()
+        if limpa and not limpa.startswith(('//', '#')):
+            yield numero, linha
+
+
+def descrever_erro(erro, numero_linha, linha):
+    """
+    Registro serializável de um erro de parsing.
+
+    :param erro: UnexpectedInput do Lark (ou do parser autônomo)
+    :param numero_linha: Linha do arquivo onde a regra está
+    :param linha: Texto da linha
+    """
+    token = getattr(erro, "token", None)
+    coluna = getattr(erro, "column", None)
+    if token is not None:
+        encontrado = "fim da linha" if token.type == "$END" else str(token)
+        if token.type == "$END":
+            # O Lark informa a posição do último token; o que falta vem depois dele
+            coluna = len(linha.rstrip()) + 1
+    else:
+        encontrado = getattr(erro, "char", None)
+    esperado = getattr(erro, "expected", None) or getattr(erro, "allowed", None) or ()
+    return {
+        "linha": numero_linha,
+        "coluna": coluna,
+        "texto": linha.strip(),
+        "erro": type(erro).__name__,
+        "encontrado": encontrado,
+        "esperado": sorted(esperado),
+    }
+
+
+def validar_texto(parser, texto, erro_parse=exceptions.UnexpectedInput, mostrar_arvore=False):
+    """
+    Valida as regras de um texto linha a linha, sem parar no primeiro erro.
+
+    :param parser: Parser (Lark ou autônomo) da gramática
+    :param erro_parse: Classe base dos erros de sintaxe desse parser
+    :param mostrar_arvore: Imprime a árvore de cada regra válida
+    :return: (número de regras, lista de erros no formato de descrever_erro,
+             lista de (número da linha, árvore) das regras válidas)
+    """
+    total, erros, arvores = 0, [], []
+    for numero, linha in linhas_de_regra(texto):
+        total += 1
+        try:
+            arvore = parser.parse(linha)
+        except erro_parse as e:
+            erros.append(descrever_erro(e, numero, linha))
+            continue
+        arvores.append((numero, arvore))
+        if mostrar_arvore:
+            print(f"\n🌳 Linha {numero}: '{linha.strip()}'")
+            print(arvore.pretty())
+    return total, erros, arvores
+
+
+def imprimir_erros(caminho, erros):
+    """Imprime os erros de um arquivo no formato arquivo:linha:coluna."""
+    for erro in erros:
+        print(f"❌ {caminho}:{erro['linha']}:{erro['coluna']}: {erro['erro']} em '{erro['texto']}'")
+        print(f"   - Encontrado: {erro['encontrado']!r}; esperava um destes: {erro['esperado']}")
+
+
+def testar_regras_individuais(parser, mostrar_arvore=False):
     """
     Testa parsing de regras individuais definidas localmente.
 
     :param parser: Parser já inicializado
+    :param mostrar_arvore: Se True, imprime a árvore de cada regra
     """
     print("\n🔍 Testando regras individuais:")
 
@@ -70,7 +164,14 @@ def testar_regras_individuais(parser):
         "VERIFICAR PORTA CONTIDO_EM PAREDE",
         "VERIFICAR JANELA CONTIDO_EM PAREDE",
         "VERIFICAR ANDAR CONTIDO_EM EDIFICIO",
-        "VERIFICAR ESPACO CONTIDO_EM ANDAR"
+        "VERIFICAR ESPACO CONTIDO_EM ANDAR",
+        "VERIFICAR ESPACO CONTIDO_EM* EDIFICIO",
+        "VERIFICAR PAREDE DENTRO_DE ANDAR",
+        "VERIFICAR PAREDE QUANTIDADE NetVolume > 0",
+        "VERIFICAR LAJE QUANTIDADE Qto_SlabBaseQuantities.NetArea ENTRE 1 E 500",
+        "VERIFICAR PORTA PROPRIEDADE Pset_DoorCommon.FireRating EXISTE",
+        "VERIFICAR PAREDE TEM MATERIAL",
+        "VERIFICAR LAJE TEM TIPO"
     ]
 
     for regra in regras_exemplo:
@@ -78,7 +179,8 @@ def testar_regras_individuais(parser):
         try:
             arvore = parser.parse(regra)
             print("✅ Parse bem-sucedido.")
-            print(arvore.pretty())
+            if mostrar_arvore:
+                print(arvore.pretty())
         except exceptions.UnexpectedToken as e:
             print(f"❌ ERRO DE PARSE: Token inesperado '{e.token}'")
             print(f"   - Esperava um destes: {list(e.expected)}")
@@ -86,35 +188,143 @@ def testar_regras_individuais(parser):
             print(f"❌ ERRO DE PARSE: {e}")
 
 
-def testar_arquivo_regras(parser, caminho_regras, exportar=False):
+def testar_arquivo_regras(parser, caminho_regras, exportar=False, mostrar_arvore=False):
     """
-    Testa o parsing do arquivo completo de regras.
+    Testa o parsing do arquivo completo de regras, linha a linha: todas as
+    linhas inválidas são apontadas, não apenas a primeira.
 
     :param parser: Parser já inicializado
     :param caminho_regras: Caminho do arquivo de regras (.txt)
-    :param exportar: Se True, exporta a árvore para um arquivo .txt
+    :param exportar: Se True, exporta as árvores das regras válidas para um arquivo .txt
+    :param mostrar_arvore: Se True, imprime a árvore de cada regra válida
+    :return: Lista de erros (ver descrever_erro)
     """
     print(f"\n🗂️ Testando o arquivo de regras: '{caminho_regras}'")
 
     regras_texto = carregar_arquivo(caminho_regras)
+    total, erros, arvores = validar_texto(parser, regras_texto, mostrar_arvore=mostrar_arvore)
+
+    if erros:
+        imprimir_erros(caminho_regras, erros)
+        print(f"❌ {len(erros)} de {total} regra(s) com erro de sintaxe.")
+    else:
+        print(f"✅ Arquivo de regras parseado corretamente! ({total} regras)")
+
+    if exportar:
+        caminho_saida = os.path.splitext(caminho_regras)[0] + "_arvore.txt"
+        with open(caminho_saida, 'w', encoding='utf-8') as f:
+            for numero, arvore in arvores:
+                f.write(f"# linha {numero}\n{arvore.pretty()}\n")
+        print(f"📄 Árvore de parse exportada para '{caminho_saida}'")
+    return erros
+
+
+# ==============================
+# Validação em lote (parser autônomo)
+# ==============================
+
+def obter_parser_autonomo(gramatica_texto, diretorio_base):
+    """
+    Caminho do módulo do parser LALR autônomo da gramática, gerando-o se
+    ainda não existir para este hash de gramática.
+
+    :param gramatica_texto: Texto da gramática
+    :param diretorio_base: Diretório onde fica o .cache_regras
+    :return: Caminho do módulo .py gerado
+    """
+    assinatura = hashlib.sha256(gramatica_texto.encode("utf-8")).hexdigest()[:16]
+    caminho = os.path.join(diretorio_base, DIRETORIO_CACHE, f"parser_regras_{assinatura}.py")
+    if not os.path.exists(caminho):
+        codigo = io.StringIO()
+        gen_standalone(Lark(gramatica_texto, parser="lalr", start="start"), out=codigo)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write(codigo.getvalue())
+        os.replace(temporario, caminho)
+    return caminho
+
+
+def carregar_parser_autonomo(caminho_modulo):
+    """
+    Importa o módulo gerado por obter_parser_autonomo.
+
+    :return: (parser, classe base dos erros de sintaxe)
+    """
+    nome = os.path.splitext(os.path.basename(caminho_modulo))[0]
+    spec = importlib.util.spec_from_file_location(nome, caminho_modulo)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo.Lark_StandAlone(), modulo.UnexpectedInput
+
+
+def listar_arquivos_regras(caminhos, extensao=".txt"):
+    """
+    Arquivos de regras a validar: os arquivos informados e, nos diretórios,
+    todos os arquivos com a extensão (recursivamente), sem repetições.
+    """
+    arquivos = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for raiz, subdiretorios, nomes in os.walk(caminho):
+                subdiretorios.sort()
+                arquivos.extend(os.path.join(raiz, n) for n in sorted(nomes) if n.endswith(extensao))
+        else:
+            arquivos.append(caminho)
+    return list(dict.fromkeys(os.path.abspath(a) for a in arquivos))
+
 
+# Parser de cada processo do pool, importado uma vez por processo
+_parser_worker = None
+_erro_worker = None
+
+
+def _inicializar_worker(caminho_modulo):
+    global _parser_worker, _erro_worker
+    _parser_worker, _erro_worker = carregar_parser_autonomo(caminho_modulo)
+
+
+def _validar_arquivo(caminho):
     try:
-        arvore = parser.parse(regras_texto)
-        print("✅ Arquivo de regras parseado corretamente!")
-        print("\n🌳 Árvore de parse completa:")
-        print(arvore.pretty())
-
-        if exportar:
-            caminho_saida = os.path.splitext(caminho_regras)[0] + "_arvore.txt"
-            with open(caminho_saida, 'w', encoding='utf-8') as f:
-                f.write(arvore.pretty())
-            print(f"📄 Árvore de parse exportada para '{caminho_saida}'")
-
-    except exceptions.UnexpectedToken as e:
-        print(f"❌ ERRO DE PARSE NO ARQUIVO: Token inesperado '{e.token}'")
-        print(f"   - Esperava: {list(e.expected)}")
-    except Exception as e:
-        print(f"❌ ERRO DE PARSE NO ARQUIVO: {e}")
+        with open(caminho, 'r', encoding='utf-8') as f:
+            texto = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return {"arquivo": caminho, "regras": 0, "erros": [], "erro_leitura": str(e)}
+    total, erros, _ = validar_texto(_parser_worker, texto, _erro_worker)
+    return {"arquivo": caminho, "regras": total, "erros": erros}
+
+
+def validar_biblioteca(arquivos, caminho_modulo, workers=None):
+    """
+    Valida muitos arquivos de regras com o parser autônomo, em paralelo.
+
+    :param arquivos: Caminhos dos arquivos (ver listar_arquivos_regras)
+    :param caminho_modulo: Módulo do parser autônomo (ver obter_parser_autonomo)
+    :param workers: Número de processos (padrão: número de CPUs; 1 = no próprio processo)
+    :return: Resumo serializável {arquivos, regras, erros, arquivos_com_erros,
+             segundos, resultados}, com os resultados na ordem de `arquivos`
+    """
+    inicio = time.perf_counter()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(arquivos) or 1))
+    if workers == 1:
+        _inicializar_worker(caminho_modulo)
+        resultados = [_validar_arquivo(a) for a in arquivos]
+    else:
+        # Blocos de arquivos por tarefa: muitos arquivos pequenos não pagam
+        # uma ida e volta ao pool cada
+        bloco = max(1, len(arquivos) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker,
+                                 initargs=(caminho_modulo,)) as pool:
+            resultados = list(pool.map(_validar_arquivo, arquivos, chunksize=bloco))
+
+    return {
+        "arquivos": len(resultados),
+        "regras": sum(r["regras"] for r in resultados),
+        "erros": sum(len(r["erros"]) for r in resultados),
+        "arquivos_com_erros": sum(1 for r in resultados if r["erros"] or "erro_leitura" in r),
+        "segundos": time.perf_counter() - inicio,
+        "resultados": resultados,
+    }
 
 
 # ==============================
@@ -138,6 +348,26 @@ def main():
         "--exportar", action="store_true",
         help="Se presente, exporta a árvore de parsing para um arquivo .txt"
     )
+    parser_arg.add_argument(
+        "--exemplos", action="store_true",
+        help="Testa também a lista de regras de exemplo"
+    )
+    parser_arg.add_argument(
+        "--arvore", action="store_true",
+        help="Imprime a árvore de parsing de cada regra"
+    )
+    parser_arg.add_argument(
+        "--validar", nargs="+", default=None, metavar="CAMINHO",
+        help="Valida em lote arquivos de regras ou diretórios (*.txt, recursivo)"
+    )
+    parser_arg.add_argument(
+        "--workers", type=int, default=None,
+        help="Processos da validação em lote (padrão: número de CPUs)"
+    )
+    parser_arg.add_argument(
+        "--resumo", type=str, default=None,
+        help="Arquivo JSON onde o resultado da validação em lote é gravado ('-' = saída padrão)"
+    )
 
     args = parser_arg.parse_args()
 
@@ -146,6 +376,35 @@ def main():
     caminho_gramatica = os.path.join(script_dir, args.gramatica)
     caminho_regras = os.path.join(script_dir, args.regras)
 
+    if args.validar:
+        # Com o resumo na saída padrão, as mensagens vão para stderr
+        saida = sys.stderr if args.resumo == "-" else sys.stdout
+        with open(caminho_gramatica, 'r', encoding='utf-8') as f:
+            gramatica_texto = f.read()
+        caminho_modulo = obter_parser_autonomo(gramatica_texto, script_dir)
+        arquivos = listar_arquivos_regras(args.validar)
+        print(f"🔍 Validando {len(arquivos)} arquivo(s) de regras...", file=saida)
+        resumo = validar_biblioteca(arquivos, caminho_modulo, args.workers)
+
+        for resultado in resumo["resultados"]:
+            if "erro_leitura" in resultado:
+                print(f"❌ {resultado['arquivo']}: {resultado['erro_leitura']}", file=saida)
+            for erro in resultado["erros"]:
+                print(f"❌ {resultado['arquivo']}:{erro['linha']}:{erro['coluna']}: '{erro['texto']}' "
+                      f"(encontrado {erro['encontrado']!r}, esperava {erro['esperado']})", file=saida)
+        print(f"{'❌' if resumo['erros'] or resumo['arquivos_com_erros'] else '✅'} {resumo['regras']} regra(s) em "
+              f"{resumo['arquivos']} arquivo(s): {resumo['erros']} erro(s) em {resumo['arquivos_com_erros']} "
+              f"arquivo(s), em {resumo['segundos']:.2f}s", file=saida)
+
+        if args.resumo == "-":
+            json.dump(resumo, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+        elif args.resumo:
+            with open(args.resumo, 'w', encoding='utf-8') as f:
+                json.dump(resumo, f, ensure_ascii=False, indent=2)
+            print(f"📄 Resumo da validação salvo em '{args.resumo}'", file=saida)
+        sys.exit(1 if resumo["arquivos_com_erros"] else 0)
+
     print("\n=== 🚀 INICIANDO TESTE DE GRAMÁTICA BIM ===")
 
     # 1. Carrega a gramática
@@ -155,10 +414,11 @@ def main():
     parser = inicializar_parser(gramatica_texto)
 
     # 3. Testa regras individuais
-    testar_regras_individuais(parser)
+    if args.exemplos:
+        testar_regras_individuais(parser, mostrar_arvore=args.arvore)
 
     # 4. Testa o arquivo completo de regras
-    testar_arquivo_regras(parser, caminho_regras, exportar=args.exportar)
+    testar_arquivo_regras(parser, caminho_regras, exportar=args.exportar, mostrar_arvore=args.arvore)
 
     print("\n=== ✅ TESTE DE GRAMÁTICA CONCLUÍDO ===")
 